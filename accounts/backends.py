@@ -0,0 +1,91 @@
+"""
+Authentication backend that serves the logged-in user from the cache.
+
+``AuthenticationMiddleware`` resolves ``request.user`` through the
+backend's ``get_user`` on every request. ``CachedModelBackend`` keeps each
+user under a key holding the user's id and current version; saving,
+deleting or bulk-updating (``User.objects.update()``) the user bumps the
+version once the transaction commits, so role changes, suspensions and
+password changes take effect on the very next request.
+
+The cached copy holds the user's fields except the password hash, plus the
+session hash derived from it, which is all ``get_user`` needs to verify the
+session. Reading ``password`` on a cached user loads it from the database.
+"""
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+USER_VERSION_KEY = 'accounts:user_version:{}'
+USER_KEY = 'accounts:user:{}:{}'
+# Cached users refresh at least this often, whatever happens to the cache
+USER_CACHE_TIMEOUT = 60 * 60
+
+
+def _user_version(user_id):
+    key = USER_VERSION_KEY.format(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def invalidate_user(user_id):
+    """Make the next request load ``user_id`` from the database."""
+    cache.set(USER_VERSION_KEY.format(user_id), time.time_ns(), None)
+
+
+def _dump_user(user):
+    return {
+        'db': user._state.db,
+        'fields': {
+            field.attname: getattr(user, field.attname)
+            for field in user._meta.concrete_fields if field.attname != 'password'
+        },
+        'session_auth_hash': user.get_session_auth_hash(),
+    }
+
+
+def _load_user(cached):
+    fields = cached['fields']
+    user = get_user_model().from_db(cached['db'], list(fields), list(fields.values()))
+    user._session_auth_hash = cached['session_auth_hash']
+    return user
+
+
+class CachedModelBackend(ModelBackend):
+    """``ModelBackend`` whose ``get_user`` reads the cache before the database."""
+
+    def get_user(self, user_id):
+        key = USER_KEY.format(user_id, _user_version(user_id))
+        cached = cache.get(key)
+        if cached is None:
+            UserModel = get_user_model()
+            try:
+                user = UserModel._default_manager.get(pk=user_id)
+            except UserModel.DoesNotExist:
+                return None
+            cache.set(key, _dump_user(user), USER_CACHE_TIMEOUT)
+        else:
+            user = _load_user(cached)
+        return user if self.user_can_authenticate(user) else None
+
+
+def _invalidate_user(sender, instance, created=False, **kwargs):
+    user_id = instance.pk
+    if created:
+        # The id of a rolled-back user can be handed out again
+        invalidate_user(user_id)
+    transaction.on_commit(lambda: invalidate_user(user_id))
+
+
+def connect_signals():
+    """Drop a user's cached copy whenever the row changes."""
+    User = get_user_model()
+    post_save.connect(_invalidate_user, sender=User, dispatch_uid='accounts_user_cache_save')
+    post_delete.connect(_invalidate_user, sender=User, dispatch_uid='accounts_user_cache_delete')
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_user_phone_user_role_user_workplace'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['email'], name='accounts_us_email_74c8d6_idx'),
+        ),
+    ]
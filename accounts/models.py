@@ -1,5 +1,25 @@
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.contrib.auth.models import UserManager as BaseUserManager
+from django.db import models, transaction
+
+
+class UserQuerySet(models.QuerySet):
+
+    def update(self, **kwargs):
+        # Bulk updates skip post_save, so the cached users (see
+        # accounts.backends) are dropped here instead
+        from .backends import invalidate_user
+
+        user_ids = list(self.values_list('pk', flat=True))
+        rows = super().update(**kwargs)
+        transaction.on_commit(lambda: [invalidate_user(user_id) for user_id in user_ids], using=self.db)
+        return rows
+
+    update.alters_data = True
+
+
+class UserManager(BaseUserManager.from_queryset(UserQuerySet)):
+    pass
 
 
 class User(AbstractUser):
@@ -18,6 +38,20 @@ class User(AbstractUser):
     phone = models.CharField(max_length=20, blank=True, default='')
     workplace = models.CharField(max_length=255, blank=True, default='')
 
+    objects = UserManager()
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            models.Index(fields=['email']),
+        ]
+
+    def get_session_auth_hash(self):
+        # Users served from the cache (accounts.backends) come without their
+        # password hash, but with the session hash derived from it
+        if 'password' not in self.__dict__ and '_session_auth_hash' in self.__dict__:
+            return self._session_auth_hash
+        return super().get_session_auth_hash()
+
     @property
     def is_customer(self) -> bool:
         return self.role == self.Roles.CUSTOMER
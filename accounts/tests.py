@@ -1,3 +1,50 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from .backends import USER_KEY, CachedModelBackend, _user_version
+
+
+class CachedModelBackendTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('cus', 'c@a.com', 'old-password')
+        self.client.force_login(self.user)
+        self.dashboard = reverse('orders:dashboard')
+
+    def test_user_is_served_from_the_cache_without_the_password(self):
+        self.assertEqual(self.client.get(self.dashboard).status_code, 200)
+        cached = cache.get(USER_KEY.format(self.user.pk, _user_version(self.user.pk)))
+        self.assertNotIn('password', cached['fields'])
+        self.assertNotIn(self.user.password, str(cached))
+
+        with self.assertNumQueries(0):
+            user = CachedModelBackend().get_user(self.user.pk)
+        self.assertEqual((user.pk, user.username, user.role), (self.user.pk, 'cus', 'customer'))
+        self.assertEqual(user.get_session_auth_hash(), self.user.get_session_auth_hash())
+        self.assertEqual(self.client.get(self.dashboard).status_code, 200)
+
+    def test_bulk_deactivation_logs_the_user_out(self):
+        self.assertEqual(self.client.get(self.dashboard).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            get_user_model().objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertRedirects(self.client.get(self.dashboard), f"{reverse('accounts:login')}?next={self.dashboard}",
+                             fetch_redirect_response=False)
+
+    def test_password_change_logs_other_sessions_out(self):
+        self.assertEqual(self.client.get(self.dashboard).status_code, 200)
+        user = get_user_model().objects.get(pk=self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            user.set_password('new-password')
+            user.save()
+        self.assertEqual(self.client.get(self.dashboard).status_code, 302)
+
+    def test_saving_a_cached_user_keeps_the_password(self):
+        self.client.get(self.dashboard)
+        user = CachedModelBackend().get_user(self.user.pk)
+        user.phone = '0700000000'
+        user.save()
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.phone, '0700000000')
+        self.assertTrue(self.user.check_password('old-password'))
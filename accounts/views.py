@@ -2,6 +2,9 @@ from django.contrib import messages
 from django.urls import reverse_lazy
 from django.views.generic import CreateView
 from django.contrib.auth.views import LoginView as DjangoLoginView
+from django.utils.decorators import method_decorator
+
+from orders.ratelimit import rate_limit
 
 from .forms import LoginForm, SignupForm
 from .models import User
@@ -21,6 +24,7 @@ class SignUpView(CreateView):
         return response
 
 
+@method_decorator(rate_limit('login'), name='post')
 class LoginView(DjangoLoginView):
     """Styled login view using Tailwind widgets."""
 
@@ -0,0 +1,14 @@
+// Admin dashboard pages (admin_dashboard_base.html and its children).
+// Built by `python manage.py build_css`; the theme is shared with the
+// CDN fallback in orders/templatetags/assets.py.
+module.exports = {
+  content: [
+    "./templates/admin_dashboard_base.html",
+    "./orders/templates/orders/admin_*.html",
+    "./orders/templates/orders/menu_item_form.html",
+    "./orders/**/*.py",
+    "./accounts/**/*.py",
+  ],
+  theme: require("./admin.theme.json"),
+  plugins: [],
+};
@@ -0,0 +1,16 @@
+// Customer-facing pages (base.html, dashboard_base_layout.html).
+// Built by `python manage.py build_css`; the theme is shared with the
+// CDN fallback in orders/templatetags/assets.py.
+module.exports = {
+  content: [
+    "./templates/base.html",
+    "./templates/dashboard_base_layout.html",
+    "./templates/accounts/**/*.html",
+    "./templates/registration/**/*.html",
+    "./orders/templates/**/*.html",
+    "./orders/**/*.py",
+    "./accounts/**/*.py",
+  ],
+  theme: require("./site.theme.json"),
+  plugins: [require("@tailwindcss/forms"), require("@tailwindcss/typography")],
+};
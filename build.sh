@@ -5,9 +5,14 @@ set -o errexit
 pip install -r requirements.txt
 pip install -r requirements-prod.txt
 
+# Compile the Tailwind bundles before collectstatic hashes them
+python manage.py build_css
 python manage.py collectstatic --no-input
 python manage.py migrate
 
+# Fail the build early if a template does not compile
+python manage.py warm_templates
+
 # Create superuser automatically if it doesn't exist
 python manage.py shell << EOF
 from django.contrib.auth import get_user_model
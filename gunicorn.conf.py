@@ -0,0 +1,57 @@
+"""
+Gunicorn configuration for Render.
+
+Serves ``smartkibadaski.asgi:application`` with uvicorn workers, so clients
+on slow mobile connections wait on the event loop instead of pinning a
+worker process. To fall back to the synchronous deployment, start
+``smartkibadaski.wsgi:application`` with ``GUNICORN_WORKER_CLASS=sync``.
+"""
+import glob
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'uvicorn.workers.UvicornWorker')
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = 20
+keepalive = 5
+
+# Recycle workers periodically to cap memory growth
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = 100
+
+
+def _metrics_dir():
+    return os.environ.get('METRICS_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'metrics'))
+
+
+def on_starting(server):
+    """Start metrics from zero; the files left by a previous run are stale."""
+    for path in glob.glob(os.path.join(_metrics_dir(), '*.db')):
+        os.remove(path)
+
+
+def post_fork(server, worker):
+    """Record metrics in this worker; other processes that load the app do not."""
+    os.environ['METRICS_RECORD'] = '1'
+
+
+def child_exit(server, worker):
+    """Fold the metrics of an exited worker into the aggregate file."""
+    from orders.metrics import merge_process
+
+    try:
+        merge_process(worker.pid, _metrics_dir())
+    except Exception:
+        server.log.exception('Could not merge the metrics of worker %s', worker.pid)
+
+
+def post_worker_init(worker):
+    """Compile all templates before the worker takes its first request."""
+    from orders.template_loaders import warm_templates
+
+    count, seconds, errors = warm_templates()
+    for name, exc in errors:
+        worker.log.error('Template %s failed to compile: %s', name, exc)
+    worker.log.info('Warmed %d templates in %.0f ms', count, seconds * 1000)
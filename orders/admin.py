@@ -1,22 +1,57 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.contrib.auth import get_user_model
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
 
 from .models import MenuCategory, MenuItem, Order, OrderItem
+from .transitions import transition_orders
+
+
+class EstimatedCountPaginator(Paginator):
+  """
+  Paginator that trusts the planner's row estimate for unfiltered tables.
+
+  ``COUNT(*)`` over millions of rows is a full scan on PostgreSQL; the
+  estimate in ``pg_class`` is free and close enough for page links. Filtered
+  querysets, small tables and other databases get the exact count.
+  """
+
+  ESTIMATE_ABOVE = 100000
+
+  @cached_property
+  def count(self):
+    queryset = self.object_list
+    connection = connections[queryset.db]
+    if connection.vendor == "postgresql" and not queryset.query.where:
+      with connection.cursor() as cursor:
+        cursor.execute(
+          "SELECT reltuples FROM pg_class WHERE relname = %s",
+          [queryset.model._meta.db_table],
+        )
+        row = cursor.fetchone()
+      if row and row[0] > self.ESTIMATE_ABOVE:
+        return int(row[0])
+    return super().count
 
 
 @admin.register(MenuCategory)
 class MenuCategoryAdmin(admin.ModelAdmin):
   list_display = ("name", "is_featured")
   list_filter = ("is_featured",)
+  search_fields = ("name",)
   prepopulated_fields = {"slug": ("name",)}
 
 
 @admin.register(MenuItem)
 class MenuItemAdmin(admin.ModelAdmin):
   list_display = ("name", "category", "price", "is_available", "tag")
-  list_filter = ("category", "is_available", "tag")
+  list_filter = ("category", "is_available", "tag", "is_archived")
+  list_select_related = ("category",)
   search_fields = ("name", "description")
   list_editable = ("price", "is_available", "tag")
-
+  autocomplete_fields = ("category",)
 
 
 class OrderItemInline(admin.TabularInline):
@@ -26,16 +61,51 @@ class OrderItemInline(admin.TabularInline):
   extra = 0
   readonly_fields = ("menu_item", "quantity", "price")
 
+  def get_queryset(self, request):
+    return super().get_queryset(request).select_related("menu_item")
+
+
+def _status_action(status):
+  def action(modeladmin, request, queryset):
+    result = transition_orders(queryset.values_list("id", flat=True), status)
+    modeladmin.message_user(request, f"{len(result.updated)} order(s) moved to {status.label}.")
+    if result.skipped:
+      modeladmin.message_user(
+        request, f"{len(result.skipped)} order(s) skipped: not allowed from their status.", messages.WARNING,
+      )
+
+  action.__name__ = f"mark_{status.value}"
+  action.short_description = f"Mark selected orders as {status.label}"
+  return action
+
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
-  """Admin for orders."""
+  """
+  Admin for orders, sized for a table of millions of rows.
+
+  The change list joins the user in the same query, skips the unfiltered
+  total count and estimates it for paging, and searches only indexed
+  columns by exact value. Status changes go through ``transition_orders``
+  (as actions) so the event log and rollups stay in step.
+  """
 
   list_display = ("order_number", "user", "status", "payment_method", "total_amount", "created_at")
-  list_filter = ("status", "payment_method", "created_at")
-  search_fields = ("order_number", "user__username", "user__email", "delivery_location")
-  list_editable = ("status",)
-  readonly_fields = ("order_number", "created_at", "updated_at")
+  list_filter = ("status", "payment_method")
+  list_select_related = ("user",)
+  date_hierarchy = "created_at"
+  search_fields = ("order_number",)
+  search_help_text = "Exact order number, customer username or email"
+  show_full_result_count = False
+  paginator = EstimatedCountPaginator
+  actions = [
+    _status_action(status)
+    for status in Order.Status
+    if status != Order.Status.PENDING
+  ]
+  autocomplete_fields = ("user",)
+  # Status only changes through the actions, i.e. transition_orders
+  readonly_fields = ("order_number", "status", "created_at", "updated_at")
   inlines = [OrderItemInline]
 
   fieldsets = (
@@ -44,3 +114,15 @@ class OrderAdmin(admin.ModelAdmin):
     ("Payment", {"fields": ("payment_method",)}),
     ("Timestamps", {"fields": ("created_at", "updated_at")}),
   )
+
+  def get_search_results(self, request, queryset, search_term):
+    term = search_term.strip()
+    if not term:
+      return queryset, False
+    # Equality on unique or indexed columns only; icontains would scan every
+    # row. The customers are looked up first so both sides of the OR can use
+    # an index.
+    user_ids = list(
+      get_user_model().objects.filter(Q(username=term) | Q(email=term)).values_list("id", flat=True)
+    )
+    return queryset.filter(Q(order_number=term.upper()) | Q(user_id__in=user_ids)), False
@@ -0,0 +1,109 @@
+"""
+Hot/cold partitioning of orders.
+
+Orders in a terminal status that are older than ``ORDER_ARCHIVE_AFTER_DAYS``
+are copied into ``ArchivedOrder``/``ArchivedOrderItem``/
+``ArchivedOrderStatusEvent`` and removed from the hot tables in batches. Read paths that need the full history (reports,
+exports, a customer's order history) query both tables.
+"""
+from datetime import timedelta
+from itertools import chain
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from .counters import invalidate_dashboard_counters
+from .models import (
+    ArchivedOrder, ArchivedOrderItem, ArchivedOrderStatusEvent, Order, OrderItem,
+    OrderStatusEvent,
+)
+
+TERMINAL_STATUSES = [Order.Status.DELIVERED, Order.Status.CANCELLED]
+
+ARCHIVED_ORDER_FIELDS = [
+    'id', 'order_number', 'user_id', 'status', 'payment_method',
+    'delivery_location', 'phone', 'notes', 'total_amount', 'created_at',
+    'updated_at',
+]
+ARCHIVED_ITEM_FIELDS = ['id', 'order_id', 'menu_item_id', 'quantity', 'price']
+ARCHIVED_EVENT_FIELDS = ['id', 'order_id', 'from_status', 'status', 'duration_seconds', 'created_at']
+
+
+def archive_cutoff(days=None):
+    if days is None:
+        days = settings.ORDER_ARCHIVE_AFTER_DAYS
+    return timezone.now() - timedelta(days=days)
+
+
+def archive_batch(cutoff, batch_size):
+    """
+    Move one batch of archivable orders to the archive tables.
+
+    Runs in a single short transaction and returns the number of orders
+    moved (0 when nothing is left to archive).
+    """
+    with transaction.atomic():
+        order_ids = list(
+            Order.objects.filter(created_at__lt=cutoff, status__in=TERMINAL_STATUSES)
+            .order_by('id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not order_ids:
+            return 0
+
+        ArchivedOrder.objects.bulk_create([
+            ArchivedOrder(**row)
+            for row in Order.objects.filter(id__in=order_ids).values(*ARCHIVED_ORDER_FIELDS)
+        ])
+        ArchivedOrderItem.objects.bulk_create([
+            ArchivedOrderItem(**row)
+            for row in OrderItem.objects.filter(order_id__in=order_ids).values(*ARCHIVED_ITEM_FIELDS)
+        ])
+        ArchivedOrderStatusEvent.objects.bulk_create([
+            ArchivedOrderStatusEvent(**row)
+            for row in OrderStatusEvent.objects.filter(order_id__in=order_ids).values(*ARCHIVED_EVENT_FIELDS)
+        ])
+
+        OrderStatusEvent.objects.filter(order_id__in=order_ids).delete()
+        OrderItem.objects.filter(order_id__in=order_ids).delete()
+        Order.objects.filter(id__in=order_ids).delete()
+
+    invalidate_dashboard_counters()
+    return len(order_ids)
+
+
+def customer_order_totals(user):
+    """Order count and amount spent by ``user`` across hot and archived orders."""
+    totals = {'total_orders': 0, 'total_spent': 0}
+    for model in (Order, ArchivedOrder):
+        row = model.objects.filter(user=user).aggregate(
+            count=Count('id'),
+            spent=Sum('total_amount'),
+        )
+        totals['total_orders'] += row['count']
+        totals['total_spent'] += row['spent'] or 0
+    return totals
+
+
+def customer_orders_page(user, page, page_size):
+    """
+    Return ``(orders, has_next)`` for one page of a customer's history.
+
+    Pages are served from the hot table first and continue into the archive
+    once the customer's recent orders are exhausted, so older orders are
+    only read when someone pages back to them.
+    """
+    offset = (page - 1) * page_size
+    hot = Order.objects.filter(user=user).order_by('-created_at').prefetch_related('items__menu_item')
+    hot_count = hot.count()
+
+    orders = list(hot[offset:offset + page_size + 1]) if offset < hot_count else []
+    remaining = page_size + 1 - len(orders)
+    if remaining > 0:
+        archive_offset = max(offset - hot_count, 0)
+        archived = ArchivedOrder.objects.filter(user=user).order_by('-created_at').prefetch_related('items__menu_item')
+        orders = list(chain(orders, archived[archive_offset:archive_offset + remaining]))
+
+    return orders[:page_size], len(orders) > page_size
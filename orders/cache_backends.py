@@ -0,0 +1,107 @@
+"""
+Cache backends that report their hits, misses and time.
+
+``LocMemCache`` and ``FileBasedCache`` behave exactly like Django's, and
+add each read and write to the ``cache`` phase of the current request
+(see ``orders.server_timing``) and each read to ``cache_requests_total``
+(see ``orders.metrics``). The async methods of both backends run the sync
+ones in a thread, so they are counted as well.
+
+``FileBasedCache`` also makes ``add``, ``touch`` and ``incr`` (and with it
+``decr``) atomic across processes, which the rate limiter's locks and
+counters rely on (see ``orders.ratelimit``). ``LocMemCache`` already is
+within its process.
+"""
+import os
+import pickle
+import time
+import zlib
+from contextlib import contextmanager
+
+from django.core.cache.backends import filebased, locmem
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.files import locks
+
+from . import metrics
+from .server_timing import phase
+
+_MISSING = object()
+
+
+class InstrumentedCacheMixin:
+
+    def get(self, key, default=None, version=None):
+        with phase('cache') as timings:
+            value = super().get(key, _MISSING, version)
+        if value is _MISSING:
+            metrics.inc('cache_requests_total', result='miss')
+            if timings is not None:
+                timings.cache_misses += 1
+            return default
+        metrics.inc('cache_requests_total', result='hit')
+        if timings is not None:
+            timings.cache_hits += 1
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        with phase('cache'):
+            return super().set(key, value, timeout, version)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        with phase('cache'):
+            return super().add(key, value, timeout, version)
+
+    def incr(self, key, delta=1, version=None):
+        with phase('cache'):
+            return super().incr(key, delta, version)
+
+    def delete(self, key, version=None):
+        with phase('cache'):
+            return super().delete(key, version)
+
+
+class LocMemCache(InstrumentedCacheMixin, locmem.LocMemCache):
+    pass
+
+
+class FileBasedCache(InstrumentedCacheMixin, filebased.FileBasedCache):
+
+    @contextmanager
+    def _locked(self):
+        # Django's add and incr are a separate read and write; holding the
+        # cache directory's lock across both keeps racing workers from
+        # losing updates. set() swaps files in with a rename, so unlocked
+        # readers never see a half-written value.
+        self._createdir()
+        fd = os.open(self._dir, os.O_RDONLY)
+        try:
+            locks.lock(fd, locks.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        with self._locked():
+            return super().add(key, value, timeout, version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        # Rewrites the entry in place; an unlocked touch could put back a
+        # value that a concurrent incr had just replaced
+        with self._locked():
+            return super().touch(key, timeout, version)
+
+    def incr(self, key, delta=1, version=None):
+        with phase('cache'), self._locked():
+            try:
+                with open(self._key_to_file(key, version), 'rb') as f:
+                    expiry = pickle.load(f)
+                    value = pickle.loads(zlib.decompress(f.read()))
+            except FileNotFoundError:
+                expiry = 0
+            now = time.time()
+            if expiry is not None and expiry < now:
+                raise ValueError(f"Key '{key}' not found")
+            value += delta
+            # Keep the counter's expiry rather than restarting it
+            filebased.FileBasedCache.set(self, key, value, None if expiry is None else expiry - now, version)
+            return value
@@ -3,6 +3,7 @@ Shopping cart functionality using Django sessions.
 """
 from decimal import Decimal
 from django.conf import settings
+from . import metrics
 from .models import MenuItem
 
 
@@ -40,6 +41,7 @@ class Cart:
             self.cart[menu_item_id]['quantity'] += quantity
         
         self.save()
+        metrics.inc('cart_operations_total', operation='add')
 
     def save(self):
         """Mark the session as modified to ensure it's saved."""
@@ -51,6 +53,7 @@ class Cart:
         if menu_item_id in self.cart:
             del self.cart[menu_item_id]
             self.save()
+            metrics.inc('cart_operations_total', operation='remove')
 
     def update_quantity(self, menu_item_id, quantity):
         """Update the quantity of a menu item."""
@@ -61,28 +64,47 @@ class Cart:
             else:
                 del self.cart[menu_item_id]
             self.save()
+            metrics.inc('cart_operations_total', operation='update')
 
     def __iter__(self):
         """
         Iterate over the items in the cart and get the menu items from the database.
+
+        Items whose menu item was archived or no longer exists are dropped
+        from the session cart, so totals and counts stay in step.
         """
-        menu_item_ids = self.cart.keys()
-        # Get the menu item objects and add them to the cart
-        menu_items = MenuItem.objects.filter(id__in=menu_item_ids)
-        cart = self.cart.copy()
-        
-        for menu_item in menu_items:
-            cart[str(menu_item.id)]['menu_item'] = menu_item
-        
-        for item in cart.values():
-            # Skip items that don't have a matching database record
-            # This happens when the DB is wiped (e.g. Render ephemeral) but session persists
-            if 'menu_item' not in item:
-                continue
-                
-            item['price'] = Decimal(item['price'])
-            item['total_price'] = item['price'] * item['quantity']
-            yield item
+        menu_items = {
+            str(menu_item.id): menu_item
+            for menu_item in MenuItem.objects.active().filter(id__in=list(self.cart))
+        }
+        yield from self._lines(menu_items)
+
+    async def aitems(self):
+        """Async counterpart of iterating the cart, for async views."""
+        menu_items = {
+            str(menu_item.id): menu_item
+            async for menu_item in MenuItem.objects.active().filter(id__in=list(self.cart))
+        }
+        return list(self._lines(menu_items))
+
+    def _lines(self, menu_items):
+        """Drop entries missing from ``menu_items`` and yield the cart lines."""
+        stale = [menu_item_id for menu_item_id in self.cart if menu_item_id not in menu_items]
+        if stale:
+            # This happens when an item is archived, or when the DB is wiped
+            # (e.g. Render ephemeral) but the session persists
+            for menu_item_id in stale:
+                del self.cart[menu_item_id]
+            self.save()
+
+        for menu_item_id, entry in list(self.cart.items()):
+            price = Decimal(entry['price'])
+            yield {
+                'menu_item': menu_items[menu_item_id],
+                'quantity': entry['quantity'],
+                'price': price,
+                'total_price': price * entry['quantity'],
+            }
 
     def __len__(self):
         """Count all items in the cart."""
@@ -99,6 +121,7 @@ class Cart:
         """Remove cart from session."""
         del self.session[settings.CART_SESSION_ID]
         self.save()
+        metrics.inc('cart_operations_total', operation='clear')
 
     def get_item_count(self):
         """Get the number of unique items in the cart."""
@@ -0,0 +1,125 @@
+"""
+Catalog version and the pre-built menu JSON document.
+
+Every change to a menu item or category bumps ``catalog_version`` (see
+``orders.signals``). The ``/api/menu/`` document is built once per version,
+serialized compactly, compressed with gzip (and brotli when the ``brotli``
+package is installed) and stored in the cache with its ETag, so serving it
+is a cache read and a byte copy.
+"""
+import gzip
+import hashlib
+import json
+import time
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import MenuCategory, MenuItem
+from .templatetags.cloudinary_tags import cloudinary_url
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+CATALOG_VERSION_KEY = 'orders:catalog_version'
+MENU_DOCUMENT_KEY = 'orders:menu_document'
+
+# Image variants offered to clients, as Cloudinary transformations
+IMAGE_VARIANTS = {
+    'thumb': 'w_150,h_150,c_fill,q_auto,f_auto',
+    'card': 'w_300,h_200,c_fill,q_auto,f_auto',
+    'full': 'q_auto,f_auto',
+}
+
+
+def bump_catalog_version():
+    """Mark every catalog-derived cache entry as stale."""
+    cache.set(CATALOG_VERSION_KEY, time.time_ns(), None)
+
+
+def update_menu_items(item_ids, changes):
+    """
+    Apply ``changes`` (field -> value) to the given menu items in one UPDATE.
+
+    ``update()`` sends no signals, so the catalog version is bumped here,
+    once. Returns the number of items updated.
+    """
+    if not item_ids or not changes:
+        return 0
+    updated = MenuItem.objects.filter(id__in=item_ids).update(**changes)
+    if updated:
+        bump_catalog_version()
+    return updated
+
+
+def catalog_version():
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        cache.add(CATALOG_VERSION_KEY, time.time_ns(), None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+async def acatalog_version():
+    version = await cache.aget(CATALOG_VERSION_KEY)
+    if version is None:
+        await cache.aadd(CATALOG_VERSION_KEY, time.time_ns(), None)
+        version = await cache.aget(CATALOG_VERSION_KEY)
+    return version
+
+
+def _image_variants(image):
+    if not image:
+        return None
+    return {name: cloudinary_url(image, transformation) for name, transformation in IMAGE_VARIANTS.items()}
+
+
+async def _build_menu(version):
+    categories = [
+        {'id': category.id, 'name': category.name, 'slug': category.slug}
+        async for category in MenuCategory.objects.all()
+    ]
+    items = [
+        {
+            'id': item.id,
+            'name': item.name,
+            'category': item.category_id,
+            'price': item.price,
+            'tag': item.tag,
+            'featured': item.is_featured,
+            'image': _image_variants(item.image),
+        }
+        async for item in MenuItem.objects.available()
+    ]
+    return {'version': version, 'categories': categories, 'items': items}
+
+
+def _encode(menu):
+    body = json.dumps(menu, cls=DjangoJSONEncoder, separators=(',', ':')).encode()
+    document = {
+        'etag': f'"{hashlib.sha1(body).hexdigest()[:20]}"',
+        'identity': body,
+        'gzip': gzip.compress(body, compresslevel=9, mtime=0),
+    }
+    if brotli is not None:
+        document['br'] = brotli.compress(body, quality=11)
+    return document
+
+
+async def aget_menu_document():
+    """
+    Return the menu document for the current catalog version.
+
+    The result is a dict with the ``etag`` and the body under each
+    available content coding (``identity``, ``gzip`` and maybe ``br``).
+    """
+    version = await acatalog_version()
+    key = f'{MENU_DOCUMENT_KEY}:{version}'
+    document = await cache.aget(key)
+    if document is None:
+        document = _encode(await _build_menu(version))
+        # Old versions are never read again; let them expire
+        await cache.aset(key, document, 24 * 60 * 60)
+    return document
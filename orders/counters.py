@@ -0,0 +1,103 @@
+"""
+Cached counters for the admin dashboard.
+
+Each table is read with a single conditional-aggregation query and the
+combined result is cached for a short TTL. Signals in ``orders.signals``
+drop the cached value whenever an order, user or inquiry changes.
+"""
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from .models import ArchivedOrder, ContactInquiry, Order
+
+DASHBOARD_COUNTERS_KEY = 'orders:dashboard_counters'
+
+ACTIVE_ORDER_STATUSES = [
+    Order.Status.PENDING,
+    Order.Status.CONFIRMED,
+    Order.Status.PREPARING,
+]
+
+
+def local_day_bounds(day=None):
+    """Return aware (start, end) datetimes covering a local calendar day."""
+    day = day or timezone.localdate()
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, start + timedelta(days=1)
+
+
+def _counter_queries():
+    """Return ``(queryset, aggregates)`` pairs, one aggregate query per table."""
+    User = get_user_model()
+    today_start, today_end = local_day_bounds()
+    today = Q(created_at__gte=today_start, created_at__lt=today_end)
+
+    return [
+        (Order.objects.all(), {
+            'total_orders': Count('id'),
+            'pending_orders': Count('id', filter=Q(status__in=ACTIVE_ORDER_STATUSES)),
+            'today_orders': Count('id', filter=today),
+            'today_revenue': Sum('total_amount', filter=today),
+        }),
+        (User.objects.all(), {
+            'total_customers': Count('id', filter=Q(role=User.Roles.CUSTOMER)),
+        }),
+        (ContactInquiry.objects.all(), {
+            'total_inquiries': Count('id'),
+            'new_inquiries': Count('id', filter=Q(status=ContactInquiry.Status.NEW)),
+        }),
+    ]
+
+
+def _merge_counters(results, archived_orders):
+    counters = {}
+    for result in results:
+        counters.update(result)
+    counters['total_orders'] += archived_orders
+    counters['today_revenue'] = counters['today_revenue'] or 0
+    return counters
+
+
+def _counters_key():
+    return f'{DASHBOARD_COUNTERS_KEY}:{timezone.localdate().isoformat()}'
+
+
+def _compute_counters():
+    """Run one aggregate query per table and merge the results."""
+    results = [queryset.aggregate(**aggregates) for queryset, aggregates in _counter_queries()]
+    return _merge_counters(results, ArchivedOrder.objects.count())
+
+
+async def _acompute_counters():
+    results = [await queryset.aaggregate(**aggregates) for queryset, aggregates in _counter_queries()]
+    return _merge_counters(results, await ArchivedOrder.objects.acount())
+
+
+def get_dashboard_counters():
+    """Return the admin dashboard counters, served from cache when fresh."""
+    key = _counters_key()
+    counters = cache.get(key)
+    if counters is None:
+        counters = _compute_counters()
+        cache.set(key, counters, settings.DASHBOARD_COUNTERS_TTL)
+    return counters
+
+
+async def aget_dashboard_counters():
+    """Async counterpart of ``get_dashboard_counters`` for async views."""
+    key = _counters_key()
+    counters = await cache.aget(key)
+    if counters is None:
+        counters = await _acompute_counters()
+        await cache.aset(key, counters, settings.DASHBOARD_COUNTERS_TTL)
+    return counters
+
+
+def invalidate_dashboard_counters():
+    """Drop the cached counters so the next dashboard load recomputes them."""
+    cache.delete(_counters_key())
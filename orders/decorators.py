@@ -1,18 +1,49 @@
 """Custom decorators for access control."""
 
 from functools import wraps
+from asgiref.sync import iscoroutinefunction, sync_to_async
 from django.shortcuts import redirect
 from django.contrib import messages
+from django.contrib.auth import get_user
 from django.contrib.auth.decorators import login_required
+from django.contrib.auth.views import redirect_to_login
+
+
+async def aresolve_user(request):
+    """
+    Load ``request.user`` (and with it the session) off the event loop.
+
+    Async views call this before touching the user or the session, which
+    would otherwise run blocking queries inside the event loop.
+    """
+    request.user = await sync_to_async(get_user)(request)
+    return request.user
+
+
+def _is_admin(user):
+    # Allow superusers, staff, and users with admin role
+    return user.is_superuser or user.is_staff or user.is_admin_role
 
 
 def admin_required(view_func):
     """Decorator to restrict access to admin users only."""
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def async_wrapper(request, *args, **kwargs):
+            # login_required only supports sync views
+            await aresolve_user(request)
+            if not request.user.is_authenticated:
+                return redirect_to_login(request.get_full_path())
+            if not _is_admin(request.user):
+                messages.error(request, 'Access denied. Admin privileges required.')
+                return redirect('orders:dashboard')
+            return await view_func(request, *args, **kwargs)
+        return async_wrapper
+
     @wraps(view_func)
     @login_required
     def wrapper(request, *args, **kwargs):
-        # Allow superusers, staff, and users with admin role
-        if not (request.user.is_superuser or request.user.is_staff or request.user.is_admin_role):
+        if not _is_admin(request.user):
             messages.error(request, 'Access denied. Admin privileges required.')
             return redirect('orders:dashboard')
         return view_func(request, *args, **kwargs)
@@ -0,0 +1,194 @@
+"""
+Streaming CSV/JSON exports of orders, customers and report datasets.
+
+Orders and customers are read with ``values_list().iterator(chunk_size=...)``
+and passed through generators straight into the response, so memory stays
+flat no matter how many rows a date range covers and no model instances
+are built along the way. Report datasets are small grouped results.
+
+Under ASGI, ``StreamingHttpResponse`` reads a synchronous iterator into a
+list before sending anything, so the view wraps the lines in
+``aexport_lines``, which pulls them a batch at a time off the event loop.
+"""
+import csv
+from datetime import datetime
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from . import reports
+
+ORDER_FIELDS = [
+    'id', 'order_number', 'created_at', 'user__username', 'user__email',
+    'status', 'payment_method', 'delivery_location', 'phone', 'total_amount',
+]
+ORDER_ITEM_FIELDS = ['order_id', 'menu_item__name', 'quantity', 'price']
+
+ORDER_HEADER = [
+    'order_id', 'order_number', 'created_at', 'username', 'email',
+    'status', 'payment_method', 'delivery_location', 'phone', 'total_amount',
+]
+ORDER_ITEM_HEADER = ['item', 'quantity', 'price']
+
+CUSTOMER_HEADER = [
+    'id', 'username', 'first_name', 'last_name', 'email', 'phone',
+    'workplace', 'is_active', 'date_joined', 'total_orders', 'total_spent',
+    'last_order_at',
+]
+
+FORMATS = {
+    'csv': 'text/csv',
+    'json': 'application/json',
+}
+
+
+def _chunk_size():
+    return getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+
+
+def _clean(value):
+    """Normalize a database value for CSV output."""
+    if isinstance(value, datetime):
+        return timezone.localtime(value).isoformat()
+    return value
+
+
+def order_rows(start, end):
+    """
+    Yield ``(order, items)`` tuples for every order in the range.
+
+    Orders and their items are read by two iterators sorted on order id
+    and merged, so each order is emitted with its items without a query
+    per order. Archived orders follow the hot ones.
+    """
+    chunk_size = _chunk_size()
+    for order_model, item_model in zip(reports.ORDER_MODELS, reports.ORDER_ITEM_MODELS):
+        orders = reports.orders_in_range(start, end, order_model).order_by('id').values_list(
+            *ORDER_FIELDS
+        ).iterator(chunk_size=chunk_size)
+        items = reports.order_items_in_range(start, end, item_model).order_by('order_id', 'id').values_list(
+            *ORDER_ITEM_FIELDS
+        ).iterator(chunk_size=chunk_size)
+
+        pending = next(items, None)
+        for order in orders:
+            order_items = []
+            while pending is not None and pending[0] <= order[0]:
+                if pending[0] == order[0]:
+                    order_items.append(pending[1:])
+                pending = next(items, None)
+            yield order, order_items
+
+
+def customer_rows(start, end):
+    """Yield one tuple per customer with order stats for the range."""
+    User = get_user_model()
+    customers = User.objects.filter(role=User.Roles.CUSTOMER)
+    return reports.with_customer_stats(customers, start, end).order_by('id').values_list(
+        *CUSTOMER_HEADER
+    ).iterator(chunk_size=_chunk_size())
+
+
+def report_rows(dataset, start, end):
+    """Return ``(header, rows)`` for one of ``reports.REPORT_DATASETS``."""
+    build, header = reports.REPORT_DATASETS[dataset]
+    rows = (tuple(row[column] for column in header) for row in build(start, end))
+    return header, rows
+
+
+class _Echo:
+    """File-like object whose ``write`` returns the value, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def _csv_lines(header, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow([_clean(value) for value in row])
+
+
+def _json_lines(objects):
+    encoder = DjangoJSONEncoder()
+    yield '['
+    separator = '\n'
+    for obj in objects:
+        yield separator + encoder.encode(obj)
+        separator = ',\n'
+    yield '\n]\n'
+
+
+def _flat_order_rows(start, end):
+    empty_item = (None,) * len(ORDER_ITEM_HEADER)
+    for order, items in order_rows(start, end):
+        for item in items or [empty_item]:
+            yield order + tuple(item)
+
+
+def _nested_order_rows(start, end):
+    for order, items in order_rows(start, end):
+        row = dict(zip(ORDER_HEADER, order))
+        row['items'] = [dict(zip(ORDER_ITEM_HEADER, item)) for item in items]
+        yield row
+
+
+def export_lines(dataset, fmt, start, end):
+    """
+    Yield the encoded lines of ``dataset`` in ``fmt`` for ``[start, end)``.
+
+    Raises ``KeyError`` for an unknown dataset or format.
+    """
+    if fmt not in FORMATS:
+        raise KeyError(fmt)
+
+    if dataset == 'orders':
+        if fmt == 'csv':
+            return _csv_lines(ORDER_HEADER + ORDER_ITEM_HEADER, _flat_order_rows(start, end))
+        return _json_lines(_nested_order_rows(start, end))
+    if dataset == 'customers':
+        header, rows = CUSTOMER_HEADER, customer_rows(start, end)
+    else:
+        header, rows = report_rows(dataset, start, end)
+
+    if fmt == 'csv':
+        return _csv_lines(header, rows)
+    return _json_lines(dict(zip(header, row)) for row in rows)
+
+
+def _next_batch(lines, size):
+    """Join up to ``size`` lines of ``lines``; empty once it is exhausted."""
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= size:
+            break
+    return ''.join(batch)
+
+
+async def aexport_lines(lines, batch_size=None):
+    """
+    Serve the lines of ``export_lines`` as an async iterator.
+
+    Each batch is read in the sync thread (where the database cursor of the
+    underlying iterator lives), so at most one batch is held in memory.
+    """
+    batch_size = batch_size or getattr(settings, 'EXPORT_STREAM_BATCH', 500)
+    next_batch = sync_to_async(_next_batch)
+    try:
+        while True:
+            batch = await next_batch(lines, batch_size)
+            if not batch:
+                break
+            yield batch
+    finally:
+        # Close the generator (and its server-side cursor) in the sync thread
+        await sync_to_async(lines.close)()
+
+
+def available_datasets():
+    return ['orders', 'customers', *reports.REPORT_DATASETS]
@@ -0,0 +1,158 @@
+"""
+Next-day demand forecast per menu item and hour, for the kitchen prep sheet.
+
+The portions ordered over the last ``FORECAST_HISTORY_DAYS`` are read as one
+grouped row per item, day and hour (from the hot and archive tables, as in
+``orders.reports``) and scattered into a dense ``items x days x 24`` array.
+Everything after that is array arithmetic over all items at once:
+
+* a weekday index per item (the mean of each weekday over the mean day),
+  counting each item's days from its first sale;
+* simple exponential smoothing of the deseasonalized daily totals, computed
+  as one weighted sum with the smoothing weights
+  ``alpha * (1 - alpha) ** age`` instead of a loop over days;
+* the forecast day's total, ``level * weekday_index``, split over the hours
+  by the item's average hourly profile for that weekday (or for all days
+  when the item was never ordered on it).
+
+Forecasting 200 items from a year of history takes a few milliseconds;
+the grouped query dominates, so ``prep_sheet`` caches the result for an hour.
+"""
+from datetime import datetime, time, timedelta
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Sum
+from django.db.models.functions import ExtractHour, TruncDate
+from django.utils import timezone
+
+from .models import MenuItem, Order
+from .reports import ORDER_ITEM_MODELS, order_items_in_range
+
+PREP_SHEET_KEY = 'orders:prep_sheet'
+HOURS = 24
+
+
+def hourly_demand(start_date, end_date):
+    """``(menu_item_id, day, hour, quantity)`` rows for the days in ``[start_date, end_date)``."""
+    start = timezone.make_aware(datetime.combine(start_date, time.min))
+    end = timezone.make_aware(datetime.combine(end_date, time.min))
+    rows = []
+    for model in ORDER_ITEM_MODELS:
+        rows.extend(
+            order_items_in_range(start, end, model)
+            .exclude(order__status=Order.Status.CANCELLED)
+            .annotate(day=TruncDate('order__created_at'), hour=ExtractHour('order__created_at'))
+            .values_list('menu_item_id', 'day', 'hour')
+            .annotate(quantity=Sum('quantity'))
+            .order_by()
+        )
+    return rows
+
+
+def demand_array(rows, start_date, days):
+    """
+    Scatter grouped rows into a dense array.
+
+    Returns ``(item_ids, demand)`` with ``demand[item, day, hour]`` the
+    portions ordered, days counted from ``start_date``.
+    """
+    if not rows:
+        return np.zeros(0, dtype=np.int64), np.zeros((0, days, HOURS))
+    item_column, day_column, hour_column, quantity_column = zip(*rows)
+    item_ids, item_index = np.unique(np.array(item_column, dtype=np.int64), return_inverse=True)
+    # Ordinals convert an order of magnitude faster than datetime64 parsing
+    day_index = np.fromiter((day.toordinal() for day in day_column), dtype=np.int64, count=len(day_column))
+    day_index -= start_date.toordinal()
+    demand = np.zeros((len(item_ids), days, HOURS))
+    # The hot and archive tables may both have a row for the same cell
+    np.add.at(demand, (item_index, day_index, np.array(hour_column)), np.array(quantity_column, dtype=float))
+    return item_ids, demand
+
+
+def forecast(demand, first_weekday, target_weekday, alpha):
+    """
+    Expected portions per item and hour on a day with ``target_weekday``.
+
+    ``demand`` is ``items x days x 24`` of the complete days before the
+    forecast day; ``first_weekday`` is the weekday of its first day (Monday
+    is 0). Returns an ``items x 24`` array.
+    """
+    items, days, _ = demand.shape
+    if not items or not days:
+        return np.zeros((items, HOURS))
+    daily = demand.sum(axis=2)
+    weekdays = (first_weekday + np.arange(days)) % 7
+    weekday_days = np.eye(7)[weekdays]                       # days x 7, one-hot
+
+    # Each item's history starts at its first sale
+    first = (daily > 0).argmax(axis=1)
+    active = np.arange(days) >= first[:, None]               # items x days
+    active_daily = np.where(active, daily, 0)
+
+    # Weekday index: how each weekday compares with the average day
+    weekday_mean = (active_daily @ weekday_days) / (active @ weekday_days).clip(min=1)
+    overall_mean = active_daily.sum(axis=1, keepdims=True) / active.sum(axis=1, keepdims=True)
+    season = np.divide(weekday_mean, overall_mean, out=np.ones_like(weekday_mean), where=overall_mean > 0)
+
+    # Deseasonalize; days whose weekday never sells say nothing about the
+    # level, so they count as an average day
+    day_season = season[:, weekdays]
+    deseasonalized = np.divide(
+        daily, day_season,
+        out=np.broadcast_to(overall_mean, daily.shape).copy(), where=day_season > 0,
+    )
+
+    # Exponential smoothing with the level started at the first sale: days
+    # after it weigh alpha * (1 - alpha) ** age, the first day the rest
+    ages = np.arange(days - 1, -1, -1)
+    weights = np.where(active, alpha * (1 - alpha) ** ages, 0)
+    weights[np.arange(items), first] = (1 - alpha) ** ages[first]
+    level = (deseasonalized * weights).sum(axis=1)
+    total = level * season[:, target_weekday]
+
+    # Hourly profile of the target weekday, else of every day
+    target_hours = demand[:, weekdays == target_weekday, :].sum(axis=1)
+    all_hours = demand.sum(axis=1)
+    hours = np.where(target_hours.sum(axis=1, keepdims=True) > 0, target_hours, all_hours)
+    hour_totals = hours.sum(axis=1, keepdims=True)
+    profile = np.divide(hours, hour_totals, out=np.zeros_like(hours), where=hour_totals > 0)
+    return total[:, None] * profile
+
+
+def build_prep_sheet(target_date):
+    """The prep sheet for ``target_date``, from the complete days before it."""
+    # Today is not over yet; its orders so far would drag the level down
+    end_date = min(target_date, timezone.localdate())
+    days = settings.FORECAST_HISTORY_DAYS
+    start_date = end_date - timedelta(days=days)
+    item_ids, demand = demand_array(hourly_demand(start_date, end_date), start_date, days)
+    expected = forecast(demand, start_date.weekday(), target_date.weekday(), settings.FORECAST_SMOOTHING)
+
+    names = dict(MenuItem.objects.active().filter(id__in=item_ids.tolist()).values_list('id', 'name'))
+    totals = expected.sum(axis=1)
+    # Hours with at least a tenth of a portion expected across the menu
+    hours = np.flatnonzero(expected.sum(axis=0) >= 0.1).tolist()
+    rows = [
+        {
+            'name': names[item_id],
+            'hourly': [round(float(value), 1) for value in expected[row, hours]],
+            'total': round(float(totals[row]), 1),
+        }
+        for row, item_id in enumerate(item_ids.tolist())
+        if item_id in names and totals[row] >= 0.1
+    ]
+    rows.sort(key=lambda row: row['total'], reverse=True)
+    return {'date': target_date, 'hours': hours, 'rows': rows}
+
+
+def prep_sheet(target_date=None):
+    """The prep sheet for ``target_date`` (default: tomorrow), cached for an hour."""
+    target_date = target_date or timezone.localdate() + timedelta(days=1)
+    key = f'{PREP_SHEET_KEY}:{target_date.isoformat()}'
+    sheet = cache.get(key)
+    if sheet is None:
+        sheet = build_prep_sheet(target_date)
+        cache.set(key, sheet, 60 * 60)
+    return sheet
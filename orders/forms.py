@@ -1,15 +1,45 @@
 """Forms for the orders app."""
+from datetime import datetime
+
 from django import forms
 
 from .models import Order, MenuItem, MenuCategory, ContactInquiry
 
 
 class CheckoutForm(forms.ModelForm):
-    """Form for checkout process."""
+    """
+    Form for checkout process.
+
+    ``slot_loads`` (from ``orders.slots.slot_loads``) are the kitchen slots
+    offered; only those with room can be picked, the first by default.
+    """
+
+    slot_start = forms.TypedChoiceField(
+        label='Pickup/delivery time',
+        coerce=datetime.fromisoformat,
+        empty_value=None,
+        widget=forms.Select(attrs={
+            'class': 'w-full rounded-lg border border-gray-300 px-4 py-2 focus:border-primary focus:outline-none focus:ring-2 focus:ring-primary',
+        }),
+        error_messages={
+            'required': 'The kitchen is fully booked for now. Please try again later.',
+            'invalid_choice': 'That time has just been fully booked. Please pick another.',
+        },
+    )
+
+    def __init__(self, *args, slot_loads=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        choices = [
+            (load['start'].isoformat(), f"{load['start']:%H:%M}")
+            for load in slot_loads if load['has_room']
+        ]
+        self.fields['slot_start'].choices = choices
+        if choices:
+            self.fields['slot_start'].initial = choices[0][0]
 
     class Meta:
         model = Order
-        fields = ['payment_method', 'notes']
+        fields = ['payment_method', 'slot_start', 'notes']
         widgets = {
             'payment_method': forms.RadioSelect(attrs={
                 'class': 'space-y-2'
@@ -22,6 +52,22 @@ class CheckoutForm(forms.ModelForm):
         }
 
 
+class BulkMenuItemForm(forms.Form):
+    """Changes applied to many menu items at once; blank fields are left unchanged."""
+
+    is_available = forms.NullBooleanField(required=False)
+    is_featured = forms.NullBooleanField(required=False)
+    tag = forms.ChoiceField(choices=[('', 'Unchanged'), *MenuItem.Tags.choices], required=False)
+    price = forms.DecimalField(max_digits=8, decimal_places=2, min_value=0, required=False)
+
+    def changes(self):
+        """The fields to update, with their new values."""
+        return {
+            field: value for field, value in self.cleaned_data.items()
+            if value is not None and value != ''
+        }
+
+
 class MenuItemForm(forms.ModelForm):
     """Form for adding/editing menu items."""
 
@@ -33,7 +79,7 @@ class MenuItemForm(forms.ModelForm):
 
     class Meta:
         model = MenuItem
-        fields = ['name', 'description', 'price', 'category', 'image', 'is_available', 'is_featured', 'tag']
+        fields = ['name', 'description', 'price', 'category', 'image', 'is_available', 'is_featured', 'tag', 'daily_stock']
         widgets = {
             'name': forms.TextInput(attrs={
                 'class': 'w-full px-3 py-2 border border-gray-300 rounded-lg focus:ring-2 focus:ring-blue-500',
@@ -59,8 +105,40 @@ class MenuItemForm(forms.ModelForm):
             'tag': forms.Select(attrs={
                 'class': 'w-full px-3 py-2 border border-gray-300 rounded-lg focus:ring-2 focus:ring-blue-500'
             }),
+            'daily_stock': forms.NumberInput(attrs={
+                'class': 'w-full px-3 py-2 border border-gray-300 rounded-lg focus:ring-2 focus:ring-blue-500',
+                'placeholder': 'Unlimited',
+                'min': 0
+            }),
         }
 
+    def save(self, commit=True):
+        """
+        Save the item without writing back ``stock``.
+
+        Checkouts take stock with guarded ``UPDATE``s while the form is
+        open, so an edit only touches the other fields; restocks go through
+        ``orders.stock.restock``. A new item, or one whose stock starts
+        being tracked, starts with its ``daily_stock``.
+        """
+        item = super().save(commit=False)
+        if not commit:
+            return item
+        if item._state.adding:
+            item.stock = item.daily_stock
+            item.save()
+        else:
+            item.save(update_fields=[
+                field.name for field in item._meta.concrete_fields
+                if not field.primary_key and field.name != 'stock'
+            ])
+            if 'daily_stock' in self.changed_data and (item.daily_stock is None or self.initial['daily_stock'] is None):
+                # Untracked items have no stock to run out of
+                item.stock = item.daily_stock
+                MenuItem.objects.filter(id=item.id).update(stock=item.stock)
+        self._save_m2m()
+        return item
+
 
 
 class ContactForm(forms.ModelForm):
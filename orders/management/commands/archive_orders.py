@@ -0,0 +1,51 @@
+"""
+Management command to move old, finished orders into the archive tables.
+
+Schedule it (e.g. nightly) to keep the hot Order/OrderItem tables small.
+Each batch runs in its own short transaction.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from orders.archive import archive_batch, archive_cutoff
+
+
+class Command(BaseCommand):
+    help = 'Archive delivered/cancelled orders older than ORDER_ARCHIVE_AFTER_DAYS'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=settings.ORDER_ARCHIVE_AFTER_DAYS,
+            help=f'Archive orders older than this many days (default: {settings.ORDER_ARCHIVE_AFTER_DAYS})',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Orders moved per transaction (default: 500)',
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=0.05,
+            help='Seconds to sleep between batches (default: 0.05)',
+        )
+
+    def handle(self, *args, **options):
+        cutoff = archive_cutoff(options['days'])
+        total = 0
+        while True:
+            moved = archive_batch(cutoff, options['batch_size'])
+            if not moved:
+                break
+            total += moved
+            self.stdout.write(f'Archived {total} orders...')
+            if options['pause']:
+                time.sleep(options['pause'])
+
+        self.stdout.write(self.style.SUCCESS(f'Archived {total} orders older than {cutoff:%Y-%m-%d}'))
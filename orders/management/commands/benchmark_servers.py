@@ -0,0 +1,187 @@
+"""
+Management command to compare the sync (WSGI) and async (ASGI) deployments.
+
+Starts gunicorn with sync workers on ``smartkibadaski.wsgi`` and with
+uvicorn workers on ``smartkibadaski.asgi`` in turn, drives each with the
+same number of concurrent connections, and reports throughput and latency.
+``--slow-clients`` adds connections that trickle their request headers
+like a phone on a poor mobile link, which is what pins sync workers.
+
+Both servers load the settings in effect, so the middleware chain is the
+production one; the command warns when a sync-only middleware would make
+the ASGI server run every view in a thread.
+
+Run it against a migrated database with some menu data, e.g.:
+
+    python manage.py benchmark_servers --path /menu/ --concurrency 50 --slow-clients 4
+"""
+
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.module_loading import import_string
+
+SERVERS = {
+    'sync': ('smartkibadaski.wsgi:application', 'sync'),
+    'asgi': ('smartkibadaski.asgi:application', 'uvicorn.workers.UvicornWorker'),
+}
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def _request(host, port, path, timeout):
+    """Send one GET and return its status code, reading the whole response."""
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    try:
+        writer.write(f'GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n'.encode())
+        await writer.drain()
+        response = await asyncio.wait_for(reader.read(), timeout)
+    finally:
+        writer.close()
+    return int(response.split(b' ', 2)[1]) if response else 0
+
+
+async def _client(host, port, paths, deadline, timeout, results):
+    index = 0
+    while time.monotonic() < deadline:
+        path = paths[index % len(paths)]
+        index += 1
+        start = time.perf_counter()
+        try:
+            status = await _request(host, port, path, timeout)
+        except (OSError, asyncio.TimeoutError, ValueError, IndexError):
+            results['errors'] += 1
+            continue
+        results['latencies'].append(time.perf_counter() - start)
+        if not 200 <= status < 400:
+            results['bad_status'] += 1
+
+
+async def _slow_client(host, port, path, deadline):
+    """Hold a connection open, sending one header byte per second."""
+    while time.monotonic() < deadline:
+        try:
+            reader, writer = await asyncio.open_connection(host, port)
+        except OSError:
+            await asyncio.sleep(1)
+            continue
+        try:
+            writer.write(f'GET {path} HTTP/1.1\r\nHost: {host}\r\n'.encode())
+            while time.monotonic() < deadline and not reader.at_eof():
+                writer.write(b'X')
+                await writer.drain()
+                await asyncio.sleep(1)
+        except OSError:
+            pass
+        finally:
+            writer.close()
+
+
+async def run_load(host, port, paths, concurrency, slow_clients, duration, timeout):
+    results = {'latencies': [], 'errors': 0, 'bad_status': 0}
+    deadline = time.monotonic() + duration
+    await asyncio.gather(
+        *(_slow_client(host, port, paths[0], deadline) for _ in range(slow_clients)),
+        *(_client(host, port, paths, deadline, timeout, results) for _ in range(concurrency)),
+    )
+    return results
+
+
+class Command(BaseCommand):
+    help = 'Benchmark concurrent throughput of gunicorn sync workers vs uvicorn (ASGI) workers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', action='append', dest='paths', help='URL path to request (repeatable, default: /menu/)')
+        parser.add_argument('--servers', default='sync,asgi', help='Comma separated: sync, asgi (default: both)')
+        parser.add_argument('--workers', type=int, default=2, help='Gunicorn worker processes (default: 2)')
+        parser.add_argument('--concurrency', type=int, default=50, help='Concurrent connections (default: 50)')
+        parser.add_argument('--slow-clients', type=int, default=0, help='Connections trickling their headers (default: 0)')
+        parser.add_argument('--duration', type=float, default=10, help='Seconds of load per server (default: 10)')
+        parser.add_argument('--timeout', type=float, default=10, help='Per-request timeout in seconds (default: 10)')
+        parser.add_argument('--port', type=int, default=8765, help='Port the servers listen on (default: 8765)')
+
+    def handle(self, *args, **options):
+        paths = options['paths'] or ['/menu/']
+        names = [name.strip() for name in options['servers'].split(',') if name.strip()]
+        unknown = set(names) - set(SERVERS)
+        if unknown:
+            raise CommandError(f'Unknown servers: {", ".join(sorted(unknown))}')
+
+        sync_only = [path for path in settings.MIDDLEWARE if not getattr(import_string(path), 'async_capable', False)]
+        if sync_only:
+            self.stdout.write(self.style.WARNING(
+                f'Sync-only middleware, so the ASGI server runs every view in a thread: {", ".join(sync_only)}'
+            ))
+        self.stdout.write(
+            f'{options["concurrency"]} connections, {options["slow_clients"]} slow clients, '
+            f'{options["workers"]} workers, {options["duration"]:g}s per server, paths: {", ".join(paths)}'
+        )
+        for name in names:
+            with self._server(name, options['workers'], options['port']):
+                results = asyncio.run(run_load(
+                    '127.0.0.1', options['port'], paths, options['concurrency'],
+                    options['slow_clients'], options['duration'], options['timeout'],
+                ))
+            self._report(name, results, options['duration'])
+
+    def _server(self, name, workers, port):
+        app, worker_class = SERVERS[name]
+        command = [
+            sys.executable, '-m', 'gunicorn', app,
+            '--workers', str(workers),
+            '--worker-class', worker_class,
+            '--bind', f'127.0.0.1:{port}',
+            '--log-level', 'warning',
+        ]
+        return _ServerProcess(command, port)
+
+    def _report(self, name, results, duration):
+        latencies = sorted(results['latencies'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{name:>5}: {len(latencies) / duration:8.1f} req/s  '
+            f'p50 {percentile(latencies, 0.5) * 1000:7.1f} ms  '
+            f'p95 {percentile(latencies, 0.95) * 1000:7.1f} ms  '
+            f'p99 {percentile(latencies, 0.99) * 1000:7.1f} ms  '
+            f'errors {results["errors"]}  non-2xx/3xx {results["bad_status"]}'
+        ))
+
+
+class _ServerProcess:
+    """Context manager running a gunicorn server until its port accepts connections."""
+
+    def __init__(self, command, port, startup_timeout=20):
+        self.command = command
+        self.port = port
+        self.startup_timeout = startup_timeout
+
+    def __enter__(self):
+        self.process = subprocess.Popen(self.command, cwd=settings.BASE_DIR, env=os.environ.copy())
+        deadline = time.monotonic() + self.startup_timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise CommandError(f'Server exited during startup: {" ".join(self.command)}')
+            try:
+                socket.create_connection(('127.0.0.1', self.port), timeout=0.5).close()
+                return self
+            except OSError:
+                time.sleep(0.2)
+        self.process.terminate()
+        raise CommandError(f'Server did not start listening on port {self.port}')
+
+    def __exit__(self, *exc_info):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
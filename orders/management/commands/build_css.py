@@ -0,0 +1,68 @@
+"""
+Management command to compile the Tailwind CSS bundles.
+
+Runs the standalone Tailwind CLI (installed on first use by pytailwindcss,
+which bundles the forms/typography plugins) over the templates for each
+bundle in ``settings.TAILWIND_BUNDLES`` and writes purged, minified CSS to
+``static/``. Run it before ``collectstatic`` (see build.sh), which gives the
+files content-hashed names that WhiteNoise serves as immutable.
+"""
+
+import os
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Compile the purged, minified Tailwind CSS bundles into static/'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--cli',
+            help='Path to a tailwindcss executable (default: install one with pytailwindcss)',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            import pytailwindcss
+        except ImportError:
+            raise CommandError('pytailwindcss is not installed (pip install -r requirements-prod.txt)')
+
+        static_dir = Path(settings.STATICFILES_DIRS[0])
+        for bundle, config in settings.TAILWIND_BUNDLES.items():
+            output = static_dir / config['output']
+            output.parent.mkdir(parents=True, exist_ok=True)
+
+            # Write next to the target and rename, so a failed build never
+            # leaves a truncated stylesheet behind
+            with tempfile.NamedTemporaryFile(dir=output.parent, suffix='.css', delete=False) as tmp:
+                tmp_path = Path(tmp.name)
+            try:
+                result = pytailwindcss.run(
+                    [
+                        '--config', str(settings.TAILWIND_DIR / f'{bundle}.config.js'),
+                        '--input', str(settings.TAILWIND_DIR / 'input.css'),
+                        '--output', str(tmp_path),
+                        '--minify',
+                    ],
+                    cwd=settings.BASE_DIR,
+                    bin_path=Path(options['cli']) if options['cli'] else None,
+                    env=os.environ.copy(),
+                    live_output=True,
+                    auto_install=True,
+                    version=settings.TAILWIND_CLI_VERSION,
+                )
+                if result.returncode != 0:
+                    raise CommandError(f'Tailwind build of the {bundle} bundle failed')
+                tmp_path.replace(output)
+            except OSError as exc:
+                raise CommandError(f'Could not build the {bundle} bundle: {exc}')
+            finally:
+                tmp_path.unlink(missing_ok=True)
+
+            self.stdout.write(self.style.SUCCESS(
+                f'Built {bundle} bundle: {output.relative_to(settings.BASE_DIR)} ({output.stat().st_size / 1024:.1f} KiB)'
+            ))
@@ -0,0 +1,27 @@
+"""
+Management command to rebuild the "frequently ordered together" suggestions.
+
+Schedule it nightly (e.g. a cron job after closing). It recounts which
+items share orders and writes the best neighbours of each item to
+``settings.RECOMMENDATIONS_FILE``; running processes pick the new file up
+on their next lookup.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from orders.recommendations import build_recommendations
+
+
+class Command(BaseCommand):
+    help = 'Recount item co-occurrences and store the top neighbours of each menu item'
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        items = build_recommendations()
+        self.stdout.write(self.style.SUCCESS(
+            f'Stored neighbours of {items} menu item(s) in {settings.RECOMMENDATIONS_FILE} '
+            f'({time.perf_counter() - start:.2f}s)'
+        ))
@@ -0,0 +1,31 @@
+"""
+Management command to rebuild the popularity ranking of menu items.
+
+Schedule it every hour or so (e.g. a cron job). It scores every item
+ordered in the last ``POPULARITY_WINDOW_DAYS`` with recent orders weighing
+most, and the homepage picks up the new ranking straight away.
+"""
+
+from django.core.management.base import BaseCommand
+
+from orders.models import MenuItemPopularity
+from orders.popularity import compute_popularity
+
+
+class Command(BaseCommand):
+    help = 'Recompute the time-decayed popularity ranking of menu items'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--show',
+            type=int,
+            default=0,
+            metavar='N',
+            help='Print the top N items after computing',
+        )
+
+    def handle(self, *args, **options):
+        ranked = compute_popularity()
+        self.stdout.write(self.style.SUCCESS(f'Ranked {ranked} menu item(s)'))
+        for entry in MenuItemPopularity.objects.select_related('menu_item')[:options['show']]:
+            self.stdout.write(f'  {entry.score:8.2f}  {entry.quantity:6d}  {entry.menu_item.name}')
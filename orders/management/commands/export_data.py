@@ -0,0 +1,57 @@
+"""
+Management command to export orders, customers or report data.
+
+Rows are streamed to the output file as they are read, so a full year of
+orders can be exported without loading it into memory.
+"""
+
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from orders import exports, reports
+
+
+class Command(BaseCommand):
+    help = 'Stream orders, customers or a report dataset to CSV or JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'dataset',
+            choices=exports.available_datasets(),
+            help='What to export',
+        )
+        parser.add_argument(
+            '--format',
+            choices=list(exports.FORMATS),
+            default='csv',
+            help='Output format (default: csv)',
+        )
+        parser.add_argument('--start', help='First day to include (YYYY-MM-DD)')
+        parser.add_argument('--end', help='Last day to include (YYYY-MM-DD)')
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=30,
+            help='Days to export when --start is not given (default: 30)',
+        )
+        parser.add_argument(
+            '--output',
+            help='File to write to (default: stdout)',
+        )
+
+    def handle(self, *args, **options):
+        start, end = reports.parse_date_range(
+            options['start'], options['end'], default_days=options['days']
+        )
+        try:
+            lines = exports.export_lines(options['dataset'], options['format'], start, end)
+        except KeyError as exc:
+            raise CommandError(f'Unknown export: {exc}')
+
+        if options['output']:
+            with open(options['output'], 'w', newline='', encoding='utf-8') as output:
+                output.writelines(lines)
+            self.stderr.write(self.style.SUCCESS(f"Exported {options['dataset']} to {options['output']}"))
+        else:
+            sys.stdout.writelines(lines)
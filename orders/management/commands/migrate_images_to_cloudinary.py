@@ -6,6 +6,7 @@ Run this after deploying to production to ensure all images are uploaded to Clou
 from django.core.management.base import BaseCommand
 from django.conf import settings
 from django.core.files.base import ContentFile
+from orders.media import configure_cloudinary
 from orders.models import MenuItem
 import os
 import requests
@@ -40,6 +41,8 @@ class Command(BaseCommand):
             )
             return
 
+        configure_cloudinary()
+
         self.stdout.write('=== DEBUG INFO ===')
         self.stdout.write(f'DEFAULT_FILE_STORAGE: {getattr(settings, "DEFAULT_FILE_STORAGE", "Not set")}')
         self.stdout.write(f'MEDIA_URL: {settings.MEDIA_URL}')
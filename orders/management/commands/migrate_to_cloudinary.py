@@ -1,6 +1,7 @@
 import os
 from django.core.management.base import BaseCommand
 from django.conf import settings
+from orders.media import configure_cloudinary
 from orders.models import MenuItem
 import cloudinary.uploader
 
@@ -20,6 +21,7 @@ class Command(BaseCommand):
             )
             return
 
+        configure_cloudinary()
         self.stdout.write('Starting Cloudinary migration...')
         migrated_count = 0
         failed_count = 0
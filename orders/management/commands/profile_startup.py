@@ -0,0 +1,98 @@
+"""
+Management command to profile how long the ASGI application takes to import.
+
+Loads ``settings.ASGI_APPLICATION``, which the uvicorn workers serve, in a
+fresh interpreter started with ``python -X importtime`` and summarizes the slowest imports and the
+packages that account for most of the boot time, which is what every
+gunicorn worker pays when it starts or is recycled after ``max_requests``.
+"""
+
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+LOAD_SNIPPET = (
+    'import time, importlib; '
+    'start = time.perf_counter(); '
+    'module = importlib.import_module({module!r}); '
+    'getattr(module, {attr!r}); '
+    'print(time.perf_counter() - start)'
+)
+
+
+def parse_importtime(output):
+    """
+    Parse ``-X importtime`` output into ``(name, depth, self_us, cumulative_us)``.
+
+    Depth is the nesting level of the import (0 for imports made directly
+    by the profiled code).
+    """
+    rows = []
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue  # header line
+        name = parts[2].rstrip()
+        stripped = name.lstrip()
+        rows.append((stripped, (len(name) - len(stripped) - 1) // 2, int(parts[0]), int(parts[1])))
+    return rows
+
+
+class Command(BaseCommand):
+    help = 'Report cumulative import costs of the ASGI application (like python -X importtime)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=25,
+            help='Rows shown in each table (default: 25)',
+        )
+        parser.add_argument(
+            '--runs',
+            type=int,
+            default=3,
+            help='Fresh interpreters to start; the fastest run is reported (default: 3)',
+        )
+
+    def handle(self, *args, **options):
+        module, _, attr = settings.ASGI_APPLICATION.rpartition('.')
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'smartkibadaski.settings')}
+        command = [sys.executable, '-X', 'importtime', '-c', LOAD_SNIPPET.format(module=module, attr=attr)]
+
+        best = None
+        for _ in range(max(options['runs'], 1)):
+            result = subprocess.run(command, cwd=settings.BASE_DIR, env=env, capture_output=True, text=True)
+            if result.returncode != 0:
+                raise CommandError(f'Loading {settings.ASGI_APPLICATION} failed:\n{result.stderr[-2000:]}')
+            elapsed = float(result.stdout.strip().splitlines()[-1])
+            if best is None or elapsed < best[0]:
+                best = (elapsed, parse_importtime(result.stderr))
+
+        elapsed, rows = best
+        limit = options['limit']
+        self.stdout.write(self.style.SUCCESS(
+            f'{settings.ASGI_APPLICATION} loaded in {elapsed * 1000:.1f} ms '
+            f'({len(rows)} modules imported, fastest of {options["runs"]} runs)'
+        ))
+
+        self.stdout.write('\nSlowest imports (cumulative ms, self ms):')
+        for name, depth, self_us, cumulative_us in sorted(rows, key=lambda row: row[3], reverse=True)[:limit]:
+            self.stdout.write(f'  {cumulative_us / 1000:8.1f} {self_us / 1000:8.1f}  {"  " * depth}{name}')
+
+        packages = defaultdict(lambda: [0, 0])
+        for name, depth, self_us, cumulative_us in rows:
+            package = packages[name.split('.')[0]]
+            package[0] += self_us
+            package[1] += 1
+        total_us = sum(self_us for _, _, self_us, _ in rows) or 1
+
+        self.stdout.write('\nTime by top-level package (self ms, share, modules):')
+        for package, (self_us, count) in sorted(packages.items(), key=lambda item: item[1][0], reverse=True)[:limit]:
+            self.stdout.write(f'  {self_us / 1000:8.1f} {self_us * 100 / total_us:5.1f}%  {count:4d}  {package}')
@@ -0,0 +1,85 @@
+"""
+Management command to permanently delete archived menu items.
+
+Order lines that reference an item are deleted in small batches, each in
+its own short transaction, so the SQLite write lock is released between
+batches and checkout is never stalled behind one huge DELETE.
+"""
+
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from orders.models import ArchivedOrderItem, MenuItem, OrderItem
+
+
+class Command(BaseCommand):
+    help = 'Delete archived menu items (and their order lines) in bounded batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than-days',
+            type=int,
+            default=30,
+            help='Only purge items archived at least this many days ago (default: 30)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Order lines deleted per transaction (default: 500)',
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=0.05,
+            help='Seconds to sleep between batches (default: 0.05)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report what would be deleted',
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['older_than_days'])
+        items = MenuItem.objects.filter(is_archived=True, archived_at__lte=cutoff)
+
+        purged = 0
+        for item_id, name in items.values_list('id', 'name'):
+            if options['dry_run']:
+                lines = sum(
+                    model.objects.filter(menu_item_id=item_id).count()
+                    for model in (OrderItem, ArchivedOrderItem)
+                )
+                self.stdout.write(f'Would purge {name} ({lines} order lines)')
+                continue
+
+            lines = sum(
+                self._delete_order_lines(model, item_id, options['batch_size'], options['pause'])
+                for model in (OrderItem, ArchivedOrderItem)
+            )
+            with transaction.atomic():
+                MenuItem.objects.filter(id=item_id, is_archived=True).delete()
+            purged += 1
+            self.stdout.write(f'Purged {name} ({lines} order lines)')
+
+        if not options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f'Purged {purged} archived menu items'))
+
+    def _delete_order_lines(self, model, item_id, batch_size, pause):
+        deleted = 0
+        while True:
+            batch = list(
+                model.objects.filter(menu_item_id=item_id)
+                .values_list('id', flat=True)[:batch_size]
+            )
+            if not batch:
+                return deleted
+            with transaction.atomic():
+                deleted += model.objects.filter(id__in=batch).delete()[0]
+            if pause:
+                time.sleep(pause)
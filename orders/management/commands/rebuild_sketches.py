@@ -0,0 +1,47 @@
+"""
+Management command to rebuild the daily quantile sketches from the order history.
+
+The sketches are normally maintained as orders are placed and delivered;
+run this once after deploying them, or after restoring a backup. Order
+values come from live and archived orders, delivery times from their
+status events.
+"""
+
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from orders.models import ArchivedOrder, ArchivedOrderStatusEvent, DailySketch, Order, OrderStatusEvent
+from orders.sketches import QuantileSketch
+
+
+class Command(BaseCommand):
+    help = 'Rebuild DailySketch rows from orders and delivery events'
+
+    def handle(self, *args, **options):
+        sketches = defaultdict(QuantileSketch)
+
+        for model in (Order, ArchivedOrder):
+            for created_at, total in model.objects.values_list('created_at', 'total_amount').iterator():
+                sketches[(timezone.localdate(created_at), DailySketch.Metric.ORDER_VALUE)].add(total)
+
+        for model in (OrderStatusEvent, ArchivedOrderStatusEvent):
+            deliveries = model.objects.filter(
+                status=Order.Status.DELIVERED,
+            ).values_list('created_at', 'order__created_at')
+            for delivered_at, placed_at in deliveries.iterator():
+                sketches[(timezone.localdate(delivered_at), DailySketch.Metric.DELIVERY_TIME)].add(
+                    max((delivered_at - placed_at).total_seconds(), 0)
+                )
+
+        rows = [
+            DailySketch(day=day, metric=metric, count=sketch.count, data=sketch.to_dict())
+            for (day, metric), sketch in sketches.items()
+        ]
+        with transaction.atomic():
+            DailySketch.objects.all().delete()
+            DailySketch.objects.bulk_create(rows, batch_size=1000)
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {len(rows)} daily sketches'))
@@ -0,0 +1,19 @@
+"""
+Management command to refill the daily stock of menu items.
+
+Schedule it once a day before service (e.g. a cron job at 5am). Items with
+a daily stock get it back in full, and items that sold out become
+available again.
+"""
+
+from django.core.management.base import BaseCommand
+
+from orders.stock import reset_daily_stock
+
+
+class Command(BaseCommand):
+    help = 'Refill stock to daily_stock for every menu item that tracks stock'
+
+    def handle(self, *args, **options):
+        updated = reset_daily_stock()
+        self.stdout.write(self.style.SUCCESS(f'Refilled stock of {updated} menu item(s)'))
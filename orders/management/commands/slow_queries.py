@@ -0,0 +1,79 @@
+"""
+Management command to summarize the slow-query log.
+
+Lists the fingerprints recorded by ``orders.slow_queries`` (queries slower
+than ``settings.SLOW_QUERY_MS``), worst first, with their latest call site
+and, with ``--plans``, the query plan captured for each.
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from orders.slow_queries import clear_records, load_records
+
+SORT_KEYS = {
+    'total': 'total_ms',
+    'max': 'max_ms',
+    'count': 'count',
+}
+
+
+class Command(BaseCommand):
+    help = 'Summarize the slowest recorded queries with their call sites and plans'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sort',
+            choices=sorted(SORT_KEYS),
+            default='total',
+            help='Order by total time, worst single run or occurrences (default: total)',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=10,
+            help='Fingerprints shown (default: 10)',
+        )
+        parser.add_argument(
+            '--plans',
+            action='store_true',
+            help='Show the query plan of each fingerprint',
+        )
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='Delete the recorded queries instead of listing them',
+        )
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            clear_records()
+            self.stdout.write(self.style.SUCCESS('Slow-query log cleared'))
+            return
+
+        records = load_records()
+        if not records:
+            self.stdout.write(f'No queries slower than {settings.SLOW_QUERY_MS:g} ms recorded in {settings.SLOW_QUERY_DIR}')
+            return
+
+        key = SORT_KEYS[options['sort']]
+        records.sort(key=lambda entry: entry[key], reverse=True)
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(records)} slow query fingerprints (threshold {settings.SLOW_QUERY_MS:g} ms), by {options["sort"]}:'
+        ))
+        for entry in records[:options['limit']]:
+            last = entry['last']
+            self.stdout.write(
+                f'\n{entry["fingerprint"]}  {entry["count"]}x  total {entry["total_ms"]:.1f} ms  '
+                f'max {entry["max_ms"]:.1f} ms  avg {entry["total_ms"] / entry["count"]:.1f} ms'
+            )
+            self.stdout.write(f'  {entry["sql"][:300]}')
+            self.stdout.write(f'  view: {last["view"]}  site: {last["site"]}')
+            if last['template']:
+                self.stdout.write(f'  template: {last["template"]}')
+            if last['params']:
+                self.stdout.write(f'  params: {", ".join(last["params"])[:300]}')
+            if options['plans'] and entry['plan']:
+                self.stdout.write('  plan:')
+                for line in entry['plan']:
+                    self.stdout.write(f'    {line}')
@@ -0,0 +1,30 @@
+"""
+Lazy Cloudinary configuration.
+
+The SDK is configured from ``settings.CLOUDINARY_STORAGE`` the first time an
+image URL is built or an image is uploaded rather than while settings load,
+so processes that never touch images (workers recycled after
+``max_requests``, management commands) skip it.
+"""
+from django.conf import settings
+
+_configured = False
+
+
+def configure_cloudinary():
+    """Configure the Cloudinary SDK once per process, if credentials are set."""
+    global _configured
+    if _configured:
+        return
+
+    credentials = getattr(settings, 'CLOUDINARY_STORAGE', {})
+    if all(credentials.get(key) for key in ('CLOUD_NAME', 'API_KEY', 'API_SECRET')):
+        import cloudinary
+
+        cloudinary.config(
+            cloud_name=credentials['CLOUD_NAME'],
+            api_key=credentials['API_KEY'],
+            api_secret=credentials['API_SECRET'],
+            secure=True
+        )
+    _configured = True
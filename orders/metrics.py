@@ -0,0 +1,304 @@
+"""
+Application metrics shared by every gunicorn worker.
+
+Each process writes its samples to its own memory-mapped file in
+``settings.METRICS_DIR`` (``<pid>.db``), so recording is a dict lookup
+and a ``struct.pack_into`` with no locking between processes. The
+``/metrics`` view reads every file, sums the samples and renders them
+in the Prometheus text format. When a worker exits, gunicorn's master
+folds its file into ``aggregate.db`` and deletes it (``merge_process``),
+so counters never go backwards and the directory holds one file per live
+worker plus the aggregate however often workers are recycled. Gunicorn
+clears the directory when it starts (see ``gunicorn.conf.py``).
+
+Only server workers record: gunicorn sets ``METRICS_RECORD=1`` in each
+worker after forking it. Management commands, shells and the test runner
+leave no file behind, since nothing would ever fold it into the aggregate.
+Set the variable by hand to record under ``runserver``.
+
+Recorded here:
+
+* ``http_requests_total`` and the ``http_request_duration_seconds``
+  histogram per URL name, from ``MetricsMiddleware``;
+* ``orders_placed_total`` (``rate(orders_placed_total[1m]) * 60`` gives
+  orders per minute);
+* ``cart_operations_total`` per operation;
+* ``cache_requests_total`` by hit or miss, from ``orders.cache_backends``.
+"""
+import mmap
+import os
+import struct
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+# Families exposed by /metrics: name -> (type, help)
+FAMILIES = {
+    'http_requests_total': ('counter', 'HTTP responses by URL name, method and status code.'),
+    'http_request_duration_seconds': ('histogram', 'Time spent handling requests, by URL name.'),
+    'orders_placed_total': ('counter', 'Orders placed at checkout.'),
+    'cart_operations_total': ('counter', 'Cart changes by operation.'),
+    'cache_requests_total': ('counter', 'Cache reads by result (hit or miss).'),
+}
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_HEADER = struct.Struct('Q')   # bytes of the file in use
+_LENGTH = struct.Struct('I')   # key length, followed by the key and padding
+_VALUE = struct.Struct('d')
+_INITIAL_SIZE = 64 * 1024
+AGGREGATE_FILE = 'aggregate.db'
+RECORD_ENV = 'METRICS_RECORD'
+
+
+def _padded(length):
+    # Keep every value 8-byte aligned, as the entries start aligned
+    return length + (-(length + _LENGTH.size) % 8)
+
+
+def _entries(data):
+    """Yield ``(key, value, value_offset)`` for the entries of a store file."""
+    used = _HEADER.unpack_from(data, 0)[0]
+    offset = _HEADER.size
+    while offset < used:
+        length = _LENGTH.unpack_from(data, offset)[0]
+        key = bytes(data[offset + _LENGTH.size:offset + _LENGTH.size + length]).decode()
+        value_offset = offset + _LENGTH.size + _padded(length)
+        yield key, _VALUE.unpack_from(data, value_offset)[0], value_offset
+        offset = value_offset + _VALUE.size
+
+
+class FileStore:
+    """Append-only ``key -> float`` map in a memory-mapped file, written by one process."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._file = open(self.path, 'a+b')
+        if os.fstat(self._file.fileno()).st_size == 0:
+            self._file.truncate(_INITIAL_SIZE)
+        self._map = mmap.mmap(self._file.fileno(), 0)
+        self._used = _HEADER.unpack_from(self._map, 0)[0] or _HEADER.size
+        # A recycled pid reopens the file of an exited worker and carries on
+        self._offsets = {key: offset for key, _, offset in _entries(self._map)}
+
+    def inc(self, key, amount=1.0):
+        with self._lock:
+            offset = self._offsets.get(key)
+            if offset is None:
+                offset = self._append(key)
+            value = _VALUE.unpack_from(self._map, offset)[0]
+            _VALUE.pack_into(self._map, offset, value + amount)
+
+    def _append(self, key):
+        encoded = key.encode()
+        value_offset = self._used + _LENGTH.size + _padded(len(encoded))
+        end = value_offset + _VALUE.size
+        size = len(self._map)
+        if end > size:
+            self._map.close()
+            self._file.truncate(max(size * 2, end))
+            self._map = mmap.mmap(self._file.fileno(), 0)
+        _LENGTH.pack_into(self._map, self._used, len(encoded))
+        self._map[self._used + _LENGTH.size:self._used + _LENGTH.size + len(encoded)] = encoded
+        _VALUE.pack_into(self._map, value_offset, 0.0)
+        # Publish the entry to readers only once it is complete
+        _HEADER.pack_into(self._map, 0, end)
+        self._used = end
+        self._offsets[key] = value_offset
+        return value_offset
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+_store = None
+_store_pid = None
+_store_lock = threading.Lock()
+
+
+def store():
+    """
+    The store of the current process, opened on first use (and again after a fork).
+
+    ``None`` outside server workers, which do not record.
+    """
+    global _store, _store_pid
+    pid = os.getpid()
+    if _store_pid != pid:
+        with _store_lock:
+            if _store_pid != pid:
+                if os.environ.get(RECORD_ENV) == '1':
+                    _store = FileStore(Path(settings.METRICS_DIR) / f'{pid}.db')
+                else:
+                    _store = None
+                _store_pid = pid
+    return _store
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _labels(labels):
+    return ','.join(f'{label}="{_escape(value)}"' for label, value in sorted(labels.items()))
+
+
+def sample_key(name, **labels):
+    return f'{name}{{{_labels(labels)}}}' if labels else name
+
+
+def inc(name, amount=1, **labels):
+    """Add ``amount`` to a counter."""
+    target = store()
+    if target is not None:
+        target.inc(sample_key(name, **labels), amount)
+
+
+def observe(name, value, **labels):
+    """Record ``value`` in a histogram (each bucket is counted once, cumulated on export)."""
+    target = store()
+    if target is None:
+        return
+    bucket = bisect_left(LATENCY_BUCKETS, value)
+    le = LATENCY_BUCKETS[bucket] if bucket < len(LATENCY_BUCKETS) else '+Inf'
+    pairs = _labels(labels)
+    # le always comes last, so the export can split it off
+    target.inc(f'{name}_bucket{{{pairs + "," if pairs else ""}le="{le}"}}')
+    target.inc(sample_key(f'{name}_sum', **labels), value)
+    target.inc(sample_key(f'{name}_count', **labels))
+
+
+def collect():
+    """Sum the samples of every worker's store into ``{key: value}``."""
+    totals = defaultdict(float)
+    directory = Path(settings.METRICS_DIR)
+    if not directory.is_dir():
+        return totals
+    for path in directory.glob('*.db'):
+        try:
+            data = path.read_bytes()
+        except OSError:
+            continue
+        if len(data) < _HEADER.size:
+            continue
+        for key, value, _ in _entries(data):
+            totals[key] += value
+    return totals
+
+
+def merge_process(pid, directory):
+    """
+    Add the samples of the exited process ``pid`` to the aggregate file and delete its file.
+
+    Only gunicorn's master calls this (``child_exit``), so the aggregate
+    file, like every other, has a single writer.
+    """
+    path = Path(directory) / f'{pid}.db'
+    try:
+        data = path.read_bytes()
+    except FileNotFoundError:
+        return
+    if len(data) >= _HEADER.size:
+        aggregate = FileStore(Path(directory) / AGGREGATE_FILE)
+        try:
+            for key, value, _ in _entries(data):
+                aggregate.inc(key, value)
+        finally:
+            aggregate.close()
+    path.unlink()
+
+
+def _family(key):
+    name = key.partition('{')[0]
+    for suffix in ('_bucket', '_sum', '_count'):
+        base = name[:-len(suffix)]
+        if name.endswith(suffix) and FAMILIES.get(base, ('',))[0] == 'histogram':
+            return base
+    return name
+
+
+def _format_value(value):
+    return repr(int(value)) if value.is_integer() else repr(value)
+
+
+def _histogram_lines(name, samples):
+    # Buckets are stored per bound; Prometheus wants them cumulative, with
+    # every bound present
+    series = defaultdict(lambda: {'buckets': {}, '_sum': 0.0, '_count': 0.0})
+    for key, value in samples.items():
+        sample_name, _, pairs = key.partition('{')
+        pairs = pairs.rstrip('}')
+        if sample_name.endswith('_bucket'):
+            pairs, _, le = pairs.rpartition('le=')
+            series[pairs.rstrip(',')]['buckets'][le.strip('"')] = value
+        else:
+            series[pairs][sample_name[len(name):]] = value
+
+    lines = []
+    for pairs, parts in sorted(series.items()):
+        running = 0.0
+        for bound in [*LATENCY_BUCKETS, '+Inf']:
+            running += parts['buckets'].get(str(bound), 0.0)
+            lines.append(f'{name}_bucket{{{pairs + "," if pairs else ""}le="{bound}"}} {_format_value(running)}')
+        braces = f'{{{pairs}}}' if pairs else ''
+        lines.append(f'{name}_sum{braces} {_format_value(parts["_sum"])}')
+        lines.append(f'{name}_count{braces} {_format_value(parts["_count"])}')
+    return lines
+
+
+def render_prometheus():
+    """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+    by_family = defaultdict(dict)
+    for key, value in collect().items():
+        by_family[_family(key)][key] = value
+
+    lines = []
+    for name, (kind, help_text) in FAMILIES.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        samples = by_family.get(name, {})
+        if kind == 'histogram':
+            lines.extend(_histogram_lines(name, samples))
+        else:
+            lines.extend(f'{key} {_format_value(value)}' for key, value in sorted(samples.items()))
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsMiddleware:
+    """Count responses and time requests per URL name."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        start = time.perf_counter()
+        response = self.get_response(request)
+        self._record(request, response, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        response = await self.get_response(request)
+        self._record(request, response, time.perf_counter() - start)
+        return response
+
+    @staticmethod
+    def _record(request, response, duration):
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        inc('http_requests_total', view=view, method=request.method, status=response.status_code)
+        observe('http_request_duration_seconds', duration, view=view)
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-19 02:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0009_order_status_events'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='menuitem',
+            name='archived_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='menuitem',
+            name='is_archived',
+            field=models.BooleanField(db_index=True, default=False),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0011_order_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='menuitem',
+            name='daily_stock',
+            field=models.PositiveIntegerField(blank=True, help_text='Portions per day; leave blank for unlimited.', null=True),
+        ),
+        migrations.AddField(
+            model_name='menuitem',
+            name='stock',
+            field=models.PositiveIntegerField(blank=True, help_text='Portions left today.', null=True),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0012_menuitem_stock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KitchenSlot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start', models.DateTimeField(unique=True)),
+                ('orders', models.PositiveIntegerField(default=0)),
+                ('items', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['start'],
+            },
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='slot_start',
+            field=models.DateTimeField(blank=True, db_index=True, help_text='Start of the kitchen slot the order was booked into.', null=True),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:22
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0013_kitchen_slots'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MenuItemPopularity',
+            fields=[
+                ('menu_item', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='popularity', serialize=False, to='orders.menuitem')),
+                ('score', models.FloatField(db_index=True)),
+                ('quantity', models.PositiveIntegerField(default=0, help_text='Portions ordered within the window.')),
+                ('computed_at', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name_plural': 'Menu item popularity',
+                'ordering': ['-score'],
+            },
+        ),
+    ]
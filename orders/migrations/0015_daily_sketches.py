@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0014_menuitem_popularity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySketch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('metric', models.CharField(choices=[('order_value', 'Order value'), ('delivery_time', 'Time to delivery (seconds)')], max_length=20)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('data', models.JSONField(default=dict)),
+            ],
+            options={
+                'ordering': ['day', 'metric'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailysketch',
+            constraint=models.UniqueConstraint(fields=('day', 'metric'), name='unique_sketch_day_metric'),
+        ),
+    ]
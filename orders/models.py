@@ -1,10 +1,7 @@
 from django.conf import settings
 from django.db import models
+from django.utils import timezone
 from django.utils.text import slugify
-from django.core.mail import send_mail
-from django.template.loader import render_to_string
-
-
 
 from cloudinary.models import CloudinaryField
 
@@ -27,6 +24,16 @@ class MenuCategory(models.Model):
         super().save(*args, **kwargs)
 
 
+class MenuItemQuerySet(models.QuerySet):
+    def active(self):
+        """Items that have not been archived."""
+        return self.filter(is_archived=False)
+
+    def available(self):
+        """Items customers can currently order."""
+        return self.filter(is_archived=False, is_available=True)
+
+
 class MenuItem(models.Model):
     """Single dish that can be ordered from the hotel menu."""
 
@@ -50,8 +57,21 @@ class MenuItem(models.Model):
         default=Tags.NONE,
         help_text="Used for badges like Popular / New.",
     )
+    # Optional portions per day. ``stock`` is what is left today: checkout
+    # decrements it (see orders.stock), the item becomes unavailable at
+    # zero, and reset_daily_stock refills it. Blank means unlimited.
+    daily_stock = models.PositiveIntegerField(
+        null=True, blank=True, help_text="Portions per day; leave blank for unlimited."
+    )
+    stock = models.PositiveIntegerField(null=True, blank=True, help_text="Portions left today.")
+    # Archived items are hidden from the catalog and carts but keep their
+    # order history; purge_archived_menu_items removes them for good.
+    is_archived = models.BooleanField(default=False, db_index=True)
+    archived_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = MenuItemQuerySet.as_manager()
+
     class Meta:
         ordering = ["name"]
 
@@ -75,6 +95,16 @@ class Order(models.Model):
         CASH = 'cash', 'Cash on Delivery'
         MPESA = 'mpesa', 'M-Pesa'
 
+    # Allowed status changes: current status -> statuses it may move to
+    STATUS_TRANSITIONS = {
+        Status.PENDING: (Status.CONFIRMED, Status.CANCELLED),
+        Status.CONFIRMED: (Status.PREPARING, Status.CANCELLED),
+        Status.PREPARING: (Status.OUT_FOR_DELIVERY, Status.CANCELLED),
+        Status.OUT_FOR_DELIVERY: (Status.DELIVERED,),
+        Status.DELIVERED: (),
+        Status.CANCELLED: (),
+    }
+
     order_number = models.CharField(max_length=20, unique=True, editable=False, blank=True)
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -94,6 +124,10 @@ class Order(models.Model):
     delivery_location = models.CharField(max_length=255)
     phone = models.CharField(max_length=20)
     notes = models.TextField(blank=True, default='')
+    slot_start = models.DateTimeField(
+        null=True, blank=True, db_index=True,
+        help_text="Start of the kitchen slot the order was booked into."
+    )
     
     total_amount = models.DecimalField(max_digits=10, decimal_places=2)
     
@@ -102,10 +136,33 @@ class Order(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at']),
+            models.Index(fields=['status', 'created_at']),
+        ]
 
     def __str__(self) -> str:
         return f"Order {self.order_number} - {self.user.username}"
 
+    @classmethod
+    def allowed_sources(cls, status):
+        """Statuses an order may be in to move to ``status``."""
+        return [
+            source for source, targets in cls.STATUS_TRANSITIONS.items()
+            if status in targets
+        ]
+
+    def can_transition_to(self, status) -> bool:
+        return status in self.STATUS_TRANSITIONS.get(self.status, ())
+
+    @property
+    def allowed_transitions(self):
+        """(value, label) pairs of the statuses this order can move to."""
+        return [
+            (status.value, status.label)
+            for status in self.STATUS_TRANSITIONS.get(self.status, ())
+        ]
+
     def save(self, *args, **kwargs):
         if not self.order_number or self.order_number == 'ORD-00000000-0000':
             # Generate order number: ORD-YYYYMMDD-XXXX
@@ -164,6 +221,215 @@ class OrderItem(models.Model):
 
 
 
+class OrderStatusEvent(models.Model):
+    """Append-only record of an order entering a status."""
+
+    order = models.ForeignKey(
+        Order,
+        on_delete=models.CASCADE,
+        related_name='status_events'
+    )
+    from_status = models.CharField(max_length=20, choices=Order.Status.choices, blank=True, default='')
+    status = models.CharField(max_length=20, choices=Order.Status.choices)
+    # Seconds the order spent in ``from_status`` before this transition
+    duration_seconds = models.PositiveIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+            models.Index(fields=['order', 'created_at']),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.order_id}: {self.from_status or '-'} -> {self.status}"
+
+
+class OrderStatusHourlyStats(models.Model):
+    """
+    Per-hour rollup of status transitions, updated as events are written.
+
+    ``count`` is the throughput into ``status`` for the hour and
+    ``total_seconds`` the summed time orders spent in the previous status,
+    so the average latency is ``total_seconds / timed_count``.
+    """
+
+    hour = models.DateTimeField()
+    status = models.CharField(max_length=20, choices=Order.Status.choices)
+    count = models.PositiveIntegerField(default=0)
+    timed_count = models.PositiveIntegerField(default=0)
+    total_seconds = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        ordering = ['hour', 'status']
+        verbose_name_plural = 'Order status hourly stats'
+        constraints = [
+            models.UniqueConstraint(fields=['hour', 'status'], name='unique_status_hour'),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.hour:%Y-%m-%d %H:00} {self.status}: {self.count}"
+
+
+class MenuItemPopularity(models.Model):
+    """
+    Time-decayed popularity of a menu item, rebuilt by ``compute_popularity``.
+
+    ``score`` is the quantity ordered with each day's orders weighted down
+    by ``0.5 ** (age_days / POPULARITY_HALF_LIFE_DAYS)``.
+    """
+
+    menu_item = models.OneToOneField(
+        MenuItem,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='popularity'
+    )
+    score = models.FloatField(db_index=True)
+    quantity = models.PositiveIntegerField(default=0, help_text="Portions ordered within the window.")
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-score']
+        verbose_name_plural = 'Menu item popularity'
+
+    def __str__(self) -> str:
+        return f"{self.menu_item_id}: {self.score:.2f}"
+
+
+class DailySketch(models.Model):
+    """
+    Quantile sketch of one metric over one day (see ``orders.sketches``).
+
+    ``data`` holds the sketch's bucket counts; ``count`` is the number of
+    values added.
+    """
+
+    class Metric(models.TextChoices):
+        ORDER_VALUE = "order_value", "Order value"
+        DELIVERY_TIME = "delivery_time", "Time to delivery (seconds)"
+
+    day = models.DateField()
+    metric = models.CharField(max_length=20, choices=Metric.choices)
+    count = models.PositiveIntegerField(default=0)
+    data = models.JSONField(default=dict)
+
+    class Meta:
+        ordering = ['day', 'metric']
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'metric'], name='unique_sketch_day_metric'),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.day} {self.metric}: {self.count}"
+
+
+class KitchenSlot(models.Model):
+    """
+    Orders and items booked into one kitchen time slot.
+
+    Rows are created on the first booking and only changed by the guarded
+    ``UPDATE`` statements of ``orders.slots.reserve_slot`` and
+    ``release_slots``.
+    """
+
+    start = models.DateTimeField(unique=True)
+    orders = models.PositiveIntegerField(default=0)
+    items = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['start']
+
+    def __str__(self) -> str:
+        return f"{self.start:%Y-%m-%d %H:%M}: {self.orders} orders, {self.items} items"
+
+
+class ArchivedOrder(models.Model):
+    """
+    Order moved out of the hot ``Order`` table by ``archive_orders``.
+
+    Keeps the original id and the same field names as ``Order`` so reports
+    and order history can read both tables with the same queries.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    order_number = models.CharField(max_length=20, unique=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='archived_orders'
+    )
+    status = models.CharField(max_length=20, choices=Order.Status.choices)
+    payment_method = models.CharField(max_length=10, choices=Order.PaymentMethod.choices)
+    delivery_location = models.CharField(max_length=255)
+    phone = models.CharField(max_length=20)
+    notes = models.TextField(blank=True, default='')
+    total_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at']),
+            models.Index(fields=['user', '-created_at']),
+        ]
+
+    def __str__(self) -> str:
+        return f"Archived order {self.order_number}"
+
+
+class ArchivedOrderItem(models.Model):
+    """Line of an ``ArchivedOrder``; mirrors ``OrderItem``."""
+
+    id = models.BigIntegerField(primary_key=True)
+    order = models.ForeignKey(
+        ArchivedOrder,
+        on_delete=models.CASCADE,
+        related_name='items'
+    )
+    menu_item = models.ForeignKey(
+        MenuItem,
+        on_delete=models.PROTECT,
+        related_name='archived_order_items'
+    )
+    quantity = models.PositiveIntegerField(default=1)
+    price = models.DecimalField(max_digits=8, decimal_places=2)
+
+    def __str__(self) -> str:
+        return f"{self.quantity}x {self.menu_item.name}"
+
+    def get_total_price(self):
+        """Calculate total price for this order item."""
+        return self.price * self.quantity
+
+
+class ArchivedOrderStatusEvent(models.Model):
+    """Status event of an ``ArchivedOrder``; mirrors ``OrderStatusEvent``."""
+
+    id = models.BigIntegerField(primary_key=True)
+    order = models.ForeignKey(
+        ArchivedOrder,
+        on_delete=models.CASCADE,
+        related_name='status_events'
+    )
+    from_status = models.CharField(max_length=20, choices=Order.Status.choices, blank=True, default='')
+    status = models.CharField(max_length=20, choices=Order.Status.choices)
+    duration_seconds = models.PositiveIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['order', 'created_at']),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.order_id}: {self.from_status or '-'} -> {self.status}"
+
+
 class ContactInquiry(models.Model):
     """Customer inquiry submitted through contact form."""
     
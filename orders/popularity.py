@@ -0,0 +1,115 @@
+"""
+Time-decayed popularity ranking of menu items.
+
+``compute_popularity`` (the ``compute_popularity`` command, run on a
+schedule) sums the portions ordered per item and day over the last
+``POPULARITY_WINDOW_DAYS`` in one grouped query, weights each day by
+``0.5 ** (age_days / POPULARITY_HALF_LIFE_DAYS)`` and replaces the
+``MenuItemPopularity`` table. The query returns at most one row per item
+and day, however many order lines there are, and older orders are moved to
+the archive anyway (``ORDER_ARCHIVE_AFTER_DAYS``).
+
+The homepage reads the ranking through ``apopular_items`` and
+``ahome_items``, cached per catalog version; recomputing bumps the version.
+"""
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .catalog import acatalog_version, bump_catalog_version
+from .models import MenuItem, MenuItemPopularity, Order, OrderItem
+
+POPULAR_ITEMS_KEY = 'orders:popular_items'
+HOME_ITEMS_KEY = 'orders:home_items'
+
+
+def daily_quantities(since):
+    """``(menu_item_id, day, quantity)`` of every item ordered on or after ``since`` (a date)."""
+    start = timezone.make_aware(datetime.combine(since, time.min))
+    return (
+        OrderItem.objects
+        .filter(order__created_at__gte=start)
+        .exclude(order__status=Order.Status.CANCELLED)
+        .annotate(day=TruncDate('order__created_at'))
+        .values_list('menu_item_id', 'day')
+        .annotate(quantity=Sum('quantity'))
+        .order_by()
+    )
+
+
+def compute_popularity(now=None):
+    """Rebuild the popularity ranking; returns the number of items ranked."""
+    now = now or timezone.now()
+    today = timezone.localdate(now)
+    half_life = settings.POPULARITY_HALF_LIFE_DAYS
+
+    scores = {}
+    quantities = {}
+    for menu_item_id, day, quantity in daily_quantities(today - timedelta(days=settings.POPULARITY_WINDOW_DAYS)):
+        age = (today - day).days
+        scores[menu_item_id] = scores.get(menu_item_id, 0.0) + quantity * 0.5 ** (age / half_life)
+        quantities[menu_item_id] = quantities.get(menu_item_id, 0) + quantity
+
+    with transaction.atomic():
+        MenuItemPopularity.objects.all().delete()
+        MenuItemPopularity.objects.bulk_create([
+            MenuItemPopularity(
+                menu_item_id=menu_item_id,
+                score=score,
+                quantity=quantities[menu_item_id],
+                computed_at=now,
+            )
+            for menu_item_id, score in scores.items()
+        ])
+    # The homepage lists are cached per catalog version
+    transaction.on_commit(bump_catalog_version)
+    return len(scores)
+
+
+async def _ranked_items(limit):
+    items = [
+        item async for item in MenuItem.objects.available()
+        .filter(popularity__isnull=False)
+        .order_by('-popularity__score')[:limit]
+    ]
+    if not items:
+        # Nothing ranked yet: fall back to the items tagged by hand
+        items = [
+            item async for item in MenuItem.objects.available()
+            .filter(tag=MenuItem.Tags.POPULAR)[:limit]
+        ]
+    return items
+
+
+async def apopular_items(limit=None):
+    """The ``limit`` most popular available items (default ``POPULAR_ITEMS_COUNT``)."""
+    limit = limit or settings.POPULAR_ITEMS_COUNT
+    key = f'{POPULAR_ITEMS_KEY}:{await acatalog_version()}:{limit}'
+    items = await cache.aget(key)
+    if items is None:
+        items = await _ranked_items(limit)
+        # Old versions are never read again; let them expire
+        await cache.aset(key, items, 24 * 60 * 60)
+    return items
+
+
+async def ahome_items(limit=None):
+    """Featured items first, then the most popular ones, ``limit`` in all."""
+    limit = limit or settings.POPULAR_ITEMS_COUNT
+    key = f'{HOME_ITEMS_KEY}:{await acatalog_version()}:{limit}'
+    items = await cache.aget(key)
+    if items is None:
+        items = [item async for item in MenuItem.objects.available().filter(is_featured=True)[:limit]]
+        shown = {item.id for item in items}
+        for item in await apopular_items(limit):
+            if len(items) >= limit:
+                break
+            if item.id not in shown:
+                items.append(item)
+        await cache.aset(key, items, 24 * 60 * 60)
+    return items
@@ -0,0 +1,251 @@
+"""
+On-demand cProfile of single requests, for admins.
+
+An admin adds ``?_profile=1`` to a URL (or sends an ``X-Profile: 1``
+header) and ``ProfilingMiddleware`` runs that one request under cProfile,
+timing every SQL query it makes. The stats and queries are written to
+``settings.PROFILE_DIR``, which keeps only the newest
+``settings.PROFILE_MAX_ENTRIES`` profiles, and are browsed from the
+admin dashboard's Profiles page. The response carries an ``X-Profile-Id``
+header naming the stored profile.
+
+The middleware is async-capable so it does not push the async views back
+into a thread. Under ASGI one profiler runs on the event loop and another
+in the thread that runs the request's sync code (sync views and
+middleware, and the async ORM's queries), and their stats are merged.
+Calls made by other requests handled concurrently on the event loop show
+up in the stats too.
+"""
+import cProfile
+import io
+import json
+import pstats
+import re
+import time
+import uuid
+from contextlib import ExitStack
+from datetime import datetime, timezone
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+from .decorators import _is_admin
+
+PROFILE_PARAM = '_profile'
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+PROFILE_ID_RE = re.compile(r'^\d{8}T\d{12}-[0-9a-f]{8}$')
+SORT_KEYS = ('cumulative', 'tottime', 'ncalls')
+
+# Queries recorded per profile; the totals still count every query
+MAX_RECORDED_QUERIES = 500
+
+
+def profile_dir():
+    return Path(settings.PROFILE_DIR)
+
+
+def _stats_path(profile_id):
+    return profile_dir() / f'{profile_id}.prof'
+
+
+def _meta_path(profile_id):
+    return profile_dir() / f'{profile_id}.json'
+
+
+class QueryTimer:
+    """``connection.execute_wrapper`` recording the SQL and duration of each query."""
+
+    def __init__(self):
+        self.queries = []
+        self.count = 0
+        self.total = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.count += 1
+            self.total += duration
+            if len(self.queries) < MAX_RECORDED_QUERIES:
+                self.queries.append({
+                    'alias': context['connection'].alias,
+                    'sql': sql,
+                    'ms': round(duration * 1000, 3),
+                })
+
+
+def requested(request):
+    return request.GET.get(PROFILE_PARAM) == '1' or request.META.get(PROFILE_HEADER) == '1'
+
+
+def wants_profile(request):
+    return requested(request) and request.user.is_authenticated and _is_admin(request.user)
+
+
+def merged_stats(*profilers):
+    """One ``pstats.Stats`` of several profilers, skipping those that saw no calls."""
+    stats = pstats.Stats()
+    for profiler in profilers:
+        if profiler.getstats():
+            stats.add(profiler)
+    return stats
+
+
+def save_profile(request, response, profiler, timer, elapsed):
+    """
+    Write the profile to ``PROFILE_DIR``, drop the oldest ones, and return its id.
+
+    ``profiler`` is a ``cProfile.Profile`` or a ``pstats.Stats``.
+    """
+    directory = profile_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    created = time.time()
+    profile_id = f'{time.strftime("%Y%m%dT%H%M%S", time.gmtime(created))}{int(created % 1 * 1e6):06d}-{uuid.uuid4().hex[:8]}'
+
+    profiler.dump_stats(_stats_path(profile_id))
+    meta = {
+        'id': profile_id,
+        'created': created,
+        'method': request.method,
+        'path': request.get_full_path(),
+        'view': getattr(request.resolver_match, 'view_name', None),
+        'user': request.user.get_username(),
+        'status': response.status_code,
+        'ms': round(elapsed * 1000, 3),
+        'sql_count': timer.count,
+        'sql_ms': round(timer.total * 1000, 3),
+        'queries': timer.queries,
+    }
+    _meta_path(profile_id).write_text(json.dumps(meta))
+
+    # Ids sort by creation time; anything past the limit is the oldest
+    stored = sorted(directory.glob('*.json'), reverse=True)
+    for stale in stored[settings.PROFILE_MAX_ENTRIES:]:
+        stale.unlink(missing_ok=True)
+        stale.with_suffix('.prof').unlink(missing_ok=True)
+    return profile_id
+
+
+def _read_meta(path):
+    meta = json.loads(path.read_text())
+    meta['created_at'] = datetime.fromtimestamp(meta['created'], timezone.utc)
+    return meta
+
+
+def list_profiles():
+    """Metadata of the stored profiles, newest first, without their queries."""
+    directory = profile_dir()
+    if not directory.is_dir():
+        return []
+    profiles = []
+    for path in sorted(directory.glob('*.json'), reverse=True):
+        try:
+            meta = _read_meta(path)
+        except (OSError, ValueError):
+            continue  # removed or half-written by another worker
+        meta.pop('queries', None)
+        profiles.append(meta)
+    return profiles
+
+
+def load_profile(profile_id):
+    """Return the metadata of a stored profile, or ``None``."""
+    if not PROFILE_ID_RE.match(profile_id):
+        return None
+    try:
+        return _read_meta(_meta_path(profile_id))
+    except (OSError, ValueError):
+        return None
+
+
+def profile_stats_path(profile_id):
+    """Path of the ``.prof`` file of a stored profile, or ``None``."""
+    if not PROFILE_ID_RE.match(profile_id):
+        return None
+    path = _stats_path(profile_id)
+    return path if path.is_file() else None
+
+
+def format_stats(profile_id, sort='cumulative', limit=60):
+    """The pstats report of a stored profile as text."""
+    stream = io.StringIO()
+    stats = pstats.Stats(str(_stats_path(profile_id)), stream=stream)
+    stats.strip_dirs().sort_stats(sort).print_stats(limit)
+    return stream.getvalue()
+
+
+class ProfilingMiddleware:
+    """Profile the request when an admin asks for it; otherwise a pass-through."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not wants_profile(request):
+            return self.get_response(request)
+
+        timer = QueryTimer()
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+        elapsed = time.perf_counter() - start
+
+        response['X-Profile-Id'] = save_profile(request, response, profiler, timer, elapsed)
+        return response
+
+    async def __acall__(self, request):
+        # Only touch the user (a session and user query) when asked to profile
+        if not requested(request) or not await sync_to_async(wants_profile)(request):
+            return await self.get_response(request)
+
+        timer = QueryTimer()
+        loop_profiler = cProfile.Profile()
+        thread_profiler = cProfile.Profile()
+        start = time.perf_counter()
+        # cProfile only sees the thread it is enabled in. Sync views run in
+        # the thread that sync_to_async uses for this request, as do the
+        # async ORM's queries, so that thread gets its own profiler and the
+        # query wrappers
+        await sync_to_async(self._start_thread)(timer, thread_profiler)
+        loop_profiler.enable()
+        try:
+            response = await self.get_response(request)
+        finally:
+            loop_profiler.disable()
+            await sync_to_async(self._stop_thread)(timer, thread_profiler)
+        elapsed = time.perf_counter() - start
+
+        stats = merged_stats(loop_profiler, thread_profiler)
+        response['X-Profile-Id'] = await sync_to_async(save_profile)(request, response, stats, timer, elapsed)
+        return response
+
+    @staticmethod
+    def _start_thread(timer, profiler):
+        for connection in connections.all():
+            connection.execute_wrappers.append(timer)
+        profiler.enable()
+
+    @staticmethod
+    def _stop_thread(timer, profiler):
+        profiler.disable()
+        for connection in connections.all():
+            if timer in connection.execute_wrappers:
+                connection.execute_wrappers.remove(timer)
@@ -0,0 +1,215 @@
+"""
+Cache-backed rate limiting and load shedding.
+
+``rate_limit`` keeps a token bucket per client in the Django cache, keyed by
+user, session and IP address, and answers with ``429 Too Many Requests``
+once any of the client's buckets is empty. ``concurrency_limit`` caps how
+many requests of one kind run at the same time and sheds the rest with a
+fast ``503``. Both set ``Retry-After``.
+
+A bucket holds its tokens and the time it was last refilled. It is read,
+refilled and charged while holding a lock taken with ``cache.add``, and the
+in-flight counters change only with ``incr`` and ``decr``; all three are
+atomic in the cache backends used here (see ``orders.cache_backends``).
+Nothing is written to the database, so a burst of rejected requests never
+competes for SQLite's write lock. Counters are as shared as the configured
+cache: use a cache every worker can see (file-based, Memcached, Redis)
+when running several processes.
+
+Limits are read from ``settings.RATE_LIMITS`` and
+``settings.CONCURRENCY_LIMITS`` on every request, so a missing entry
+disables the corresponding check.
+"""
+import math
+import time
+from contextlib import ExitStack, contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, JsonResponse
+
+RATE_LIMIT_PREFIX = 'orders:ratelimit'
+
+# A bucket lock left behind by a killed worker expires after this long
+LOCK_TIMEOUT = 2
+
+RATE_PERIODS = {
+    's': 1,
+    'm': 60,
+    'h': 60 * 60,
+    'd': 24 * 60 * 60,
+}
+
+
+def parse_rate(rate):
+    """Turn ``'<count>/<s|m|h|d>'`` into ``(count, period_seconds)``."""
+    count, period = rate.split('/')
+    return int(count), RATE_PERIODS[period]
+
+
+def client_ip(request):
+    """
+    The client's address, as seen by the outermost trusted proxy.
+
+    Each of the ``RATE_LIMIT_PROXY_HOPS`` proxies appends the address it
+    received the request from to ``X-Forwarded-For``; anything to the left
+    of their entries was sent by the client and cannot be trusted.
+    """
+    hops = getattr(settings, 'RATE_LIMIT_PROXY_HOPS', 0)
+    if hops:
+        forwarded = [entry.strip() for entry in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',')]
+        if len(forwarded) >= hops and forwarded[-hops]:
+            return forwarded[-hops]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def client_buckets(request, capacity):
+    """
+    Yield ``(key, capacity)`` for every bucket the request is charged to.
+
+    Customers of the same workplace often share an address, so the IP
+    bucket is ``RATE_LIMIT_IP_MULTIPLIER`` times larger than the others.
+    """
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        yield f'user:{user.pk}', capacity
+    session_key = request.session.session_key if hasattr(request, 'session') else None
+    if session_key:
+        yield f'session:{session_key}', capacity
+    ip = client_ip(request)
+    if ip:
+        yield f'ip:{ip}', capacity * getattr(settings, 'RATE_LIMIT_IP_MULTIPLIER', 1)
+
+
+@contextmanager
+def _locked(key):
+    lock_key = f'{key}:lock'
+    while not cache.add(lock_key, 1, LOCK_TIMEOUT):
+        time.sleep(0.001)
+    try:
+        yield
+    finally:
+        cache.delete(lock_key)
+
+
+def take_token(request, scope, rate):
+    """
+    Charge one request to each of the client's buckets for ``scope``.
+
+    Returns 0 when the request is allowed, otherwise the number of seconds
+    until a token is available again. Nothing is charged when any bucket
+    is empty.
+    """
+    count, period = parse_rate(rate)
+    capacities = {
+        f'{RATE_LIMIT_PREFIX}:{scope}:{name}': capacity
+        for name, capacity in client_buckets(request, count)
+    }
+    with ExitStack() as stack:
+        # Always locked in the same order (user, session, IP), so two
+        # requests sharing buckets cannot wait on each other
+        for key in capacities:
+            stack.enter_context(_locked(key))
+        now = time.time()
+        stored = cache.get_many(list(capacities))
+        buckets = {}
+        wait = 0
+        for key, capacity in capacities.items():
+            tokens, refilled_at = stored.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - refilled_at) * capacity / period)
+            if tokens < 1:
+                wait = max(wait, (1 - tokens) * period / capacity)
+            buckets[key] = (tokens - 1, now)
+
+        if wait:
+            return wait
+        # An untouched bucket is full again after one period
+        cache.set_many(buckets, period)
+    return 0
+
+
+def _reject(request, status, retry_after, message):
+    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        response = JsonResponse({'success': False, 'error': message}, status=status)
+    else:
+        response = HttpResponse(message, status=status, content_type='text/plain; charset=utf-8')
+    response['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+def rate_limit(scope, methods=('POST',)):
+    """Decorator applying the ``RATE_LIMITS[scope]`` limit to a view."""
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            rate = getattr(settings, 'RATE_LIMITS', {}).get(scope)
+            if rate and request.method in methods:
+                wait = take_token(request, scope, rate)
+                if wait:
+                    return _reject(request, 429, wait, 'Too many requests. Please wait a moment and try again.')
+            return view_func(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _incr(key, timeout):
+    cache.add(key, 0, timeout)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Expired between the add and the incr
+        cache.add(key, 0, timeout)
+        return cache.incr(key)
+
+
+def _enter(name, limit, timeout):
+    """
+    Count one more request of ``name`` in flight.
+
+    Returns ``False`` when ``limit`` requests are already in flight. The
+    counter's expiry is pushed back on every request let in, so it only
+    lapses once no request has got in for ``timeout`` seconds.
+    """
+    key = f'{RATE_LIMIT_PREFIX}:inflight:{name}'
+    if _incr(key, timeout) > limit:
+        _leave(name)
+        return False
+    cache.touch(key, timeout)
+    return True
+
+
+def _leave(name):
+    try:
+        cache.decr(f'{RATE_LIMIT_PREFIX}:inflight:{name}')
+    except ValueError:
+        pass  # expired while the request ran
+
+
+def concurrency_limit(name, methods=('POST',)):
+    """
+    Decorator allowing at most ``CONCURRENCY_LIMITS[name]`` requests in flight.
+
+    There is one in-flight counter per ``name``; its expiry is only a leak
+    guard. It lapses once no request has got in for
+    ``CONCURRENCY_SLOT_TIMEOUT`` seconds, so slots held by a killed worker
+    are released even while rejected requests keep coming.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            limit = getattr(settings, 'CONCURRENCY_LIMITS', {}).get(name)
+            if not limit or request.method not in methods:
+                return view_func(request, *args, **kwargs)
+
+            if not _enter(name, limit, getattr(settings, 'CONCURRENCY_SLOT_TIMEOUT', 60)):
+                return _reject(
+                    request, 503, getattr(settings, 'CONCURRENCY_RETRY_AFTER', 2),
+                    'We are handling a lot of orders right now. Please try again in a few seconds.',
+                )
+            try:
+                return view_func(request, *args, **kwargs)
+            finally:
+                _leave(name)
+        return wrapper
+    return decorator
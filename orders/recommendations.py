@@ -0,0 +1,228 @@
+"""
+"Frequently ordered together" recommendations.
+
+``build_recommendations`` (the ``build_recommendations`` command, run
+nightly) counts how often every pair of menu items shares an order, live
+and archived, with NumPy: the ``(order, item)`` pairs are sorted by order,
+lines ``k`` places apart that belong to the same order give one pair code
+each (for every ``k`` up to the largest basket), and the codes are counted
+with ``np.unique``. Only pairs that were ordered together are ever stored,
+so memory follows the number of distinct pairs rather than ``items ** 2``.
+Pairs seen fewer than ``RECOMMENDATIONS_MIN_ORDERS`` times are dropped and
+the rest scored by cosine similarity (``together / sqrt(orders_i *
+orders_j)``), so staples that go with everything do not crowd out real
+pairings.
+
+Only the best ``RECOMMENDATIONS_PER_ITEM`` neighbours of each item are
+kept, as ``(items, K)`` arrays in ``settings.RECOMMENDATIONS_FILE``. Each
+process loads the file once (and again when it changes), so a lookup is
+a dict hit and a slice of K ids; whether the file changed is checked at
+most every ``RECOMMENDATIONS_RELOAD_INTERVAL`` seconds, not per lookup; the items themselves come from
+``available_items``, cached per catalog version. No query is made while
+rendering suggestions.
+"""
+import os
+import threading
+import time
+from itertools import chain
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from .catalog import acatalog_version, catalog_version
+from .models import ArchivedOrderItem, MenuItem, Order, OrderItem
+
+AVAILABLE_ITEMS_KEY = 'orders:available_items'
+
+
+def _order_lines():
+    """``(order_id, menu_item_id)`` of every line of an order that was not cancelled."""
+    live = (
+        OrderItem.objects.exclude(order__status=Order.Status.CANCELLED)
+        .values_list('order_id', 'menu_item_id').order_by().iterator(chunk_size=10000)
+    )
+    archived = (
+        ArchivedOrderItem.objects.exclude(order__status=Order.Status.CANCELLED)
+        .values_list('order_id', 'menu_item_id').order_by().iterator(chunk_size=10000)
+    )
+    lines = np.fromiter(chain.from_iterable(chain(live, archived)), dtype=np.int64)
+    return lines[0::2], lines[1::2]
+
+
+def cooccurrence(order_ids, item_ids):
+    """
+    Count orders per item and per pair of items.
+
+    Returns ``(items, orders, first, second, together)``: the distinct item
+    ids and how many orders contain each, then one entry per pair ordered
+    together, as positions in ``items`` (``first < second``) and how many
+    orders contain both.
+    """
+    items, index = np.unique(item_ids, return_inverse=True)
+    size = len(items)
+    # One key per (order, item), sorted by order then item; repeated lines
+    # count once
+    keys = np.unique(np.asarray(order_ids, dtype=np.int64) * size + index)
+    orders, index = np.divmod(keys, size)
+
+    codes = []
+    offset = 1
+    while offset < len(orders):
+        same = orders[offset:] == orders[:-offset]
+        if not same.any():
+            # Sorted by order: no basket holds more than ``offset`` items
+            break
+        codes.append(index[:-offset][same] * size + index[offset:][same])
+        offset += 1
+    pairs, together = np.unique(np.concatenate(codes or [np.zeros(0, dtype=np.int64)]), return_counts=True)
+    first, second = np.divmod(pairs, size)
+    return items, np.bincount(index, minlength=size), first, second, together
+
+
+def top_neighbours(items, orders, first, second, together, k, min_orders=1):
+    """
+    The ``k`` most similar items of each item, best first.
+
+    Takes the pairs from ``cooccurrence``. Returns ``(neighbours, scores)``,
+    both ``(len(items), k)``; rows with fewer than ``k`` neighbours are
+    padded with id 0 and score 0.
+    """
+    size = len(items)
+    k = min(k, max(size - 1, 0))
+    neighbours = np.zeros((size, k), dtype=np.int64)
+    scores = np.zeros((size, k), dtype=np.float32)
+    keep = together >= min_orders
+    first, second, together = first[keep], second[keep], together[keep]
+    if not k or not len(together):
+        return neighbours, scores
+
+    pair_scores = together / np.sqrt(orders[first].astype(float) * orders[second])
+    # Each pair is a neighbour of both its items
+    rows = np.concatenate([first, second])
+    columns = np.concatenate([second, first])
+    pair_scores = np.concatenate([pair_scores, pair_scores])
+
+    # Best first within each row, then the rank of each entry in its row
+    order = np.lexsort((-pair_scores, rows))
+    rows, columns, pair_scores = rows[order], columns[order], pair_scores[order]
+    row_starts = np.searchsorted(rows, rows)
+    ranks = np.arange(len(rows)) - row_starts
+    best = ranks < k
+    neighbours[rows[best], ranks[best]] = items[columns[best]]
+    scores[rows[best], ranks[best]] = pair_scores[best]
+    return neighbours, scores
+
+
+def build_recommendations():
+    """Recount co-occurrences and replace the recommendations file; returns the item count."""
+    order_ids, item_ids = _order_lines()
+    items, orders, first, second, together = cooccurrence(order_ids, item_ids)
+    neighbours, scores = top_neighbours(
+        items, orders, first, second, together,
+        settings.RECOMMENDATIONS_PER_ITEM, settings.RECOMMENDATIONS_MIN_ORDERS,
+    )
+
+    path = Path(settings.RECOMMENDATIONS_FILE)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Write then rename, so running processes never load half a file
+    tmp_path = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+    with open(tmp_path, 'wb') as handle:
+        np.savez(handle, items=items, neighbours=neighbours, scores=scores)
+    tmp_path.replace(path)
+    return len(items)
+
+
+class Recommendations:
+    """The neighbours in ``RECOMMENDATIONS_FILE``, reloaded when the file changes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._path = None
+        self._checked_at = None
+        self._mtime = None
+        self._rows = {}
+        self._neighbours = None
+        self._scores = None
+
+    def _refresh(self):
+        path = settings.RECOMMENDATIONS_FILE
+        now = time.monotonic()
+        if path == self._path and now - self._checked_at < settings.RECOMMENDATIONS_RELOAD_INTERVAL:
+            return
+        self._path, self._checked_at = path, now
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime == self._mtime:
+            return
+        with self._lock:
+            if mtime == self._mtime:
+                return
+            if mtime is None:
+                rows, neighbours, scores = {}, None, None
+            else:
+                with np.load(path) as data:
+                    rows = {int(item_id): row for row, item_id in enumerate(data['items'])}
+                    neighbours, scores = data['neighbours'], data['scores']
+            self._rows, self._neighbours, self._scores = rows, neighbours, scores
+            self._mtime = mtime
+
+    def neighbours(self, item_id):
+        """``(neighbour_ids, scores)`` of ``item_id``, best first."""
+        self._refresh()
+        row = self._rows.get(item_id)
+        if row is None:
+            return (), ()
+        neighbours = self._neighbours[row]
+        scores = self._scores[row]
+        count = int(np.count_nonzero(neighbours))
+        return neighbours[:count].tolist(), scores[:count].tolist()
+
+    def for_items(self, item_ids, limit):
+        """The ``limit`` best neighbours of a set of items, excluding the items themselves."""
+        item_ids = set(item_ids)
+        totals = {}
+        for item_id in item_ids:
+            for neighbour, score in zip(*self.neighbours(item_id)):
+                if neighbour not in item_ids:
+                    totals[neighbour] = totals.get(neighbour, 0.0) + score
+        return sorted(totals, key=totals.get, reverse=True)[:limit]
+
+
+recommendations = Recommendations()
+
+
+def available_items():
+    """Available menu items by id, cached per catalog version."""
+    key = f'{AVAILABLE_ITEMS_KEY}:{catalog_version()}'
+    items = cache.get(key)
+    if items is None:
+        items = {item.id: item for item in MenuItem.objects.available()}
+        # Old versions are never read again; let them expire
+        cache.set(key, items, 24 * 60 * 60)
+    return items
+
+
+async def aavailable_items():
+    key = f'{AVAILABLE_ITEMS_KEY}:{await acatalog_version()}'
+    items = await cache.aget(key)
+    if items is None:
+        items = {item.id: item async for item in MenuItem.objects.available()}
+        await cache.aset(key, items, 24 * 60 * 60)
+    return items
+
+
+def suggestions(item_ids, items, limit=None):
+    """
+    Available items frequently ordered with ``item_ids``.
+
+    ``items`` is the map from ``available_items``; neighbours that are not
+    available are skipped.
+    """
+    limit = limit or settings.RECOMMENDATIONS_SHOWN
+    # Ask for spares in case some neighbours are unavailable
+    neighbours = recommendations.for_items(item_ids, limit * 2)
+    return [items[item_id] for item_id in neighbours if item_id in items][:limit]
@@ -0,0 +1,295 @@
+"""
+Report datasets shared by the admin reports page and the data exports.
+
+Every dataset is a function of a ``[start, end)`` datetime range. Grouped
+queries run against both the hot ``Order`` tables and the archive tables
+(see ``orders.archive``) and the small grouped results are merged, so
+reports keep covering orders after they are archived.
+"""
+from datetime import datetime, time, timedelta
+
+from django.contrib.auth import get_user_model
+from django.db.models import (
+    Count, DateTimeField, DecimalField, ExpressionWrapper, F, FloatField,
+    IntegerField, Max, OuterRef, Subquery, Sum, Value,
+)
+from django.db.models.functions import Coalesce, ExtractHour, NullIf, TruncDate
+from django.utils import timezone
+
+from . import sketches
+from .models import (
+    ArchivedOrder, ArchivedOrderItem, DailySketch, Order, OrderItem,
+    OrderStatusHourlyStats,
+)
+
+ORDER_MODELS = (Order, ArchivedOrder)
+ORDER_ITEM_MODELS = (OrderItem, ArchivedOrderItem)
+
+
+def parse_date_range(start_value, end_value, default_days=30):
+    """
+    Turn ``YYYY-MM-DD`` strings into an aware ``[start, end)`` range.
+
+    The end date is inclusive for the caller, so the returned end bound is
+    midnight after it. Missing or invalid values fall back to the last
+    ``default_days`` days.
+    """
+    def _parse(value):
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date()
+        except (TypeError, ValueError):
+            return None
+
+    end_day = _parse(end_value) or timezone.localdate()
+    start_day = _parse(start_value) or end_day - timedelta(days=default_days)
+    start = timezone.make_aware(datetime.combine(start_day, time.min))
+    end = timezone.make_aware(datetime.combine(end_day + timedelta(days=1), time.min))
+    return start, end
+
+
+def orders_in_range(start, end, model=Order):
+    return model.objects.filter(created_at__gte=start, created_at__lt=end)
+
+
+def order_items_in_range(start, end, model=OrderItem):
+    return model.objects.filter(order__created_at__gte=start, order__created_at__lt=end)
+
+
+def _merge(querysets, keys, sums, sort_key, reverse=False):
+    """Combine grouped rows from several querysets, summing ``sums`` per key."""
+    merged = {}
+    for queryset in querysets:
+        for row in queryset:
+            key = tuple(row[name] for name in keys)
+            if key not in merged:
+                merged[key] = dict(row)
+                continue
+            for name in sums:
+                merged[key][name] = (merged[key][name] or 0) + (row[name] or 0)
+    return sorted(merged.values(), key=lambda row: row[sort_key] or 0, reverse=reverse)
+
+
+def order_totals(start, end):
+    totals = {'count': 0, 'revenue': 0}
+    for model in ORDER_MODELS:
+        row = orders_in_range(start, end, model).aggregate(
+            count=Count('id'),
+            revenue=Sum('total_amount')
+        )
+        totals['count'] += row['count']
+        totals['revenue'] += row['revenue'] or 0
+    return totals
+
+
+def order_percentiles(start, end):
+    """
+    p50/p90/p99 order value and minutes to delivery over the days in range.
+
+    Merged from the daily sketches, so whole days are covered and values
+    are within the sketches' relative accuracy.
+    """
+    start_day = timezone.localdate(start)
+    end_day = timezone.localdate(end - timedelta(microseconds=1))
+    value = sketches.percentiles(DailySketch.Metric.ORDER_VALUE, start_day, end_day)
+    delivery = sketches.percentiles(DailySketch.Metric.DELIVERY_TIME, start_day, end_day)
+    delivery_minutes = {
+        key: seconds / 60 if key != 'count' and seconds is not None else seconds
+        for key, seconds in delivery.items()
+    }
+    return {'order_value': value, 'delivery_minutes': delivery_minutes}
+
+
+def daily_revenue(start, end):
+    return _merge(
+        (
+            orders_in_range(start, end, model).annotate(
+                date=TruncDate('created_at')
+            ).values('date').annotate(
+                revenue=Sum('total_amount'),
+                order_count=Count('id')
+            ).order_by()
+            for model in ORDER_MODELS
+        ),
+        keys=['date'], sums=['revenue', 'order_count'], sort_key='date',
+    )
+
+
+def status_breakdown(start, end):
+    return _merge(
+        (
+            orders_in_range(start, end, model).values('status').annotate(
+                count=Count('id')
+            ).order_by()
+            for model in ORDER_MODELS
+        ),
+        keys=['status'], sums=['count'], sort_key='count', reverse=True,
+    )
+
+
+def top_items(start, end):
+    return _merge(
+        (
+            order_items_in_range(start, end, model).values(
+                'menu_item__name',
+                'menu_item__category__name'
+            ).annotate(
+                total_quantity=Sum('quantity'),
+                total_revenue=Sum(F('quantity') * F('price'))
+            ).order_by()
+            for model in ORDER_ITEM_MODELS
+        ),
+        keys=['menu_item__name', 'menu_item__category__name'],
+        sums=['total_quantity', 'total_revenue'],
+        sort_key='total_quantity', reverse=True,
+    )
+
+
+def top_customers(start, end, limit=10):
+    """Customers who spent the most in the range, as ``User`` objects."""
+    User = get_user_model()
+    rows = _merge(
+        (
+            orders_in_range(start, end, model).filter(
+                user__role=User.Roles.CUSTOMER
+            ).values('user_id').annotate(
+                order_count=Count('id'),
+                total_spent=Sum('total_amount')
+            ).order_by()
+            for model in ORDER_MODELS
+        ),
+        keys=['user_id'], sums=['order_count', 'total_spent'],
+        sort_key='total_spent', reverse=True,
+    )[:limit]
+
+    users = User.objects.in_bulk([row['user_id'] for row in rows])
+    customers = []
+    for row in rows:
+        user = users[row['user_id']]
+        user.order_count = row['order_count']
+        user.total_spent = row['total_spent']
+        customers.append(user)
+    return customers
+
+
+def category_performance(start, end):
+    return _merge(
+        (
+            order_items_in_range(start, end, model).values(
+                'menu_item__category__name'
+            ).annotate(
+                total_quantity=Sum('quantity'),
+                total_revenue=Sum(F('quantity') * F('price'))
+            ).order_by()
+            for model in ORDER_ITEM_MODELS
+        ),
+        keys=['menu_item__category__name'],
+        sums=['total_quantity', 'total_revenue'],
+        sort_key='total_revenue', reverse=True,
+    )
+
+
+def payment_breakdown(start, end):
+    return _merge(
+        (
+            orders_in_range(start, end, model).values('payment_method').annotate(
+                count=Count('id'),
+                revenue=Sum('total_amount')
+            ).order_by()
+            for model in ORDER_MODELS
+        ),
+        keys=['payment_method'], sums=['count', 'revenue'],
+        sort_key='count', reverse=True,
+    )
+
+
+def hourly_orders(start, end):
+    return _merge(
+        (
+            orders_in_range(start, end, model).annotate(
+                hour=ExtractHour('created_at')
+            ).values('hour').annotate(
+                count=Count('id')
+            ).order_by()
+            for model in ORDER_MODELS
+        ),
+        keys=['hour'], sums=['count'], sort_key='hour',
+    )
+
+
+# Transitions whose latency is reported: time to confirm, prep time and
+# delivery time are the time spent in the status before each of these.
+KITCHEN_TIME_STATUSES = [
+    Order.Status.CONFIRMED,
+    Order.Status.OUT_FOR_DELIVERY,
+    Order.Status.DELIVERED,
+]
+
+
+def kitchen_times(start, end):
+    """Daily throughput and average latency per status, read from the hourly rollups."""
+    return list(OrderStatusHourlyStats.objects.filter(
+        hour__gte=start,
+        hour__lt=end,
+        status__in=KITCHEN_TIME_STATUSES,
+    ).annotate(
+        date=TruncDate('hour')
+    ).values('date', 'status').annotate(
+        count=Sum('count'),
+        avg_minutes=ExpressionWrapper(
+            Sum('total_seconds') / 60.0 / NullIf(Sum('timed_count'), 0),
+            output_field=FloatField(),
+        ),
+    ).order_by('date', 'status'))
+
+
+def _customer_order_stat(model, aggregate, output_field, start=None, end=None):
+    orders = model.objects.filter(user=OuterRef('pk'))
+    if start is not None:
+        orders = orders.filter(created_at__gte=start, created_at__lt=end)
+    return Subquery(
+        orders.order_by().values('user').annotate(value=aggregate).values('value'),
+        output_field=output_field,
+    )
+
+
+def with_customer_stats(users, start=None, end=None):
+    """
+    Annotate ``total_orders``, ``total_spent`` and ``last_order_at`` on users.
+
+    Uses one correlated subquery per table instead of joining both order
+    tables, so counts are not multiplied and archived orders are included.
+    """
+    money = DecimalField(max_digits=12, decimal_places=2)
+    integer = IntegerField()
+    return users.annotate(
+        total_orders=Coalesce(
+            _customer_order_stat(Order, Count('id'), integer, start, end), 0
+        ) + Coalesce(
+            _customer_order_stat(ArchivedOrder, Count('id'), integer, start, end), 0
+        ),
+        total_spent=Coalesce(
+            _customer_order_stat(Order, Sum('total_amount'), money, start, end),
+            Value(0, output_field=money),
+        ) + Coalesce(
+            _customer_order_stat(ArchivedOrder, Sum('total_amount'), money, start, end),
+            Value(0, output_field=money),
+        ),
+        # Hot orders are always newer than archived ones
+        last_order_at=Coalesce(
+            _customer_order_stat(Order, Max('created_at'), DateTimeField(), start, end),
+            _customer_order_stat(ArchivedOrder, Max('created_at'), DateTimeField(), start, end),
+        ),
+    )
+
+
+# Datasets that can be exported, keyed by the name used in URLs and commands,
+# with the columns each row carries.
+REPORT_DATASETS = {
+    'daily_revenue': (daily_revenue, ['date', 'revenue', 'order_count']),
+    'status_breakdown': (status_breakdown, ['status', 'count']),
+    'top_items': (top_items, ['menu_item__name', 'menu_item__category__name', 'total_quantity', 'total_revenue']),
+    'category_performance': (category_performance, ['menu_item__category__name', 'total_quantity', 'total_revenue']),
+    'payment_breakdown': (payment_breakdown, ['payment_method', 'count', 'revenue']),
+    'hourly_orders': (hourly_orders, ['hour', 'count']),
+    'kitchen_times': (kitchen_times, ['date', 'status', 'count', 'avg_minutes']),
+}
@@ -0,0 +1,142 @@
+"""
+``Server-Timing`` response header breaking each request down by phase.
+
+``ServerTimingMiddleware`` starts a ``Timings`` record for the request in
+a context variable, and the instrumented pieces add to it:
+
+* ``db``: every SQL query, through an ``execute_wrapper`` installed on each
+  database connection as it is opened;
+* ``tpl``: template rendering, through the template backend in
+  ``orders.template_backends``;
+* ``cache``: cache reads and writes with their hits and misses, through the
+  backends in ``orders.cache_backends``;
+* ``view``: the whole request, from this middleware's point of view.
+
+The context variable follows the request into ``sync_to_async`` threads,
+so async views are covered too. With ``settings.SERVER_TIMING`` off the
+middleware removes itself and the hooks are never installed.
+"""
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+_current = ContextVar('server_timing', default=None)
+
+
+class Timings:
+    """Per-request totals (seconds) and counters for each phase."""
+
+    __slots__ = ('db', 'db_count', 'tpl', 'cache', 'cache_hits', 'cache_misses', '_active')
+
+    def __init__(self):
+        self.db = self.tpl = self.cache = 0.0
+        self.db_count = self.cache_hits = self.cache_misses = 0
+        # Phases currently being timed; nested calls (an include rendered
+        # inside a template, a cache add that calls set) count only once
+        self._active = set()
+
+    def header(self, total):
+        return ', '.join([
+            f'db;dur={self.db * 1000:.1f};desc="{self.db_count} queries"',
+            f'tpl;dur={self.tpl * 1000:.1f}',
+            f'cache;dur={self.cache * 1000:.1f};desc="{self.cache_hits} hits, {self.cache_misses} misses"',
+            f'view;dur={total * 1000:.1f}',
+        ])
+
+
+class phase:
+    """
+    Context manager adding the time spent inside it to a phase of the
+    current request; a no-op outside ``ServerTimingMiddleware``.
+    """
+
+    __slots__ = ('name', 'timings', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        timings = _current.get()
+        if timings is None or self.name in timings._active:
+            self.timings = None
+            return None
+        timings._active.add(self.name)
+        self.timings = timings
+        self.start = time.perf_counter()
+        return timings
+
+    def __exit__(self, *exc_info):
+        timings = self.timings
+        if timings is not None:
+            setattr(timings, self.name, getattr(timings, self.name) + time.perf_counter() - self.start)
+            timings._active.discard(self.name)
+
+
+def current_timings():
+    """The ``Timings`` of the request being handled, or ``None``."""
+    return _current.get()
+
+
+def _time_query(execute, sql, params, many, context):
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    timings.db_count += 1
+    with phase('db'):
+        return execute(sql, params, many, context)
+
+
+def _add_query_timer(connection, **kwargs):
+    if _time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_time_query)
+
+
+def install_query_timer():
+    """Time the queries of every connection opened from now on (and those already open)."""
+    connection_created.connect(_add_query_timer, dispatch_uid='orders.server_timing')
+    for connection in connections.all(initialized_only=True):
+        _add_query_timer(connection)
+
+
+class ServerTimingMiddleware:
+    """Add a ``Server-Timing`` header to every response."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'SERVER_TIMING', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        install_query_timer()
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings = Timings()
+        token = _current.set(timings)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        response['Server-Timing'] = timings.header(time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        timings = Timings()
+        token = _current.set(timings)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        response['Server-Timing'] = timings.header(time.perf_counter() - start)
+        return response
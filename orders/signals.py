@@ -0,0 +1,87 @@
+"""
+Signal handlers for the orders app.
+
+Connected from ``OrdersConfig.ready``.
+"""
+import logging
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.utils import timezone
+
+from . import metrics
+from .catalog import bump_catalog_version
+from .counters import invalidate_dashboard_counters
+from .media import configure_cloudinary
+from .models import ContactInquiry, DailySketch, MenuCategory, MenuItem, Order
+from .sketches import add_values
+
+logger = logging.getLogger(__name__)
+
+
+def _invalidate_counters(sender, **kwargs):
+    invalidate_dashboard_counters()
+
+
+def _bump_catalog_version(sender, **kwargs):
+    bump_catalog_version()
+
+
+def _count_order_placed(sender, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: metrics.inc('orders_placed_total'))
+
+
+def _add_order_value(day, value):
+    # The order is already committed; a failure here must not fail the request
+    try:
+        add_values(DailySketch.Metric.ORDER_VALUE, day, [value])
+    except Exception:
+        logger.exception('Could not add an order value to the %s sketch', day)
+
+
+def _sketch_order_value(sender, instance, created, **kwargs):
+    if created:
+        day = timezone.localdate(instance.created_at)
+        value = instance.total_amount
+        transaction.on_commit(lambda: _add_order_value(day, value))
+
+
+def _configure_cloudinary(sender, **kwargs):
+    # Uploads happen in CloudinaryField.pre_save, after this signal
+    configure_cloudinary()
+
+
+def connect_signals():
+    """Wire model signals to their handlers."""
+    for model in (Order, get_user_model(), ContactInquiry):
+        post_save.connect(
+            _invalidate_counters, sender=model,
+            dispatch_uid=f'counters_save_{model._meta.label_lower}',
+        )
+        post_delete.connect(
+            _invalidate_counters, sender=model,
+            dispatch_uid=f'counters_delete_{model._meta.label_lower}',
+        )
+    post_save.connect(
+        _count_order_placed, sender=Order,
+        dispatch_uid='metrics_order_placed',
+    )
+    post_save.connect(
+        _sketch_order_value, sender=Order,
+        dispatch_uid='sketch_order_value',
+    )
+    pre_save.connect(
+        _configure_cloudinary, sender=MenuItem,
+        dispatch_uid='cloudinary_configure_menuitem',
+    )
+    for model in (MenuItem, MenuCategory):
+        post_save.connect(
+            _bump_catalog_version, sender=model,
+            dispatch_uid=f'catalog_save_{model._meta.label_lower}',
+        )
+        post_delete.connect(
+            _bump_catalog_version, sender=model,
+            dispatch_uid=f'catalog_delete_{model._meta.label_lower}',
+        )
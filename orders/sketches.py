@@ -0,0 +1,145 @@
+"""
+Mergeable quantile sketches of order values and delivery times, per day.
+
+``QuantileSketch`` is a DDSketch: values are counted in logarithmic buckets
+``(gamma ** (i - 1), gamma ** i]`` with ``gamma = (1 + a) / (1 - a)``, so
+any quantile it returns is within relative error ``a`` of the exact one,
+and two sketches merge by adding their bucket counts. A day of orders
+takes a few hundred buckets at most.
+
+One ``DailySketch`` row per metric and day is updated as orders come in:
+the order value when an order is placed (``orders.signals``) and the time
+from placing to delivery when it is delivered (``orders.transitions``).
+``percentiles`` answers any date range by merging its daily rows, and
+``manage.py rebuild_sketches`` rebuilds them from the order history.
+"""
+import math
+
+from django.db import transaction
+
+from .models import DailySketch
+
+DEFAULT_ACCURACY = 0.01
+# Values at or below this count as zero (logarithms need positive values)
+MIN_VALUE = 1e-9
+# Beyond this many buckets the lowest ones are merged, so only the lowest
+# quantiles of a pathological spread lose accuracy
+MAX_BUCKETS = 2048
+
+PERCENTILES = (0.5, 0.9, 0.99)
+
+
+class QuantileSketch:
+    """Counts of values in logarithmic buckets; see the module docstring."""
+
+    def __init__(self, relative_accuracy=DEFAULT_ACCURACY):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError('relative_accuracy must be between 0 and 1')
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def add(self, value, count=1):
+        value = float(value)
+        if value <= MIN_VALUE:
+            self.zero_count += count
+        else:
+            index = math.ceil(math.log(value) / self._log_gamma)
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += count
+        if len(self.buckets) > MAX_BUCKETS:
+            self._collapse()
+
+    def merge(self, other):
+        """Add the counts of ``other``, a sketch with the same accuracy."""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError('Cannot merge sketches of different accuracy')
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        if len(self.buckets) > MAX_BUCKETS:
+            self._collapse()
+        return self
+
+    def _collapse(self):
+        indexes = sorted(self.buckets)
+        floor = indexes[-MAX_BUCKETS]
+        self.buckets[floor] += sum(self.buckets.pop(index) for index in indexes[:-MAX_BUCKETS])
+
+    def quantile(self, q):
+        """
+        The value at rank ``q * (count - 1)``, within the relative accuracy.
+
+        Returns ``None`` for an empty sketch.
+        """
+        if not 0 <= q <= 1:
+            raise ValueError('q must be between 0 and 1')
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        if rank < self.zero_count:
+            return 0.0
+        seen = self.zero_count
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > rank:
+                # The point of the bucket closest, relatively, to both ends
+                return 2 * self.gamma ** index / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+    def to_dict(self):
+        return {
+            'accuracy': self.relative_accuracy,
+            'zero': self.zero_count,
+            'buckets': {str(index): count for index, count in self.buckets.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data.get('accuracy', DEFAULT_ACCURACY))
+        sketch.zero_count = data.get('zero', 0)
+        sketch.buckets = {int(index): count for index, count in data.get('buckets', {}).items()}
+        sketch.count = sketch.zero_count + sum(sketch.buckets.values())
+        return sketch
+
+
+def add_values(metric, day, values):
+    """Add ``values`` to the ``metric`` sketch of ``day``."""
+    values = list(values)
+    if not values:
+        return
+    with transaction.atomic():
+        # Write before reading: SQLite ignores select_for_update, and a
+        # transaction that reads first deadlocks ("database is locked") when
+        # it tries to upgrade to a write while another does the same. The
+        # insert takes the write lock up front, and makes sure the row exists.
+        DailySketch.objects.bulk_create([DailySketch(day=day, metric=metric)], ignore_conflicts=True)
+        row = DailySketch.objects.select_for_update().get(day=day, metric=metric)
+        sketch = QuantileSketch.from_dict(row.data) if row.data else QuantileSketch()
+        for value in values:
+            sketch.add(value)
+        row.data = sketch.to_dict()
+        row.count = sketch.count
+        row.save(update_fields=['data', 'count'])
+
+
+def merged_sketch(metric, start_day, end_day):
+    """One sketch of ``metric`` over the days from ``start_day`` to ``end_day`` inclusive."""
+    sketch = QuantileSketch()
+    rows = DailySketch.objects.filter(metric=metric, day__gte=start_day, day__lte=end_day)
+    for data in rows.values_list('data', flat=True):
+        sketch.merge(QuantileSketch.from_dict(data))
+    return sketch
+
+
+def percentiles(metric, start_day, end_day, quantiles=PERCENTILES):
+    """``{'count': n, 'p50': value, ...}`` of ``metric`` over a range of days."""
+    sketch = merged_sketch(metric, start_day, end_day)
+    result = {'count': sketch.count}
+    for q in quantiles:
+        result[f'p{q * 100:g}'] = sketch.quantile(q)
+    return result
@@ -0,0 +1,134 @@
+"""
+Kitchen capacity by time slot.
+
+The day is cut into ``settings.KITCHEN_SLOT_MINUTES`` slots. Every order
+is booked into one at checkout by ``reserve_slot``, a guarded ``UPDATE``
+of the slot's ``KitchenSlot`` counter row, so a slot never takes more than
+``KITCHEN_SLOT_MAX_ORDERS`` orders or ``KITCHEN_SLOT_MAX_ITEMS`` items
+(0 means no limit). When the slot a customer asked for is full, checkout
+offers the next one with room. Cancelling an order gives its booking back
+(``release_slots``, called by ``transition_orders``).
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from .models import KitchenSlot, Order
+
+
+class SlotFull(Exception):
+    """The slot has no room for the order; ``next_available`` is the next one that has."""
+
+    def __init__(self, start, next_available):
+        self.start = start
+        self.next_available = next_available
+        super().__init__(f'Slot {start:%H:%M} is full')
+
+
+def slot_length():
+    return timedelta(minutes=settings.KITCHEN_SLOT_MINUTES)
+
+
+def slot_start(moment=None):
+    """Start of the slot containing ``moment`` (default: now), in local time."""
+    moment = timezone.localtime(moment)
+    minutes = moment.hour * 60 + moment.minute
+    minutes -= minutes % settings.KITCHEN_SLOT_MINUTES
+    return moment.replace(hour=minutes // 60, minute=minutes % 60, second=0, microsecond=0)
+
+
+def upcoming_slots(count=None, now=None):
+    """Starts of the current slot and the ones after it, as offered at checkout."""
+    first = slot_start(now)
+    return [first + slot_length() * index for index in range(count or settings.KITCHEN_SLOT_LOOKAHEAD)]
+
+
+def _has_room(orders, items, order_items):
+    max_orders = settings.KITCHEN_SLOT_MAX_ORDERS
+    max_items = settings.KITCHEN_SLOT_MAX_ITEMS
+    if max_orders and orders >= max_orders:
+        return False
+    # An order bigger than a whole slot still fits into an empty one
+    if max_items and items and items + order_items > max_items:
+        return False
+    return True
+
+
+def slot_loads(starts, order_items=0):
+    """
+    Booked orders and items of each slot in ``starts``, from one query.
+
+    Returns a list of dicts with ``start``, ``orders``, ``items`` and
+    ``has_room`` (room for an order of ``order_items`` items).
+    """
+    booked = {
+        slot.start: slot
+        for slot in KitchenSlot.objects.filter(start__in=starts)
+    }
+    loads = []
+    for start in starts:
+        slot = booked.get(start)
+        orders, items = (slot.orders, slot.items) if slot else (0, 0)
+        loads.append({
+            'start': start,
+            'orders': orders,
+            'items': items,
+            'has_room': _has_room(orders, items, order_items),
+        })
+    return loads
+
+
+def next_available_slot(order_items, after=None, now=None):
+    """The first upcoming slot (after ``after``, if given) with room, or ``None``."""
+    for load in slot_loads(upcoming_slots(now=now), order_items):
+        if load['has_room'] and (after is None or load['start'] > after):
+            return load['start']
+    return None
+
+
+def reserve_slot(start, order_items):
+    """
+    Book an order of ``order_items`` items into the slot starting at ``start``.
+
+    Raises ``SlotFull`` when the slot has no room. Call it inside the
+    order's ``transaction.atomic`` so the booking is undone if the order
+    is not created.
+    """
+    KitchenSlot.objects.bulk_create([KitchenSlot(start=start)], ignore_conflicts=True)
+
+    room = Q()
+    if settings.KITCHEN_SLOT_MAX_ORDERS:
+        room &= Q(orders__lt=settings.KITCHEN_SLOT_MAX_ORDERS)
+    if settings.KITCHEN_SLOT_MAX_ITEMS:
+        room &= Q(items__lte=settings.KITCHEN_SLOT_MAX_ITEMS - order_items) | Q(items=0)
+
+    booked = KitchenSlot.objects.filter(room, start=start).update(
+        orders=F('orders') + 1,
+        items=F('items') + order_items,
+    )
+    if not booked:
+        raise SlotFull(start, next_available_slot(order_items, after=start))
+
+
+def release_slots(order_ids):
+    """
+    Give back the slot bookings of ``order_ids``, orders being cancelled.
+
+    One guarded ``UPDATE`` per slot takes off the orders and their items,
+    never going below zero. Call it in the same transaction as the status
+    change.
+    """
+    booked = (
+        Order.objects.filter(id__in=order_ids, slot_start__isnull=False)
+        .values('slot_start')
+        .annotate(orders=Count('id', distinct=True), items=Sum('items__quantity'))
+        .order_by()
+    )
+    for slot in booked:
+        orders, items = slot['orders'], slot['items'] or 0
+        KitchenSlot.objects.filter(start=slot['slot_start'], orders__gte=orders, items__gte=items).update(
+            orders=F('orders') - orders,
+            items=F('items') - items,
+        )
@@ -0,0 +1,287 @@
+"""
+Slow-query log with the query plan of each offender.
+
+``install()`` (called from ``OrdersConfig.ready``) adds an
+``execute_wrapper`` to every database connection as it is opened. A query
+taking longer than ``settings.SLOW_QUERY_MS`` (off unless set) is recorded under its
+fingerprint (the SQL with literals, placeholders and ``IN`` lists
+normalized) in ``settings.SLOW_QUERY_DIR``:
+
+* ``<fingerprint>.json``, written once when the fingerprint is first seen,
+  holds the normalized SQL and its plan, from ``EXPLAIN QUERY PLAN`` on
+  SQLite or ``EXPLAIN`` elsewhere;
+* ``<fingerprint>.log`` gets one JSON line per slow run with its duration,
+  parameters, call site (innermost project frame), view and template line.
+
+Every worker only appends to the log (a single ``write`` in append mode),
+so no run is lost to another process rewriting the file; ``load_records``
+sums the lines into counts and durations. Parameters are kept as their
+type and length only, as they can hold password hashes, session data or
+customer details, unless ``settings.SLOW_QUERY_LOG_PARAMS`` is set.
+
+The first slow run of each fingerprint in a process is also logged as a
+warning. ``manage.py slow_queries`` summarizes the worst offenders.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.db import DatabaseError, connections, transaction
+from django.db.backends.signals import connection_created
+from django.template.base import Node
+
+logger = logging.getLogger(__name__)
+
+STRING_RE = re.compile(r"'(?:[^']|'')*'")
+NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+PLACEHOLDER_RE = re.compile(r'%s|\?')
+IN_LIST_RE = re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)', re.IGNORECASE)
+WHITESPACE_RE = re.compile(r'\s+')
+EXPLAINABLE_RE = re.compile(r'^\s*(SELECT|WITH)\b', re.IGNORECASE)
+
+MAX_PARAM_LENGTH = 200
+
+_state = threading.local()
+_seen = set()
+
+
+def fingerprint(sql):
+    """Return ``(normalized_sql, digest)``; queries differing only in values share both."""
+    normalized = STRING_RE.sub('?', sql)
+    normalized = NUMBER_RE.sub('?', normalized)
+    normalized = PLACEHOLDER_RE.sub('?', normalized)
+    normalized = IN_LIST_RE.sub('IN (...)', normalized)
+    normalized = WHITESPACE_RE.sub(' ', normalized).strip()
+    return normalized, hashlib.sha1(normalized.encode()).hexdigest()[:16]
+
+
+# Instrumentation frames wrap every query; they say nothing about its origin
+INSTRUMENTATION_MODULES = ('cache_backends', 'metrics', 'profiling', 'server_timing', 'slow_queries', 'template_backends')
+_INSTRUMENTATION_FILES = {
+    os.path.join(os.path.dirname(__file__), f'{module}.py') for module in INSTRUMENTATION_MODULES
+}
+# Nor do the entry point and Django's own frames, wherever Django is installed
+ENTRY_POINTS = ('manage.py',)
+_DJANGO_DIR = os.path.dirname(django.__file__) + os.sep
+
+
+def _in_project(filename):
+    return (
+        filename.startswith(str(settings.BASE_DIR))
+        and 'site-packages' not in filename
+        and not filename.startswith(_DJANGO_DIR)
+        and filename not in _INSTRUMENTATION_FILES
+        and os.path.relpath(filename, settings.BASE_DIR) not in ENTRY_POINTS
+    )
+
+
+def call_site():
+    """
+    Describe where the running query comes from.
+
+    Returns the innermost project frame, the view (from the request being
+    handled, or the outermost project frame) and the innermost template
+    node being rendered, each as a string or ``None``.
+    """
+    site = view = template = None
+    outermost = None
+    frame = sys._getframe(1)
+    while frame is not None:
+        code = frame.f_code
+        if template is None and code is Node.render_annotated.__code__:
+            node = frame.f_locals.get('self')
+            origin = getattr(node, 'origin', None)
+            token = getattr(node, 'token', None)
+            if origin is not None and token is not None:
+                template = f'{origin.template_name}:{token.lineno}'
+        elif _in_project(code.co_filename):
+            location = f'{os.path.relpath(code.co_filename, settings.BASE_DIR)}:{frame.f_lineno} in {code.co_name}'
+            site = site or location
+            outermost = location
+        if view is None:
+            match = getattr(frame.f_locals.get('request'), 'resolver_match', None)
+            if match is not None:
+                view = match.view_name
+        frame = frame.f_back
+    return site, view or outermost, template
+
+
+def explain(connection, sql, params):
+    """The query plan of ``sql`` as a list of lines, or ``None`` if it cannot be explained."""
+    if not EXPLAINABLE_RE.match(sql):
+        return None
+    prefix = 'EXPLAIN QUERY PLAN' if connection.vendor == 'sqlite' else 'EXPLAIN'
+    _state.explaining = True
+    try:
+        # In a savepoint, so a failed EXPLAIN cannot break the caller's transaction
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute(f'{prefix} {sql}', params)
+            rows = cursor.fetchall()
+    except DatabaseError as exc:
+        return [f'EXPLAIN failed: {exc}']
+    finally:
+        _state.explaining = False
+    if connection.vendor == 'sqlite':
+        # (id, parent, notused, detail); indent children under their parent
+        depth = {0: -1}
+        lines = []
+        for row_id, parent, _, detail in rows:
+            depth[row_id] = depth.get(parent, -1) + 1
+            lines.append(f'{"  " * depth[row_id]}{detail}')
+        return lines
+    return [str(row[0]) for row in rows]
+
+
+def _describe_param(param):
+    if param is None or isinstance(param, (bool, int, float)):
+        return type(param).__name__
+    try:
+        return f'{type(param).__name__}[{len(param)}]'
+    except TypeError:
+        return type(param).__name__
+
+
+def _format_params(params, many):
+    if params is None:
+        return None
+    if many:
+        params = list(params)[:1]
+    if getattr(settings, 'SLOW_QUERY_LOG_PARAMS', False):
+        return [repr(param)[:MAX_PARAM_LENGTH] for param in params]
+    return [_describe_param(param) for param in params]
+
+
+def _record_path(digest):
+    return Path(settings.SLOW_QUERY_DIR) / f'{digest}.json'
+
+
+def _log_path(digest):
+    return Path(settings.SLOW_QUERY_DIR) / f'{digest}.log'
+
+
+def record(connection, sql, params, many, duration):
+    normalized, digest = fingerprint(sql)
+    site, view, template = call_site()
+    path = _record_path(digest)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if not path.exists():
+        entry = {
+            'fingerprint': digest,
+            'sql': normalized,
+            'vendor': connection.vendor,
+            'first_seen': time.time(),
+            'plan': None if many else explain(connection, sql, params),
+        }
+        # Write then rename, so readers never see half a record; two workers
+        # racing here write the same thing
+        tmp_path = path.with_name(f'{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+        tmp_path.write_text(json.dumps(entry))
+        tmp_path.replace(path)
+
+    ms = duration * 1000
+    line = json.dumps({
+        'ms': round(ms, 3),
+        'at': time.time(),
+        'params': _format_params(params, many),
+        'site': site,
+        'view': view,
+        'template': template,
+    }) + '\n'
+    # One write in append mode: runs from other processes land before or
+    # after it, never over it
+    fd = os.open(_log_path(digest), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, line.encode())
+    finally:
+        os.close(fd)
+
+    if digest not in _seen:
+        _seen.add(digest)
+        logger.warning(
+            'Slow query %s (%.1f ms) at %s, view %s, template %s: %s',
+            digest, ms, site, view, template, normalized[:500],
+        )
+
+
+def _log_slow_query(execute, sql, params, many, context):
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - start
+        if duration * 1000 >= settings.SLOW_QUERY_MS and not getattr(_state, 'explaining', False):
+            try:
+                record(context['connection'], sql, params, many, duration)
+            except Exception:
+                # Never fail the query because the log could not be written
+                logger.exception('Could not record slow query')
+
+
+def _add_wrapper(connection, **kwargs):
+    if _log_slow_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_log_slow_query)
+
+
+def install():
+    """Log slow queries on every connection, unless ``SLOW_QUERY_MS`` is 0."""
+    if not settings.SLOW_QUERY_MS:
+        return
+    connection_created.connect(_add_wrapper, dispatch_uid='orders.slow_queries')
+    for connection in connections.all(initialized_only=True):
+        _add_wrapper(connection)
+
+
+def _load_runs(digest):
+    try:
+        lines = _log_path(digest).read_text().splitlines()
+    except OSError:
+        return []
+    runs = []
+    for line in lines:
+        try:
+            runs.append(json.loads(line))
+        except ValueError:
+            # A run still being written
+            continue
+    return runs
+
+
+def load_records():
+    """
+    Every recorded fingerprint with ``count``, ``total_ms``, ``max_ms``,
+    ``last_seen`` and its ``last`` run added from the log.
+    """
+    directory = Path(settings.SLOW_QUERY_DIR)
+    if not directory.is_dir():
+        return []
+    records = []
+    for path in directory.glob('*.json'):
+        try:
+            entry = json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue
+        runs = _load_runs(entry['fingerprint'])
+        if not runs:
+            continue
+        entry['count'] = len(runs)
+        entry['total_ms'] = round(sum(run['ms'] for run in runs), 3)
+        entry['max_ms'] = max(run['ms'] for run in runs)
+        entry['last'] = runs[-1]
+        entry['last_seen'] = entry['last']['at']
+        records.append(entry)
+    return records
+
+
+def clear_records():
+    directory = Path(settings.SLOW_QUERY_DIR)
+    for pattern in ('*.json', '*.log'):
+        for path in directory.glob(pattern):
+            path.unlink(missing_ok=True)
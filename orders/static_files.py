@@ -0,0 +1,64 @@
+"""
+Static file serving that keeps the middleware chain async.
+
+``StaticFilesMiddleware`` is WhiteNoise's middleware, made async-capable.
+WhiteNoise's own middleware is sync-only, and a single sync-only
+middleware makes Django adapt the whole chain to sync under ASGI, pushing
+every async view back through a thread. Under ASGI the file is read off
+the event loop in blocks and streamed with an async iterator.
+"""
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+# Bytes read per thread hop; most CSS and JS bundles fit in one
+BLOCK_SIZE = 256 * 1024
+
+
+async def _read_blocks(file, block_size):
+    read = sync_to_async(file.read, thread_sensitive=False)
+    try:
+        while block := await read(block_size):
+            yield block
+    finally:
+        file.close()
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """Serve ``STATIC_ROOT`` like WhiteNoise, on the event loop under ASGI."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        static_file = self._find(request.path_info)
+        if static_file is None:
+            return await self.get_response(request)
+
+        found = await sync_to_async(static_file.get_response, thread_sensitive=False)(request.method, request.META)
+        if found.file is None:
+            response = HttpResponse(status=int(found.status))
+        else:
+            response = StreamingHttpResponse(
+                _read_blocks(found.file, BLOCK_SIZE), status=int(found.status),
+            )
+        del response['Content-Type']
+        for key, value in found.headers:
+            response[key] = value
+        return response
+
+    def _find(self, path):
+        if self.autorefresh:
+            return self.find_file(path)
+        return self.files.get(path)
@@ -0,0 +1,86 @@
+"""
+Daily stock of menu items.
+
+Items with a ``daily_stock`` have their ``stock`` taken at checkout by one
+conditional ``UPDATE`` per item (``stock = stock - qty`` where
+``stock >= qty``), so concurrent checkouts can never oversell and no row
+is locked beyond that statement. The same statement marks the item
+unavailable when it takes the last portion. ``reset_daily_stock`` (the
+``reset_daily_stock`` command) refills every tracked item, and ``restock``
+adds portions to one; neither ever writes a stock value read earlier.
+"""
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+
+from .catalog import bump_catalog_version
+from .models import MenuItem
+
+
+class OutOfStock(Exception):
+    """Some items do not have enough portions left; ``items`` lists them."""
+
+    def __init__(self, items):
+        self.items = items
+        super().__init__(', '.join(item.name for item in items))
+
+
+def take_stock(lines):
+    """
+    Take ``quantity`` portions of each ``(menu_item, quantity)`` in ``lines``.
+
+    Untracked items are skipped. Raises ``OutOfStock`` naming every item
+    that ran short; call it inside ``transaction.atomic`` so the portions
+    already taken are put back.
+    """
+    short = []
+    taken = []
+    for menu_item, quantity in lines:
+        if menu_item.daily_stock is None:
+            continue
+        updated = MenuItem.objects.filter(id=menu_item.id, stock__gte=quantity).update(
+            # Compares the stock before this update (listed first for
+            # databases that apply SET clauses left to right)
+            is_available=Case(When(stock=quantity, then=Value(False)), default=F('is_available')),
+            stock=F('stock') - quantity,
+        )
+        if updated:
+            taken.append(menu_item.id)
+        else:
+            short.append(menu_item)
+    if short:
+        raise OutOfStock(short)
+    if taken and MenuItem.objects.filter(id__in=taken, stock=0).exists():
+        # Sold out items leave the cached menu
+        transaction.on_commit(bump_catalog_version)
+
+
+def reset_daily_stock():
+    """
+    Refill every tracked item to its ``daily_stock``.
+
+    Items that were sold out become available again; items switched off
+    by hand stay off. Returns the number of items refilled.
+    """
+    updated = MenuItem.objects.filter(daily_stock__isnull=False).update(
+        is_available=Case(When(stock=0, then=Value(True)), default=F('is_available')),
+        stock=F('daily_stock'),
+    )
+    if updated:
+        bump_catalog_version()
+    return updated
+
+
+def restock(menu_item_id, portions):
+    """
+    Add ``portions`` to the stock of a tracked item.
+
+    A sold-out item becomes available again. Returns ``False`` when the
+    item does not exist or its stock is not tracked.
+    """
+    updated = MenuItem.objects.filter(id=menu_item_id, daily_stock__isnull=False).update(
+        is_available=Case(When(stock=0, then=Value(True)), default=F('is_available')),
+        stock=F('stock') + portions,
+    )
+    if updated:
+        bump_catalog_version()
+    return bool(updated)
@@ -0,0 +1,30 @@
+"""
+Django template backend that times top-level renders for Server-Timing.
+
+Identical to Django's own backend, except that the templates it returns
+add their render time to the ``tpl`` phase of the current request (see
+``orders.server_timing``). Django only sends ``template_rendered`` under
+the test runner, so rendering is timed here instead.
+"""
+from django.template.backends import django
+
+from .server_timing import phase
+
+
+class Template(django.Template):
+
+    def render(self, context=None, request=None):
+        with phase('tpl'):
+            return super().render(context, request)
+
+
+class DjangoTemplates(django.DjangoTemplates):
+
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return Template(self.engine.get_template(template_name), self)
+        except django.TemplateDoesNotExist as exc:
+            django.reraise(exc, self)
@@ -0,0 +1,98 @@
+"""
+Cached template loader that minifies HTML templates before compiling them.
+
+``Loader`` wraps Django's cached loader: when a template is first loaded its
+source has HTML comments removed and whitespace runs collapsed, then it is
+compiled and cached as usual, so the work happens once per process and the
+rendered pages are smaller. ``<pre>``, ``<textarea>``, ``<script>`` and
+``<style>`` elements, ``{% verbatim %}`` blocks, template tags and variables
+(with their string literals) and conditional comments are kept verbatim.
+
+``warm_templates`` compiles every template up front; it runs in each
+gunicorn worker at startup (see ``gunicorn.conf.py``) and from the
+``warm_templates`` management command.
+"""
+import os
+import re
+import time
+
+from django.conf import settings
+from django.template import TemplateSyntaxError, engines
+from django.template.loaders import cached
+
+# Kept verbatim, in order of precedence at the same position: HTML comments
+# (dropped unless conditional), raw-text elements, {% verbatim %} blocks and
+# template tags and variables, whose string literals must not change
+PRESERVED_RE = re.compile(
+    r'(?P<comment><!--(?P<conditional>\[if)?.*?-->)'
+    r'|<(?P<element>pre|textarea|script|style)\b.*?</(?P=element)\s*>'
+    r'|\{%\s*verbatim\b.*?%\}.*?\{%\s*endverbatim\b.*?%\}'
+    r'|\{\{.*?\}\}|\{%.*?%\}|\{#.*?#\}',
+    re.IGNORECASE | re.DOTALL,
+)
+WHITESPACE_RE = re.compile(r'\s+')
+
+
+def _collapse(match):
+    return '\n' if '\n' in match.group() else ' '
+
+
+def minify_html(source):
+    """Strip HTML comments and collapse insignificant whitespace in ``source``."""
+    minified = []
+    text = ''
+    position = 0
+    for match in PRESERVED_RE.finditer(source):
+        text += source[position:match.start()]
+        position = match.end()
+        if match.group('comment') and not match.group('conditional'):
+            # Dropped; the whitespace on both sides collapses as one run
+            continue
+        minified.append(WHITESPACE_RE.sub(_collapse, text))
+        minified.append(match.group())
+        text = ''
+    minified.append(WHITESPACE_RE.sub(_collapse, text + source[position:]))
+    return ''.join(minified).strip() + '\n'
+
+
+class Loader(cached.Loader):
+    """Cached loader minifying ``.html`` templates (unless ``TEMPLATE_MINIFY`` is off)."""
+
+    def get_contents(self, origin):
+        contents = super().get_contents(origin)
+        if origin.name.endswith('.html') and getattr(settings, 'TEMPLATE_MINIFY', True):
+            return minify_html(contents)
+        return contents
+
+
+def template_names(engine):
+    """Names of every ``.html`` template reachable by the engine's loaders."""
+    names = set()
+    for loader in engine.template_loaders:
+        for child in getattr(loader, 'loaders', [loader]):
+            for directory in child.get_dirs():
+                for root, _, files in os.walk(directory):
+                    for filename in files:
+                        if filename.endswith('.html'):
+                            path = os.path.join(root, filename)
+                            names.add(os.path.relpath(path, directory).replace(os.sep, '/'))
+    return sorted(names)
+
+
+def warm_templates():
+    """
+    Compile every template into the cached loader.
+
+    Returns ``(count, seconds, errors)`` where ``errors`` lists
+    ``(name, exception)`` for templates that failed to compile.
+    """
+    engine = engines['django'].engine
+    start = time.perf_counter()
+    names = template_names(engine)
+    errors = []
+    for name in names:
+        try:
+            engine.get_template(name)
+        except TemplateSyntaxError as exc:
+            errors.append((name, exc))
+    return len(names), time.perf_counter() - start, errors
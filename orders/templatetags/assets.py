@@ -0,0 +1,48 @@
+"""
+Template tags for the compiled front-end assets.
+"""
+import json
+from functools import lru_cache
+
+from django import template
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.templatetags.static import static
+from django.utils.html import format_html
+from django.utils.safestring import mark_safe
+
+register = template.Library()
+
+
+@lru_cache(maxsize=None)
+def _is_built(path):
+    return finders.find(path) is not None
+
+
+@lru_cache(maxsize=None)
+def _theme(bundle):
+    with open(settings.TAILWIND_DIR / f'{bundle}.theme.json') as theme_file:
+        return json.load(theme_file)
+
+
+@register.simple_tag
+def tailwind_css(bundle='site'):
+    """
+    Link the compiled Tailwind bundle, e.g. ``{% tailwind_css 'admin' %}``.
+
+    When the bundle has not been built (``python manage.py build_css``),
+    falls back to the Tailwind CDN compiler with the same theme so local
+    development still works.
+    """
+    config = settings.TAILWIND_BUNDLES[bundle]
+    if _is_built(config['output']):
+        return format_html('<link rel="stylesheet" href="{}" />', static(config['output']))
+
+    src = 'https://cdn.tailwindcss.com'
+    if config['cdn_plugins']:
+        src += f"?plugins={config['cdn_plugins']}"
+    return format_html(
+        '<script src="{}"></script>\n<script>tailwind.config = {{ theme: {} }};</script>',
+        # The theme is a trusted file from the repository
+        src, mark_safe(json.dumps(_theme(bundle))),
+    )
@@ -6,6 +6,8 @@ from django import template
 from django.conf import settings
 import os
 
+from orders.media import configure_cloudinary
+
 register = template.Library()
 
 
@@ -18,6 +20,7 @@ def smart_image_url(image_field):
     if not image_field:
         return ''
     
+    configure_cloudinary()
     try:
         # Get the image name/path
         image_name = str(image_field.name) if hasattr(image_field, 'name') else str(image_field)
@@ -1,3 +1,1560 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import json
+import os
+import pstats
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import warnings
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.template import Context, Engine, engines
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from . import exports, metrics, profiling, recommendations, reports, server_timing, slow_queries, views
+from .archive import archive_batch, archive_cutoff, customer_order_totals, customer_orders_page
+from .cache_backends import FileBasedCache
+from .catalog import catalog_version
+from .counters import aget_dashboard_counters, get_dashboard_counters
+from .forecast import demand_array, forecast
+from .forms import MenuItemForm
+from .management.commands.profile_startup import parse_importtime
+from .models import (
+    ArchivedOrder, ArchivedOrderStatusEvent, ContactInquiry, DailySketch, KitchenSlot, MenuCategory, MenuItem, MenuItemPopularity,
+    Order, OrderItem, OrderStatusEvent, OrderStatusHourlyStats,
+)
+from .popularity import apopular_items, compute_popularity
+from .ratelimit import _enter, _leave, concurrency_limit, take_token
+from .sketches import QuantileSketch, add_values, merged_sketch, percentiles
+from .slots import SlotFull, reserve_slot, slot_start, upcoming_slots
+from .stock import OutOfStock, reset_daily_stock, take_stock
+from .template_loaders import minify_html, warm_templates
+from .transitions import record_status_events, transition_orders
+
+
+class DashboardCounterTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.customer = get_user_model().objects.create_user('cus', 'c@a.com', 'pw')
+        get_user_model().objects.create_user('boss', password='pw', is_staff=True, role='admin')
+
+    def place(self, status=Order.Status.PENDING, amount=100, days_ago=0):
+        order = Order.objects.create(user=self.customer, delivery_location='w', phone='1', total_amount=amount)
+        Order.objects.filter(id=order.id).update(status=status, created_at=timezone.now() - timedelta(days=days_ago))
+        return order
+
+    def test_counters_match_the_tables(self):
+        self.place(amount=100)
+        self.place(Order.Status.PREPARING, amount=250)
+        self.place(Order.Status.DELIVERED, amount=400, days_ago=3)
+        ContactInquiry.objects.create(name='A', email='a@a.com', subject_type='feedback', message='Hi')
+        ContactInquiry.objects.create(
+            name='B', email='b@a.com', subject_type='feedback', message='Hi', status=ContactInquiry.Status.RESOLVED,
+        )
+        cache.clear()
+
+        self.assertEqual(get_dashboard_counters(), {
+            'total_orders': 3, 'pending_orders': 2, 'today_orders': 2, 'today_revenue': 350,
+            'total_customers': 1, 'total_inquiries': 2, 'new_inquiries': 1,
+        })
+
+    def test_counters_are_cached_until_an_order_changes(self):
+        self.place()
+        cache.clear()
+        self.assertEqual(get_dashboard_counters()['total_orders'], 1)
+        with self.assertNumQueries(0):
+            get_dashboard_counters()
+
+        self.place()
+        self.assertEqual(get_dashboard_counters()['total_orders'], 2)
+
+    async def test_async_counters_match_the_sync_ones(self):
+        await Order.objects.acreate(user=self.customer, delivery_location='w', phone='1', total_amount=80)
+        await cache.aclear()
+        counters = await aget_dashboard_counters()
+        await cache.aclear()
+        self.assertEqual(counters, await sync_to_async(get_dashboard_counters)())
+
+
+class StockTests(TestCase):
+
+    def setUp(self):
+        category = MenuCategory.objects.create(name='Lunch')
+        self.item = MenuItem.objects.create(name='Pilau', price=250, category=category, daily_stock=3, stock=3)
+        self.unlimited = MenuItem.objects.create(name='Chapati', price=30, category=category)
+
+    def test_take_stock_decrements_and_sells_out(self):
+        take_stock([(self.item, 2), (self.unlimited, 10)])
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.stock, 1)
+        self.assertTrue(self.item.is_available)
+
+        take_stock([(self.item, 1)])
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.stock, 0)
+        self.assertFalse(self.item.is_available)
+
+    def test_take_stock_refuses_more_than_is_left(self):
+        with self.assertRaises(OutOfStock) as raised:
+            with transaction.atomic():
+                take_stock([(self.unlimited, 1), (self.item, 4)])
+        self.assertEqual(raised.exception.items, [self.item])
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.stock, 3)
+
+    def test_reset_refills_and_restores_sold_out_items(self):
+        take_stock([(self.item, 3)])
+        reset_daily_stock()
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.stock, 3)
+        self.assertTrue(self.item.is_available)
+
+
+class MenuItemStockFormTests(TestCase):
+
+    def setUp(self):
+        self.category = MenuCategory.objects.create(name='Lunch')
+        self.item = MenuItem.objects.create(name='Pilau', price=250, category=self.category, daily_stock=10, stock=10)
+        admin = get_user_model().objects.create_user('boss', password='pw', is_staff=True)
+        self.client.force_login(admin)
+
+    def form_data(self, **changes):
+        data = {'name': 'Pilau', 'description': '', 'price': '260', 'category': self.category.id,
+                'is_available': 'on', 'tag': 'none', 'daily_stock': '10'}
+        data.update(changes)
+        return data
+
+    def test_editing_keeps_stock_taken_while_the_form_was_open(self):
+        self.client.get(reverse('orders:edit_menu_item', args=[self.item.id]))
+        take_stock([(self.item, 4)])
+        response = self.client.post(reverse('orders:edit_menu_item', args=[self.item.id]), self.form_data())
+        self.assertRedirects(response, reverse('orders:admin_menu'), fetch_redirect_response=False)
+        self.item.refresh_from_db()
+        self.assertEqual((self.item.price, self.item.stock), (260, 6))
+
+    def test_tracking_starts_full_and_stops_empty(self):
+        form = MenuItemForm(self.form_data(name='Chapati', daily_stock='20'))
+        item = form.save()
+        self.assertEqual(item.stock, 20)
+
+        form = MenuItemForm(self.form_data(daily_stock=''), instance=self.item)
+        form.save()
+        self.item.refresh_from_db()
+        self.assertIsNone(self.item.stock)
+
+    def test_restock_adds_portions_and_brings_sold_out_items_back(self):
+        take_stock([(self.item, 10)])
+        response = self.client.post(reverse('orders:restock_menu_item', args=[self.item.id]), {'portions': '5'})
+        self.assertRedirects(response, reverse('orders:edit_menu_item', args=[self.item.id]), fetch_redirect_response=False)
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.stock, 5)
+        self.assertTrue(self.item.is_available)
+
+        untracked = MenuItem.objects.create(name='Chai', price=50, category=self.category)
+        response = self.client.post(reverse('orders:restock_menu_item', args=[untracked.id]), {'portions': '5'})
+        self.assertEqual(response.status_code, 404)
+
+
+class MenuArchiveTests(TestCase):
+
+    def setUp(self):
+        category = MenuCategory.objects.create(name='Lunch')
+        self.item = MenuItem.objects.create(name='Pilau', price=250, category=category)
+        user = get_user_model().objects.create_user('cus', 'c@a.com', 'pw')
+        self.order = Order.objects.create(user=user, delivery_location='w', phone='1', total_amount=500)
+        for _ in range(3):
+            self.order.items.create(menu_item=self.item, quantity=1, price=250)
+        admin = get_user_model().objects.create_user('boss', password='pw', is_staff=True)
+        self.client.force_login(admin)
+
+    def test_delete_archives_and_keeps_order_history(self):
+        response = self.client.post(reverse('orders:delete_menu_item', args=[self.item.id]))
+        self.assertRedirects(response, reverse('orders:admin_menu'), fetch_redirect_response=False)
+        self.item.refresh_from_db()
+        self.assertEqual((self.item.is_archived, self.item.is_available), (True, False))
+        self.assertIsNotNone(self.item.archived_at)
+        self.assertEqual(self.order.items.count(), 3)
+        self.assertFalse(MenuItem.objects.available().exists())
+
+        self.client.post(reverse('orders:restore_menu_item', args=[self.item.id]))
+        self.item.refresh_from_db()
+        self.assertEqual((self.item.is_archived, self.item.archived_at), (False, None))
+        self.assertEqual(MenuItem.objects.active().get(), self.item)
+
+    def test_purge_only_removes_items_archived_long_enough(self):
+        recent = MenuItem.objects.create(
+            name='Chapati', price=30, category=self.item.category, is_archived=True, archived_at=timezone.now(),
+        )
+        MenuItem.objects.filter(id=self.item.id).update(
+            is_archived=True, archived_at=timezone.now() - timedelta(days=31),
+        )
+        out = io.StringIO()
+        call_command('purge_archived_menu_items', '--batch-size', '2', '--pause', '0', stdout=out)
+
+        self.assertIn('Purged Pilau (3 order lines)', out.getvalue())
+        self.assertEqual(list(MenuItem.objects.all()), [recent])
+        self.assertFalse(OrderItem.objects.exists())
+
+
+class MenuApiTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.category = MenuCategory.objects.create(name='Lunch')
+        self.item = MenuItem.objects.create(name='Pilau', price=250, category=self.category)
+        MenuItem.objects.create(name='Chapati', price=30, category=self.category, is_available=False)
+
+    def test_accepted_encodings_skip_refused_codings(self):
+        self.assertEqual(views._accepted_encodings('gzip;q=0, br; q=0.5, Deflate'), {'br', 'deflate'})
+        self.assertEqual(views._accepted_encodings(''), {''})
+
+    def test_serves_precompressed_json(self):
+        response = self.client.get(reverse('orders:menu_api'), HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual((response['Content-Encoding'], response['Vary']), ('gzip', 'Accept-Encoding'))
+        menu = json.loads(gzip.decompress(response.content))
+        self.assertEqual([item['name'] for item in menu['items']], ['Pilau'])
+        self.assertEqual(menu['categories'][0]['id'], self.category.id)
+
+        plain = self.client.get(reverse('orders:menu_api'), HTTP_ACCEPT_ENCODING='gzip;q=0')
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertEqual(json.loads(plain.content), menu)
+        self.assertEqual(plain['ETag'], response['ETag'])
+
+    def test_etag_follows_the_catalog_version(self):
+        etag = self.client.get(reverse('orders:menu_api'))['ETag']
+        response = self.client.get(reverse('orders:menu_api'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.item.price = 260
+        self.item.save()
+        response = self.client.get(reverse('orders:menu_api'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(json.loads(response.content)['items'][0]['price'], '260.00')
+
+
+class BulkMenuUpdateTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        category = MenuCategory.objects.create(name='Lunch')
+        self.items = [
+            MenuItem.objects.create(name=name, price=100, category=category, tag='none')
+            for name in ('Pilau', 'Chapati', 'Chai')
+        ]
+        admin = get_user_model().objects.create_user('boss', password='pw', is_staff=True)
+        self.client.force_login(admin)
+
+    def post(self, body):
+        return self.client.post(
+            reverse('orders:bulk_update_menu_items'), json.dumps(body), content_type='application/json',
+        )
+
+    def test_bulk_update_changes_only_the_given_fields_and_bumps_the_catalog(self):
+        version = catalog_version()
+        etag = self.client.get(reverse('orders:menu_api'))['ETag']
+        response = self.post({'item_ids': [self.items[0].id, self.items[1].id], 'is_available': False, 'tag': 'new'})
+        self.assertEqual(response.json(), {'success': True, 'updated': 2})
+
+        self.assertEqual(
+            list(MenuItem.objects.order_by('id').values_list('is_available', 'tag', 'price')),
+            [(False, 'new', 100), (False, 'new', 100), (True, 'none', 100)],
+        )
+        self.assertNotEqual(catalog_version(), version)
+        menu = self.client.get(reverse('orders:menu_api'))
+        self.assertNotEqual(menu['ETag'], etag)
+        self.assertEqual([item['name'] for item in json.loads(menu.content)['items']], ['Chai'])
+
+    def test_no_change_keeps_the_catalog_version(self):
+        version = catalog_version()
+        self.assertEqual(self.post({'item_ids': [self.items[0].id]}).json(), {'success': True, 'updated': 0})
+        self.assertEqual(self.post({'item_ids': [], 'is_featured': True}).json()['updated'], 0)
+        self.assertEqual(catalog_version(), version)
+
+    def test_invalid_changes_are_rejected(self):
+        response = self.post({'item_ids': [self.items[0].id], 'price': -1})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('price', response.json()['errors'])
+        self.assertEqual(self.post({'item_ids': 'x'}).status_code, 400)
+
+
+@override_settings(POPULARITY_HALF_LIFE_DAYS=7, POPULARITY_WINDOW_DAYS=28)
+class PopularityTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user('cus', 'c@a.com', 'pw')
+        category = MenuCategory.objects.create(name='Lunch')
+        self.pilau, self.chapati, self.chai, self.mandazi = [
+            MenuItem.objects.create(name=name, price=100, category=category)
+            for name in ('Pilau', 'Chapati', 'Chai', 'Mandazi')
+        ]
+
+    def order(self, days_ago, item, quantity, status='pending'):
+        order = Order.objects.create(user=self.user, delivery_location='w', phone='1', total_amount=0, status=status)
+        order.items.create(menu_item=item, quantity=quantity, price=100)
+        Order.objects.filter(id=order.id).update(created_at=timezone.now() - timedelta(days=days_ago))
+
+    def test_scores_halve_every_half_life(self):
+        self.order(0, self.pilau, 3)
+        self.order(0, self.pilau, 1)
+        self.order(14, self.chapati, 10)
+        self.order(7, self.chai, 2)
+        self.order(0, self.chai, 20, status='cancelled')
+        self.order(30, self.mandazi, 50)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(compute_popularity(), 3)
+
+        scores = {
+            name: (round(score, 6), quantity)
+            for name, score, quantity in MenuItemPopularity.objects.values_list('menu_item__name', 'score', 'quantity')
+        }
+        self.assertEqual(scores, {'Pilau': (4.0, 4), 'Chapati': (2.5, 10), 'Chai': (1.0, 2)})
+        ranked = async_to_sync(apopular_items)()
+        self.assertEqual([item.name for item in ranked], ['Pilau', 'Chapati', 'Chai'])
+
+    def test_recomputing_refreshes_the_cached_ranking(self):
+        self.order(0, self.pilau, 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            compute_popularity()
+        self.assertEqual([item.name for item in async_to_sync(apopular_items)()], ['Pilau'])
+
+        self.order(0, self.chapati, 5)
+        with self.captureOnCommitCallbacks(execute=True):
+            compute_popularity()
+        self.assertEqual([item.name for item in async_to_sync(apopular_items)()], ['Chapati', 'Pilau'])
+
+
+class RecommendationTests(TestCase):
+    # Baskets: {10, 20, 30}, {10, 20}, {20, 30} (20 twice), {40}, {10, 20}
+    ORDER_IDS = [1, 1, 1, 2, 2, 3, 3, 3, 4, 5, 5]
+    ITEM_IDS = [30, 10, 20, 20, 10, 20, 30, 20, 40, 10, 20]
+
+    def test_cooccurrence_counts_each_basket_once(self):
+        items, orders, first, second, together = recommendations.cooccurrence(self.ORDER_IDS, self.ITEM_IDS)
+        self.assertEqual(items.tolist(), [10, 20, 30, 40])
+        self.assertEqual(orders.tolist(), [3, 4, 2, 1])
+        pairs = {(int(items[i]), int(items[j])): int(n) for i, j, n in zip(first, second, together)}
+        self.assertEqual(pairs, {(10, 20): 3, (10, 30): 1, (20, 30): 2})
+
+    def test_top_neighbours_rank_by_cosine_similarity(self):
+        counts = recommendations.cooccurrence(self.ORDER_IDS, self.ITEM_IDS)
+        neighbours, scores = recommendations.top_neighbours(*counts, k=5)
+        self.assertEqual(neighbours.tolist(), [[20, 30, 0], [10, 30, 0], [20, 10, 0], [0, 0, 0]])
+        self.assertAlmostEqual(float(scores[0, 0]), 3 / 12 ** 0.5, places=6)
+        self.assertAlmostEqual(float(scores[2, 1]), 1 / 6 ** 0.5, places=6)
+
+        neighbours, _ = recommendations.top_neighbours(*counts, k=2, min_orders=2)
+        self.assertEqual(neighbours.tolist(), [[20, 0], [10, 30], [20, 0], [0, 0]])
+
+    def test_empty_history(self):
+        counts = recommendations.cooccurrence([], [])
+        neighbours, scores = recommendations.top_neighbours(*counts, k=3)
+        self.assertEqual((neighbours.shape, scores.shape), ((0, 0), (0, 0)))
+
+    def test_built_file_is_served_to_suggestions(self):
+        user = get_user_model().objects.create_user('cus', 'c@a.com', 'pw')
+        category = MenuCategory.objects.create(name='Lunch')
+        pilau, chai, soda = [MenuItem.objects.create(name=name, price=100, category=category) for name in ('Pilau', 'Chai', 'Soda')]
+        for basket in ([pilau, chai], [pilau, chai], [pilau, chai], [pilau, soda], [pilau, soda]):
+            order = Order.objects.create(user=user, delivery_location='w', phone='1', total_amount=0)
+            for item in basket:
+                order.items.create(menu_item=item, quantity=1, price=100)
+        MenuItem.objects.filter(id=soda.id).update(is_available=False)
+
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(RECOMMENDATIONS_FILE=os.path.join(directory, 'recs.npz')):
+            self.assertEqual(recommendations.build_recommendations(), 3)
+            self.assertEqual(recommendations.recommendations.for_items([pilau.id], 4), [chai.id, soda.id])
+            available = {item.id: item for item in MenuItem.objects.available()}
+            self.assertEqual(recommendations.suggestions([pilau.id], available), [chai])
+
+
+    def test_file_is_checked_at_most_once_per_interval(self):
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(RECOMMENDATIONS_FILE=os.path.join(directory, 'recs.npz')), \
+                mock.patch('orders.recommendations.time.monotonic', return_value=1000.0) as monotonic, \
+                mock.patch('orders.recommendations.os.stat', wraps=os.stat) as stat:
+            lookups = recommendations.Recommendations()
+            self.assertEqual(lookups.for_items([1, 2, 3], 4), [])
+            self.assertEqual(stat.call_count, 1)
+
+            with open(settings.RECOMMENDATIONS_FILE, 'wb') as handle:
+                np.savez(handle, items=np.array([1, 2]), neighbours=np.array([[2], [1]]), scores=np.ones((2, 1)))
+            monotonic.return_value += settings.RECOMMENDATIONS_RELOAD_INTERVAL - 1
+            self.assertEqual(lookups.for_items([1], 4), [])
+            self.assertEqual(stat.call_count, 1)
+
+            monotonic.return_value += 1
+            self.assertEqual(lookups.for_items([1], 4), [2])
+            self.assertEqual(stat.call_count, 2)
+
+
+class ForecastTests(SimpleTestCase):
+    DAYS = 28  # four weeks starting on a Monday
+
+    def weekly(self):
+        demand = np.zeros((1, self.DAYS, 24))
+        for day in range(self.DAYS):
+            if day % 7 < 5:
+                demand[0, day, 12] = 10
+            elif day % 7 == 5:
+                demand[0, day, 13] = 15
+                demand[0, day, 19] = 5
+        return demand
+
+    def test_weekly_pattern_is_reproduced(self):
+        demand = self.weekly()
+        saturday = forecast(demand, 0, 5, 0.3)
+        self.assertEqual(saturday.shape, (1, 24))
+        self.assertAlmostEqual(saturday[0, 13], 15)
+        self.assertAlmostEqual(saturday[0, 19], 5)
+        self.assertAlmostEqual(saturday.sum(), 20)
+        monday = forecast(demand, 0, 0, 0.3)
+        self.assertAlmostEqual(monday[0, 12], 10)
+        self.assertAlmostEqual(monday.sum(), 10)
+        self.assertAlmostEqual(forecast(demand, 0, 6, 0.3).sum(), 0)
+        # The same history starting on a Wednesday peaks on Mondays
+        self.assertAlmostEqual(forecast(demand, 2, 0, 0.3).sum(), 20)
+
+    def test_history_starts_at_the_first_sale(self):
+        demand = np.zeros((2, self.DAYS, 24))
+        demand[0, 14:, 18] = 4
+        demand[1, :21, 12] = 2
+        demand[1, 21:, 12] = 8
+        expected = forecast(demand, 0, 2, 0.5).sum(axis=1)
+        self.assertAlmostEqual(expected[0], 4)
+        self.assertTrue(7.9 < expected[1] < 8)
+
+    def test_demand_array_adds_rows_for_the_same_cell(self):
+        start = date(2026, 3, 2)
+        rows = [(7, date(2026, 3, 3), 12, 2), (7, date(2026, 3, 3), 12, 3), (5, date(2026, 3, 2), 9, 1)]
+        item_ids, demand = demand_array(rows, start, 7)
+        self.assertEqual(item_ids.tolist(), [5, 7])
+        self.assertEqual((demand[1, 1, 12], demand[0, 0, 9], demand.sum()), (5, 1, 6))
+        self.assertEqual(forecast(demand_array([], start, 7)[1], 0, 1, 0.3).shape, (0, 24))
+
+
+class TemplateMinifyTests(SimpleTestCase):
+
+    def engine(self, templates):
+        return Engine(loaders=[
+            ('orders.template_loaders.Loader', [('django.template.loaders.locmem.Loader', templates)]),
+        ])
+
+    def test_minify_keeps_preserved_blocks_and_conditional_comments(self):
+        source = (
+            '<div>\n    <!-- note -->\n   <p>Hi   there</p>\n</div>\n'
+            '<pre>  a\n   b</pre>  <script>var  x = 1;</script>\n<!--[if IE]><p>old</p><![endif]-->'
+        )
+        self.assertEqual(
+            minify_html(source),
+            '<div>\n<p>Hi there</p>\n</div>\n<pre>  a\n   b</pre> <script>var  x = 1;</script>\n'
+            '<!--[if IE]><p>old</p><![endif]-->\n',
+        )
+
+    def test_minify_keeps_textarea_verbatim_blocks_and_template_literals(self):
+        cases = [
+            '<textarea name="notes">  line one\n\n    line two  </textarea>',
+            '{% verbatim %}<p>{{   not   a   variable   }}</p>\n\n  {% endverbatim %}',
+            '{{ item.note|default:"no   notes   yet" }}',
+            '{% blocktrans with name="A   B" %}Hi{% endblocktrans %}',
+            '{% include "orders/row.html" with label="Total   due" %}',
+        ]
+        for source in cases:
+            with self.subTest(source=source):
+                self.assertEqual(minify_html(f'<div>\n   {source}\n   </div>'), f'<div>\n{source}\n</div>\n')
+
+    def test_minified_templates_render_the_same_literals(self):
+        engine = self.engine({
+            'page.html': '<p>{{ missing|default:"a   b" }}</p>\n<textarea>\n  x   y</textarea>{% verbatim %}{{  z  }}{% endverbatim %}',
+        })
+        self.assertEqual(
+            engine.get_template('page.html').render(Context()),
+            '<p>a   b</p>\n<textarea>\n  x   y</textarea>{{  z  }}\n',
+        )
+
+    def test_loader_minifies_html_templates_only(self):
+        engine = self.engine({
+            'page.html': '<ul>\n  <!-- {{ secret }} -->\n  <li>{{ name }}</li>\n</ul>',
+            'mail.txt': 'Hello   {{ name }}\n\n  Bye',
+        })
+        context = Context({'name': 'Pilau', 'secret': 'x'})
+        self.assertEqual(engine.get_template('page.html').render(context), '<ul>\n<li>Pilau</li>\n</ul>\n')
+        self.assertEqual(engine.get_template('mail.txt').render(context), 'Hello   Pilau\n\n  Bye')
+        with self.settings(TEMPLATE_MINIFY=False):
+            source = self.engine({'page.html': '<p>  {{ name }}  </p>'}).get_template('page.html')
+            self.assertEqual(source.render(context), '<p>  Pilau  </p>')
+
+    def test_warm_templates_compiles_every_template(self):
+        count, _, errors = warm_templates()
+        self.assertEqual(errors, [])
+        self.assertGreater(count, 0)
+        loader = engines['django'].engine.template_loaders[0]
+        self.assertIn('orders/menu_item_form.html', loader.get_template_cache)
+
+
+class ConcurrentStockTests(TransactionTestCase):
+
+    def test_concurrent_checkouts_never_oversell(self):
+        category = MenuCategory.objects.create(name='Lunch')
+        item = MenuItem.objects.create(name='Biryani', price=300, category=category, daily_stock=10, stock=10)
+        results = []
+        start = threading.Barrier(25)
+
+        def checkout():
+            try:
+                start.wait()
+                with transaction.atomic():
+                    take_stock([(item, 1)])
+                results.append(True)
+            except OutOfStock:
+                results.append(False)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=checkout) for _ in range(25)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        item.refresh_from_db()
+        self.assertEqual(results.count(True), 10)
+        self.assertEqual(results.count(False), 15)
+        self.assertEqual(item.stock, 0)
+        self.assertFalse(item.is_available)
+
+
+@override_settings(RATE_LIMIT_IP_MULTIPLIER=1)
+class RateLimitTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_concurrent_requests_never_overdraw_a_bucket(self):
+        results = []
+        start = threading.Barrier(20)
+
+        def post():
+            start.wait()
+            request = RequestFactory().post('/', REMOTE_ADDR='10.0.0.1')
+            results.append(take_token(request, 'checkout', '10/h'))
+
+        threads = [threading.Thread(target=post) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results.count(0), 10)
+        self.assertTrue(all(0 < wait <= 3600 for wait in results if wait))
+
+    def test_buckets_refill_at_the_rate(self):
+        request = RequestFactory().post('/', REMOTE_ADDR='10.0.0.2')
+        with mock.patch('orders.ratelimit.time.time', return_value=120.0):
+            self.assertEqual([take_token(request, 'contact', '2/m') for _ in range(3)], [0, 0, 30])
+        # Half a period refills one token, not the whole bucket
+        with mock.patch('orders.ratelimit.time.time', return_value=150.0):
+            self.assertEqual([take_token(request, 'contact', '2/m') for _ in range(2)], [0, 30])
+        # No burst across a window boundary: the refused request was not charged
+        with mock.patch('orders.ratelimit.time.time', return_value=165.0):
+            self.assertEqual(take_token(request, 'contact', '2/m'), 15)
+
+    def test_a_refused_bucket_charges_none_of_the_others(self):
+        request = RequestFactory().post('/', REMOTE_ADDR='10.0.0.4')
+        request.session = mock.Mock(session_key='abc')
+        with mock.patch('orders.ratelimit.time.time', return_value=60.0):
+            take_token(request, 'contact', '1/m')
+            request.session.session_key = 'def'
+            self.assertEqual(take_token(request, 'contact', '1/m'), 60)
+            tokens, _ = cache.get('orders:ratelimit:contact:session:def', (1, 0))
+            self.assertEqual(tokens, 1)
+
+    def test_in_flight_counter_caps(self):
+        self.assertTrue(_enter('checkout', 2, 60))
+        self.assertTrue(_enter('checkout', 2, 60))
+        self.assertFalse(_enter('checkout', 2, 60))
+        _leave('checkout')
+        self.assertTrue(_enter('checkout', 2, 60))
+        self.assertEqual(cache.get('orders:ratelimit:inflight:checkout'), 2)
+
+    def test_leaked_slots_lapse_when_nothing_gets_in(self):
+        self.assertTrue(_enter('checkout', 1, 60))
+        self.assertFalse(_enter('checkout', 1, 60))
+        # Stands in for CONCURRENCY_SLOT_TIMEOUT passing with nobody let in
+        cache.delete('orders:ratelimit:inflight:checkout')
+        self.assertTrue(_enter('checkout', 1, 60))
+
+    @override_settings(CONCURRENCY_LIMITS={'checkout': 1})
+    def test_concurrency_limit_releases_the_slot_when_the_view_fails(self):
+        @concurrency_limit('checkout')
+        def view(request):
+            raise RuntimeError
+
+        with self.assertRaises(RuntimeError):
+            view(RequestFactory().post('/'))
+        self.assertEqual(cache.get('orders:ratelimit:inflight:checkout'), 0)
+
+    def test_rate_limit_never_touches_the_database(self):
+        # SimpleTestCase fails any query
+        request = RequestFactory().post('/', REMOTE_ADDR='10.0.0.3')
+        for _ in range(5):
+            take_token(request, 'checkout', '2/m')
+            if _enter('checkout', 1, 60):
+                _leave('checkout')
+
+
+class FileBasedCacheTests(SimpleTestCase):
+
+    def test_concurrent_add_and_incr_lose_no_updates(self):
+        with tempfile.TemporaryDirectory() as directory:
+            shared = FileBasedCache(directory, {})
+            start = threading.Barrier(12)
+
+            def count():
+                # Each thread has its own instance, like each worker process
+                worker = FileBasedCache(directory, {})
+                start.wait()
+                for _ in range(10):
+                    worker.add('counter', 0, 60)
+                    worker.incr('counter')
+
+            threads = [threading.Thread(target=count) for _ in range(12)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            self.assertEqual(shared.get('counter'), 120)
+            self.assertEqual(shared.decr('counter', 20), 100)
+
+    def test_incr_keeps_the_expiry(self):
+        with tempfile.TemporaryDirectory() as directory:
+            backend = FileBasedCache(directory, {})
+            backend.add('counter', 0, 60)
+            with mock.patch('orders.cache_backends.time.time', return_value=time.time() + 61):
+                with self.assertRaises(ValueError):
+                    backend.incr('counter')
+            with self.assertRaises(ValueError):
+                backend.incr('missing')
+
+
+class TransitionTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('cus', 'c@a.com', 'pw')
+
+    def place(self, status=Order.Status.PENDING, minutes_ago=0):
+        order = Order.objects.create(user=self.user, delivery_location='w', phone='1', total_amount=300)
+        Order.objects.filter(id=order.id).update(
+            status=status, created_at=timezone.now() - timedelta(minutes=minutes_ago),
+        )
+        return order
+
+    def test_illegal_transitions_are_refused(self):
+        delivered = self.place(Order.Status.DELIVERED)
+        result = transition_orders([delivered.id], Order.Status.PENDING)
+        self.assertEqual(result.updated, [])
+        self.assertEqual(result.skipped, [{
+            'id': delivered.id, 'order_number': delivered.order_number, 'status': 'delivered',
+            'reason': 'Cannot move from Delivered to Pending',
+        }])
+        delivered.refresh_from_db()
+        self.assertEqual(delivered.status, 'delivered')
+        self.assertFalse(OrderStatusEvent.objects.exists())
+
+        with self.assertRaises(ValueError):
+            transition_orders([delivered.id], 'eaten')
+
+    def test_mixed_batch_reports_updated_and_skipped_orders(self):
+        pending = [self.place(), self.place()]
+        preparing = self.place(Order.Status.PREPARING)
+        result = transition_orders([order.id for order in (*pending, preparing)] + [999999], Order.Status.CONFIRMED)
+
+        self.assertEqual(
+            sorted(result.updated),
+            sorted((order.id, order.order_number, 'pending') for order in pending),
+        )
+        self.assertEqual([(skip['id'], skip['status']) for skip in result.skipped], [(preparing.id, 'preparing'), (999999, None)])
+        self.assertEqual(result.skipped[1]['reason'], 'Order not found')
+        self.assertEqual(
+            dict(Order.objects.values_list('id', 'status')),
+            {pending[0].id: 'confirmed', pending[1].id: 'confirmed', preparing.id: 'preparing'},
+        )
+
+    def test_events_and_hourly_rollups_are_written(self):
+        orders = [self.place(minutes_ago=10), self.place(minutes_ago=20)]
+        ids = [order.id for order in orders]
+        transition_orders(ids, Order.Status.CONFIRMED)
+        transition_orders(ids, Order.Status.PREPARING)
+
+        events = OrderStatusEvent.objects.filter(order_id=orders[1].id).order_by('id')
+        self.assertEqual([(event.from_status, event.status) for event in events], [('pending', 'confirmed'), ('confirmed', 'preparing')])
+        # Time in a status is measured from creation, then from the last event
+        self.assertAlmostEqual(events[0].duration_seconds, 20 * 60, delta=5)
+        self.assertLess(events[1].duration_seconds, 5)
+
+        stats = {row.status: row for row in OrderStatusHourlyStats.objects.all()}
+        self.assertEqual(set(stats), {'confirmed', 'preparing'})
+        confirmed = stats['confirmed']
+        self.assertEqual((confirmed.count, confirmed.timed_count), (2, 2))
+        self.assertAlmostEqual(confirmed.total_seconds, 30 * 60, delta=10)
+
+    def test_bulk_update_view_answers_json_with_skipped_orders(self):
+        admin = get_user_model().objects.create_user('boss', password='pw', is_staff=True)
+        self.client.force_login(admin)
+        pending = self.place()
+        cancelled = self.place(Order.Status.CANCELLED)
+
+        response = self.client.post(
+            reverse('orders:bulk_update_order_status'),
+            {'order_ids': [pending.id, cancelled.id], 'status': 'confirmed'},
+            content_type='application/json',
+        )
+        data = response.json()
+        self.assertEqual(data['updated'], [{'id': pending.id, 'order_number': pending.order_number, 'previous_status': 'pending'}])
+        self.assertEqual([skip['id'] for skip in data['skipped']], [cancelled.id])
+
+        response = self.client.post(
+            reverse('orders:bulk_update_order_status'), {'order_ids': [pending.id], 'status': 'eaten'},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class OrderAdminTests(TestCase):
+
+    def setUp(self):
+        self.alice = get_user_model().objects.create_user('alice', 'alice@a.com', 'pw')
+        bob = get_user_model().objects.create_user('bob', 'bob@a.com', 'pw')
+        self.orders = [
+            Order.objects.create(user=user, delivery_location='w', phone='1', total_amount=100)
+            for user in (self.alice, self.alice, bob)
+        ]
+        admin_user = get_user_model().objects.create_superuser('boss', 'boss@a.com', 'pw')
+        self.client.force_login(admin_user)
+        self.url = reverse('admin:orders_order_changelist')
+
+    def search(self, term):
+        response = self.client.get(self.url, {'q': term})
+        return {order.id for order in response.context['cl'].result_list}
+
+    def test_search_matches_exact_values_only(self):
+        first, second, third = self.orders
+        self.assertEqual(self.search(f'  {third.order_number.lower()} '), {third.id})
+        self.assertEqual(self.search('alice'), {first.id, second.id})
+        self.assertEqual(self.search('bob@a.com'), {third.id})
+        self.assertEqual(self.search(first.order_number[:-1]), set())
+        self.assertEqual(self.search('ali'), set())
+        self.assertEqual(self.search(''), {order.id for order in self.orders})
+
+    def test_status_actions_go_through_transitions(self):
+        first, second, third = self.orders
+        transition_orders([third.id], 'cancelled')
+        response = self.client.post(self.url, {
+            'action': 'mark_confirmed',
+            '_selected_action': [order.id for order in self.orders],
+        }, follow=True)
+
+        self.assertEqual(
+            dict(Order.objects.values_list('id', 'status')),
+            {first.id: 'confirmed', second.id: 'confirmed', third.id: 'cancelled'},
+        )
+        self.assertEqual(OrderStatusEvent.objects.filter(status='confirmed').count(), 2)
+        self.assertEqual(
+            [str(message) for message in response.context['messages']],
+            ['2 order(s) moved to Confirmed.', '1 order(s) skipped: not allowed from their status.'],
+        )
+
+    def test_pending_is_not_an_action(self):
+        actions = self.client.get(self.url).context['action_form'].fields['action'].choices
+        names = {name for name, _ in actions}
+        self.assertIn('mark_delivered', names)
+        self.assertNotIn('mark_pending', names)
+
+
+class StatusRollupTests(TestCase):
+
+    def setUp(self):
+        user = get_user_model().objects.create_user('cus', 'c@a.com', 'pw')
+        self.orders = [
+            Order.objects.create(user=user, delivery_location='w', phone='1', total_amount=100) for _ in range(3)
+        ]
+        ids = [order.id for order in self.orders]
+        start = timezone.now().replace(minute=0, second=0, microsecond=0) - timedelta(days=1)
+        Order.objects.filter(id__in=ids).update(created_at=start)
+        record_status_events([(order_id, '') for order_id in ids], 'pending', at=start)
+        record_status_events([(order_id, 'pending') for order_id in ids], 'confirmed', at=start + timedelta(minutes=6))
+        record_status_events([(ids[0], 'confirmed')], 'out_for_delivery', at=start + timedelta(minutes=26))
+        self.start = start
+
+    def rollups(self):
+        return list(OrderStatusHourlyStats.objects.values_list('hour', 'status', 'count', 'timed_count', 'total_seconds'))
+
+    def test_rebuild_reproduces_the_incremental_rollups(self):
+        incremental = self.rollups()
+        self.assertEqual(incremental, [
+            (self.start, 'confirmed', 3, 3, 3 * 360),
+            (self.start, 'out_for_delivery', 1, 1, 1200),
+            (self.start, 'pending', 3, 0, 0),
+        ])
+        OrderStatusHourlyStats.objects.update(count=99)
+        call_command('rebuild_status_stats', stdout=io.StringIO())
+        self.assertEqual(self.rollups(), incremental)
+
+    def test_kitchen_times_average_the_rollups(self):
+        rows = reports.kitchen_times(self.start, self.start + timedelta(hours=1))
+        by_status = {row['status']: (row['count'], row['avg_minutes']) for row in rows}
+        self.assertEqual(by_status['confirmed'], (3, 6.0))
+        self.assertEqual(by_status['out_for_delivery'], (1, 20.0))
+        self.assertNotIn('pending', by_status)
+
+
+class ArchiveTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('cus', 'c@a.com', 'pw')
+        category = MenuCategory.objects.create(name='Lunch')
+        self.item = MenuItem.objects.create(name='Pilau', price=250, category=category)
+
+    def place(self, days_ago, *statuses, amount=250):
+        order = Order.objects.create(user=self.user, delivery_location='w', phone='1', total_amount=amount)
+        order.items.create(menu_item=self.item, quantity=1, price=amount)
+        for status in statuses:
+            transition_orders([order.id], status)
+        Order.objects.filter(id=order.id).update(created_at=timezone.now() - timedelta(days=days_ago))
+        return order
+
+    def archive_all(self, days=30):
+        moved = []
+        while batch := archive_batch(archive_cutoff(days), 1):
+            moved.append(batch)
+        return moved
+
+    def test_only_old_finished_orders_are_archived(self):
+        delivered = self.place(40, 'confirmed', 'preparing', 'out_for_delivery', 'delivered')
+        cancelled = self.place(40, 'cancelled')
+        pending = self.place(40)
+        recent = self.place(1, 'confirmed', 'preparing', 'out_for_delivery', 'delivered')
+        events = {
+            order.id: list(OrderStatusEvent.objects.filter(order=order).values_list('id', 'status', 'created_at'))
+            for order in (delivered, cancelled)
+        }
+
+        self.assertEqual(self.archive_all(), [1, 1])
+
+        self.assertEqual(set(Order.objects.values_list('id', flat=True)), {pending.id, recent.id})
+        self.assertEqual(set(ArchivedOrder.objects.values_list('id', flat=True)), {delivered.id, cancelled.id})
+        archived = ArchivedOrder.objects.get(id=delivered.id)
+        self.assertEqual((archived.order_number, archived.status), (delivered.order_number, 'delivered'))
+        self.assertEqual([(item.menu_item, item.quantity) for item in archived.items.all()], [(self.item, 1)])
+        for order_id, rows in events.items():
+            self.assertEqual(
+                list(ArchivedOrderStatusEvent.objects.filter(order_id=order_id).values_list('id', 'status', 'created_at')),
+                rows,
+            )
+        self.assertFalse(OrderStatusEvent.objects.filter(order_id__in=events).exists())
+        self.assertFalse(OrderItem.objects.filter(order_id__in=events).exists())
+
+    def test_rebuilt_status_stats_keep_archived_orders(self):
+        self.place(40, 'confirmed', 'preparing', 'out_for_delivery', 'delivered')
+        self.place(40, 'cancelled')
+        self.place(1, 'confirmed')
+        fields = ('hour', 'status', 'count', 'timed_count', 'total_seconds')
+        before = list(OrderStatusHourlyStats.objects.values_list(*fields))
+
+        self.archive_all()
+        call_command('rebuild_status_stats', stdout=io.StringIO())
+
+        self.assertEqual(list(OrderStatusHourlyStats.objects.values_list(*fields)), before)
+        self.assertEqual(sum(row[2] for row in before), 6)
+
+    def test_customer_history_spans_hot_and_archived_orders(self):
+        orders = [
+            self.place(days_ago, *(['cancelled'] if days_ago > 30 else []), amount=100 * number)
+            for number, days_ago in enumerate((1, 2, 3, 40, 41, 42), start=1)
+        ]
+        self.archive_all()
+        self.assertEqual(ArchivedOrder.objects.count(), 3)
+
+        self.assertEqual(customer_order_totals(self.user), {'total_orders': 6, 'total_spent': 2100})
+        pages = [customer_orders_page(self.user, page, 2) for page in (1, 2, 3, 4)]
+        self.assertEqual(
+            [([order.id for order in page], has_next) for page, has_next in pages],
+            [
+                ([orders[0].id, orders[1].id], True),
+                ([orders[2].id, orders[3].id], True),
+                ([orders[4].id, orders[5].id], False),
+                ([], False),
+            ],
+        )
+        self.assertIsInstance(pages[1][0][1], ArchivedOrder)
+
+
+@override_settings(KITCHEN_SLOT_MAX_ORDERS=2, KITCHEN_SLOT_MAX_ITEMS=0)
+class CheckoutSlotTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user('cus', 'c@a.com', 'pw', workplace='w', phone='1')
+        category = MenuCategory.objects.create(name='Lunch')
+        self.item = MenuItem.objects.create(name='Pilau', price=250, category=category, daily_stock=5, stock=5)
+        self.client.force_login(self.user)
+        self.client.post(reverse('orders:add_to_cart', args=[self.item.id]), {'quantity': 2})
+
+    def test_a_slot_filling_up_during_checkout_offers_the_next_one(self):
+        first, second = upcoming_slots(2)
+
+        def taken_meanwhile(start, order_items):
+            # Another checkout books the slot's last places first
+            KitchenSlot.objects.update_or_create(start=start, defaults={'orders': 2})
+            return reserve_slot(start, order_items)
+
+        data = {'payment_method': 'cash', 'slot_start': first.isoformat(), 'notes': ''}
+        with mock.patch('orders.views.reserve_slot', side_effect=taken_meanwhile):
+            response = self.client.post(reverse('orders:checkout'), data)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['form'].data['slot_start'], second.isoformat())
+        self.assertIn(f'The next available time is {second:%H:%M}', [str(m) for m in response.context['messages']][-1])
+        self.assertFalse(Order.objects.exists())
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.stock, 5)
+
+        response = self.client.post(reverse('orders:checkout'), response.context['form'].data)
+        order = Order.objects.get()
+        self.assertRedirects(response, reverse('orders:order_success', args=[order.id]), fetch_redirect_response=False)
+        self.assertEqual(order.slot_start, second)
+        self.assertEqual(KitchenSlot.objects.get(start=second).orders, 1)
+
+    def test_no_room_anywhere_asks_to_come_back_later(self):
+        first = upcoming_slots(1)[0]
+
+        def kitchen_full(start, order_items):
+            for slot in upcoming_slots():
+                KitchenSlot.objects.update_or_create(start=slot, defaults={'orders': 2})
+            return reserve_slot(start, order_items)
+
+        data = {'payment_method': 'cash', 'slot_start': first.isoformat(), 'notes': ''}
+        with mock.patch('orders.views.reserve_slot', side_effect=kitchen_full):
+            response = self.client.post(reverse('orders:checkout'), data)
+        self.assertEqual(response.context['form'].data['slot_start'], '')
+        self.assertFalse(response.context['form'].is_valid())
+        self.assertFalse(Order.objects.exists())
+
+    def test_admin_slot_filter_reads_naive_times_as_local(self):
+        slot = upcoming_slots(1)[0]
+        order = Order.objects.create(user=self.user, delivery_location='w', phone='1', total_amount=0, slot_start=slot)
+        admin = get_user_model().objects.create_user('boss', password='pw', is_staff=True)
+        self.client.force_login(admin)
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', RuntimeWarning)
+            for value in (slot.isoformat(), slot.replace(tzinfo=None).isoformat()):
+                response = self.client.get(reverse('orders:admin_orders'), {'slot': value})
+                self.assertEqual([o.id for o in response.context['orders']], [order.id])
+
+
+class SlotReleaseTests(TestCase):
+
+    @override_settings(KITCHEN_SLOT_MAX_ORDERS=2, KITCHEN_SLOT_MAX_ITEMS=0)
+    def test_cancelling_frees_the_booking(self):
+        user = get_user_model().objects.create_user('cus', 'c@a.com', 'pw')
+        category = MenuCategory.objects.create(name='Lunch')
+        item = MenuItem.objects.create(name='Pilau', price=250, category=category)
+        slot = slot_start()
+        orders = []
+        for quantity in (2, 3):
+            reserve_slot(slot, quantity)
+            order = Order.objects.create(
+                user=user, delivery_location='w', phone='1', total_amount=250 * quantity, slot_start=slot,
+            )
+            order.items.create(menu_item=item, quantity=quantity, price=250)
+            orders.append(order)
+        with self.assertRaises(SlotFull):
+            reserve_slot(slot, 1)
+
+        transition_orders([orders[0].id], Order.Status.CANCELLED)
+        booked = KitchenSlot.objects.get(start=slot)
+        self.assertEqual((booked.orders, booked.items), (1, 3))
+        reserve_slot(slot, 1)
+
+        # Cancelling twice gives nothing more back
+        transition_orders([orders[0].id], Order.Status.CANCELLED)
+        booked.refresh_from_db()
+        self.assertEqual((booked.orders, booked.items), (2, 4))
+
+
+class QuantileSketchTests(SimpleTestCase):
+
+    def setUp(self):
+        rng = random.Random(48)
+        # Long-tailed, like order values
+        self.values = [rng.lognormvariate(6, 0.8) for _ in range(20000)]
+
+    def assertWithinAccuracy(self, sketch, values):
+        exact = sorted(values)
+        for q in (0, 0.01, 0.25, 0.5, 0.9, 0.99, 0.999, 1):
+            expected = exact[int(q * (len(exact) - 1))]
+            estimate = sketch.quantile(q)
+            self.assertLessEqual(
+                abs(estimate - expected), sketch.relative_accuracy * expected * (1 + 1e-9),
+                f'q={q}: {estimate} vs {expected}',
+            )
+
+    def test_quantiles_are_within_relative_accuracy(self):
+        for accuracy in (0.01, 0.05):
+            sketch = QuantileSketch(accuracy)
+            for value in self.values:
+                sketch.add(value)
+            self.assertEqual(sketch.count, len(self.values))
+            self.assertWithinAccuracy(sketch, self.values)
+
+    def test_merged_sketches_equal_one_sketch_of_everything(self):
+        whole = QuantileSketch()
+        merged = QuantileSketch()
+        for day in range(7):
+            part = QuantileSketch()
+            for value in self.values[day::7]:
+                part.add(value)
+                whole.add(value)
+            merged.merge(QuantileSketch.from_dict(part.to_dict()))
+        self.assertEqual(merged.buckets, whole.buckets)
+        self.assertEqual(merged.count, whole.count)
+        self.assertWithinAccuracy(merged, self.values)
+
+    def test_zeros_and_empty_sketches(self):
+        sketch = QuantileSketch()
+        self.assertIsNone(sketch.quantile(0.5))
+        for value in (0, 0, 0, 10):
+            sketch.add(value)
+        self.assertEqual(sketch.quantile(0.5), 0)
+        self.assertAlmostEqual(sketch.quantile(1), 10, delta=0.1)
+
+    def test_merging_different_accuracies_is_refused(self):
+        with self.assertRaises(ValueError):
+            QuantileSketch(0.01).merge(QuantileSketch(0.02))
+
+
+class DailySketchTests(TestCase):
+
+    def test_date_ranges_merge_daily_sketches(self):
+        rng = random.Random(7)
+        days = [date(2026, 3, 1) + timedelta(days=offset) for offset in range(10)]
+        by_day = {day: [rng.uniform(100, 2000) for _ in range(300)] for day in days}
+        for day, values in by_day.items():
+            add_values(DailySketch.Metric.ORDER_VALUE, day, values[:150])
+            add_values(DailySketch.Metric.ORDER_VALUE, day, values[150:])
+        self.assertEqual(DailySketch.objects.count(), len(days))
+
+        in_range = [value for day in days[2:6] for value in by_day[day]]
+        result = percentiles(DailySketch.Metric.ORDER_VALUE, days[2], days[5])
+        exact = sorted(in_range)
+        self.assertEqual(result['count'], len(in_range))
+        for key, q in (('p50', 0.5), ('p90', 0.9), ('p99', 0.99)):
+            expected = exact[int(q * (len(exact) - 1))]
+            self.assertLessEqual(abs(result[key] - expected), 0.01 * expected * (1 + 1e-9))
+
+    def test_orders_feed_value_and_delivery_sketches(self):
+        user = get_user_model().objects.create_user('cus', 'c@a.com', 'pw')
+        with self.captureOnCommitCallbacks(execute=True):
+            order = Order.objects.create(user=user, delivery_location='w', phone='1', total_amount=450)
+        Order.objects.filter(id=order.id).update(created_at=timezone.now() - timedelta(minutes=30))
+        for status in ('confirmed', 'preparing', 'out_for_delivery', 'delivered'):
+            transition_orders([order.id], status)
+
+        today = timezone.localdate()
+        value = merged_sketch(DailySketch.Metric.ORDER_VALUE, today, today)
+        self.assertEqual(value.count, 1)
+        self.assertAlmostEqual(value.quantile(0.5), 450, delta=4.5)
+        delivery = merged_sketch(DailySketch.Metric.DELIVERY_TIME, today, today)
+        self.assertEqual(delivery.count, 1)
+        self.assertAlmostEqual(delivery.quantile(0.5), 1800, delta=18)
+
+
+class ConcurrentSketchTests(TransactionTestCase):
+
+    @override_settings(KITCHEN_SLOT_MAX_ORDERS=0, KITCHEN_SLOT_MAX_ITEMS=0)
+    def test_concurrent_orders_all_reach_the_sketch(self):
+        user = get_user_model().objects.create_user('cus', 'c@a.com', 'pw')
+        slot = slot_start()
+        errors = []
+        start = threading.Barrier(16)
+
+        def place_order(value):
+            try:
+                start.wait()
+                # As at checkout: the slot booking takes the write lock first
+                with transaction.atomic():
+                    reserve_slot(slot, 1)
+                    Order.objects.create(user=user, delivery_location='w', phone='1', total_amount=value)
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=place_order, args=(100 + n,)) for n in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        today = timezone.localdate()
+        self.assertEqual(merged_sketch(DailySketch.Metric.ORDER_VALUE, today, today).count, 16)
+
+
+class MetricsMergeTests(SimpleTestCase):
+
+    def test_only_server_workers_record(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_DIR=directory):
+            with mock.patch.multiple(metrics, _store=None, _store_pid=None), mock.patch.dict(os.environ):
+                os.environ.pop(metrics.RECORD_ENV, None)
+                metrics.inc('orders_placed_total')
+                metrics.observe('http_request_duration_seconds', 0.2, view='menu')
+                self.assertEqual(list(Path(directory).iterdir()), [])
+
+            with mock.patch.multiple(metrics, _store=None, _store_pid=None), \
+                    mock.patch.dict(os.environ, {metrics.RECORD_ENV: '1'}):
+                metrics.inc('orders_placed_total', 2)
+                metrics.store().close()
+                self.assertEqual([path.name for path in Path(directory).iterdir()], [f'{os.getpid()}.db'])
+                self.assertEqual(metrics.collect(), {'orders_placed_total': 2})
+
+    def test_exited_workers_fold_into_the_aggregate(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_DIR=directory):
+            for pid, amount in ((101, 2), (102, 3), (103, 5)):
+                worker = metrics.FileStore(Path(directory) / f'{pid}.db')
+                worker.inc('orders_placed_total', amount)
+                worker.close()
+            metrics.merge_process(101, directory)
+            metrics.merge_process(102, directory)
+
+            self.assertEqual(sorted(path.name for path in Path(directory).iterdir()), ['103.db', 'aggregate.db'])
+            self.assertEqual(metrics.collect(), {'orders_placed_total': 10})
+
+
+class SlowQueryLogTests(TestCase):
+
+    def test_runs_are_appended_with_redacted_params(self):
+        sql = 'SELECT id FROM auth_user WHERE password = %s AND id = %s'
+        with tempfile.TemporaryDirectory() as directory, override_settings(SLOW_QUERY_DIR=directory), \
+                self.assertLogs('orders.slow_queries', 'WARNING'):
+            slow_queries.record(connection, sql, ['pbkdf2_sha256$secret', 7], False, 0.25)
+            slow_queries.record(connection, sql, ['pbkdf2_sha256$other', 8], False, 0.5)
+            [entry] = slow_queries.load_records()
+            log = Path(directory, f'{entry["fingerprint"]}.log').read_text()
+
+        self.assertEqual((entry['count'], entry['total_ms'], entry['max_ms']), (2, 750.0, 500.0))
+        self.assertEqual(entry['last']['params'], ['str[19]', 'int'])
+        self.assertNotIn('secret', log)
+        self.assertTrue(entry['plan'])
+
+    def test_only_queries_over_the_threshold_are_recorded(self):
+        def execute(sql, params, many, context):
+            time.sleep(0.01)
+
+        sql = 'SELECT id FROM orders_order WHERE id = %s'
+        context = {'connection': connection}
+        with tempfile.TemporaryDirectory() as directory, override_settings(SLOW_QUERY_DIR=directory):
+            with override_settings(SLOW_QUERY_MS=1000):
+                slow_queries._log_slow_query(execute, sql, [1], False, context)
+            self.assertEqual(slow_queries.load_records(), [])
+            with override_settings(SLOW_QUERY_MS=5), self.assertLogs('orders.slow_queries', 'WARNING'):
+                slow_queries._log_slow_query(execute, sql, [2], False, context)
+            [entry] = slow_queries.load_records()
+        self.assertEqual(entry['count'], 1)
+        self.assertTrue(entry['last']['site'].startswith('orders/tests.py:'))
+
+    def test_call_site_skips_the_entry_point(self):
+        # Run from a frame that claims to be manage.py, as under ``manage.py runserver``
+        code = compile('result = call_site()', os.path.join(settings.BASE_DIR, 'manage.py'), 'exec')
+        namespace = {'call_site': slow_queries.call_site}
+        exec(code, namespace)
+        site, view, _ = namespace['result']
+        self.assertTrue(site.startswith('orders/tests.py:'))
+        self.assertTrue(view.startswith('orders/tests.py:'))
+
+
+class AsyncViewTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.customer = User.objects.create_user('cus', 'c@a.com', 'pw')
+        self.other = User.objects.create_user('other', 'o@a.com', 'pw')
+        self.admin = User.objects.create_user('boss', password='pw', is_staff=True)
+        self.lunch = MenuCategory.objects.create(name='Lunch')
+        drinks = MenuCategory.objects.create(name='Drinks')
+        self.pilau = MenuItem.objects.create(name='Pilau', price=250, category=self.lunch, is_featured=True)
+        MenuItem.objects.create(name='Chai', price=50, category=drinks, tag='popular')
+        MenuItem.objects.create(name='Soda', price=80, category=drinks, tag='new', is_available=False)
+        self.order = Order.objects.create(user=self.customer, delivery_location='w', phone='1', total_amount=250)
+
+    async def login(self, user):
+        await sync_to_async(self.async_client.force_login)(user)
+
+    def names(self, response, key):
+        return [item.name for item in response.context[key]]
+
+    async def test_home(self):
+        response = await self.async_client.get(reverse('orders:home'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.names(response, 'menu_items'), ['Pilau', 'Chai'])
+        response = await self.async_client.get(reverse('orders:home'), {'category': self.lunch.slug})
+        self.assertEqual(self.names(response, 'menu_items'), ['Pilau'])
+        # Nothing ranked yet: the hand-tagged popular items
+        response = await self.async_client.get(reverse('orders:home'), {'tag': 'popular'})
+        self.assertEqual(self.names(response, 'menu_items'), ['Chai'])
+        self.assertEqual(response.context['selected_tag'], 'popular')
+
+    async def test_menu(self):
+        response = await self.async_client.get(reverse('orders:menu'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(self.names(response, 'menu_items')), ['Chai', 'Pilau'])
+        self.assertEqual([t.name for t in response.templates][0], 'orders/menu_list.html')
+        self.assertEqual(len(response.context['categories']), 2)
+
+        await self.login(self.customer)
+        response = await self.async_client.get(reverse('orders:menu'), {'tag': 'new'})
+        self.assertEqual(self.names(response, 'menu_items'), [])
+        self.assertEqual([t.name for t in response.templates][0], 'orders/menu_list_dashboard.html')
+
+    async def test_cart_summary(self):
+        response = await self.async_client.get(reverse('orders:cart_summary'))
+        self.assertEqual(response.json(), {'count': 0, 'total': 0, 'items': []})
+
+        await self.login(self.customer)
+        await self.async_client.post(reverse('orders:add_to_cart', args=[self.pilau.id]), {'quantity': 2})
+        response = await self.async_client.get(reverse('orders:cart_summary'))
+        self.assertEqual(response.json(), {
+            'count': 2,
+            'total': '500.00',
+            'items': [{'id': self.pilau.id, 'name': 'Pilau', 'quantity': 2, 'price': '250.00', 'total_price': '500.00'}],
+        })
+
+    async def test_order_status_is_only_shown_to_its_owner(self):
+        url = reverse('orders:order_status', args=[self.order.id])
+        response = await self.async_client.get(url)
+        self.assertEqual((response.status_code, response.json()), (401, {'error': 'Authentication required'}))
+
+        await self.login(self.other)
+        self.assertEqual((await self.async_client.get(url)).status_code, 404)
+
+        await self.login(self.customer)
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, 200)
+        payload = response.json()
+        self.assertEqual(
+            {key: payload[key] for key in ('order_number', 'status', 'status_display', 'is_final')},
+            {'order_number': self.order.order_number, 'status': 'pending', 'status_display': 'Pending', 'is_final': False},
+        )
+
+        await sync_to_async(transition_orders)([self.order.id], 'cancelled')
+        self.assertTrue((await self.async_client.get(url)).json()['is_final'])
+        self.assertEqual((await self.async_client.get(reverse('orders:order_status', args=[0]))).status_code, 404)
+
+    async def test_admin_dashboard_counters(self):
+        url = reverse('orders:admin_dashboard_counters')
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response['Location'].startswith(reverse('login')))
+
+        await self.login(self.customer)
+        response = await self.async_client.get(url)
+        self.assertEqual((response.status_code, response['Location']), (302, reverse('orders:dashboard')))
+
+        await self.login(self.admin)
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, 200)
+        counters = await sync_to_async(get_dashboard_counters)()
+        self.assertEqual(response.json(), json.loads(json.dumps(counters, cls=DjangoJSONEncoder)))
+        self.assertEqual(response.json()['total_orders'], 1)
+
+
+class ExportDataTests(TestCase):
+    RANGE = {'start': '2026-03-02', 'end': '2026-03-08'}
+
+    def setUp(self):
+        User = get_user_model()
+        self.customer = User.objects.create_user('cus', 'c@a.com', 'pw', phone='0700', workplace='Depot')
+        admin = User.objects.create_user('boss', password='pw', is_staff=True, role=User.Roles.ADMIN)
+        self.client.force_login(admin)
+        category = MenuCategory.objects.create(name='Lunch')
+        pilau = MenuItem.objects.create(name='Pilau', price=250, category=category)
+        chai = MenuItem.objects.create(name='Chai', price=50, category=category)
+        placed = timezone.make_aware(datetime(2026, 3, 3, 12, 30))
+        self.orders = []
+        for lines in ([(pilau, 2), (chai, 1)], []):
+            order = Order.objects.create(
+                user=self.customer, delivery_location='Depot', phone='0700',
+                total_amount=sum(item.price * quantity for item, quantity in lines),
+            )
+            for item, quantity in lines:
+                order.items.create(menu_item=item, quantity=quantity, price=item.price)
+            Order.objects.filter(id=order.id).update(created_at=placed)
+            self.orders.append(order)
+        # Outside the range
+        late = Order.objects.create(user=self.customer, delivery_location='Depot', phone='0700', total_amount=1)
+        Order.objects.filter(id=late.id).update(created_at=placed + timedelta(days=30))
+
+    def export(self, dataset, fmt):
+        response = self.client.get(reverse('orders:export_data', args=[dataset]), {**self.RANGE, 'format': fmt})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], exports.FORMATS[fmt])
+        self.assertEqual(
+            response['Content-Disposition'], f'attachment; filename="{dataset}_20260302_20260308.{fmt}"',
+        )
+        body = b''.join(response.streaming_content).decode()
+        if fmt == 'csv':
+            return list(csv.reader(io.StringIO(body)))
+        return json.loads(body)
+
+    def test_orders(self):
+        first, second = self.orders
+        header, *rows = self.export('orders', 'csv')
+        self.assertEqual(header, exports.ORDER_HEADER + exports.ORDER_ITEM_HEADER)
+        self.assertEqual(
+            [(row[1], row[5], row[9], row[10], row[11], row[12]) for row in rows],
+            [
+                (first.order_number, 'pending', '550.00', 'Pilau', '2', '250.00'),
+                (first.order_number, 'pending', '550.00', 'Chai', '1', '50.00'),
+                (second.order_number, 'pending', '0.00', '', '', ''),
+            ],
+        )
+        self.assertEqual(rows[0][2], '2026-03-03T12:30:00+03:00')
+
+        nested = self.export('orders', 'json')
+        self.assertEqual([order['order_number'] for order in nested], [first.order_number, second.order_number])
+        self.assertEqual(set(nested[0]), {*exports.ORDER_HEADER, 'items'})
+        self.assertEqual(
+            nested[0]['items'],
+            [{'item': 'Pilau', 'quantity': 2, 'price': '250.00'}, {'item': 'Chai', 'quantity': 1, 'price': '50.00'}],
+        )
+        self.assertEqual(nested[1]['items'], [])
+
+    def test_customers(self):
+        header, *rows = self.export('customers', 'csv')
+        self.assertEqual(header, exports.CUSTOMER_HEADER)
+        self.assertEqual([(row[1], row[6], row[9], row[10]) for row in rows], [('cus', 'Depot', '2', '550')])
+
+        [customer] = self.export('customers', 'json')
+        self.assertEqual(list(customer), exports.CUSTOMER_HEADER)
+        self.assertEqual((customer['username'], customer['total_orders']), ('cus', 2))
+
+    def test_report_datasets(self):
+        for dataset, (_, header) in reports.REPORT_DATASETS.items():
+            with self.subTest(dataset=dataset):
+                csv_header, *csv_rows = self.export(dataset, 'csv')
+                json_rows = self.export(dataset, 'json')
+                self.assertEqual(csv_header, header)
+                self.assertEqual(len(csv_rows), len(json_rows))
+                self.assertTrue(all(list(row) == header for row in json_rows))
+
+        self.assertEqual(self.export('daily_revenue', 'csv')[1:], [['2026-03-03', '550', '2']])
+        self.assertEqual(self.export('top_items', 'json')[0]['menu_item__name'], 'Pilau')
+        self.assertEqual(self.export('status_breakdown', 'json'), [{'status': 'pending', 'count': 2}])
+
+    def test_unknown_dataset_or_format(self):
+        url = reverse('orders:export_data', args=['orders'])
+        self.assertEqual(self.client.get(url, {'format': 'xml'}).status_code, 404)
+        self.assertEqual(self.client.get(reverse('orders:export_data', args=['passwords'])).status_code, 404)
+
+
+class ExportStreamingTests(TestCase):
+
+    def setUp(self):
+        admin = get_user_model().objects.create_user('boss', password='pw', is_staff=True)
+        self.async_client.force_login(admin)
+
+    async def test_export_streams_under_asgi(self):
+        pulled = []
+
+        def export_lines(dataset, fmt, start, end):
+            for number in range(5000):
+                pulled.append(number)
+                yield f'{number}\n'
+
+        with mock.patch.object(exports, 'export_lines', export_lines):
+            response = await self.async_client.get(reverse('orders:export_data', args=['orders']))
+            self.assertTrue(response.is_async)
+            chunks = aiter(response.streaming_content)
+            first = await anext(chunks)
+            # Only the first batch has been read when the first chunk goes out
+            self.assertEqual(len(pulled), 500)
+            rest = [chunk async for chunk in chunks]
+
+        self.assertEqual(b''.join([first, *rest]), ''.join(f'{number}\n' for number in range(5000)).encode())
+
+
+class ServerTimingTests(TestCase):
+
+    def parse(self, header):
+        entries = {}
+        for entry in re.split(r', (?=\w+;dur=)', header):
+            name, *params = entry.split(';')
+            entries[name] = dict(param.split('=', 1) for param in params)
+        return entries
+
+    def test_header_breaks_the_request_down(self):
+        MenuItem.objects.create(name='Pilau', price=250, category=MenuCategory.objects.create(name='Lunch'))
+        cache.clear()
+        response = self.client.get(reverse('orders:menu'))
+        timings = self.parse(response['Server-Timing'])
+        self.assertEqual(set(timings), {'db', 'tpl', 'cache', 'view'})
+        self.assertNotEqual(timings['db']['desc'], '"0 queries"')
+        self.assertGreater(float(timings['tpl']['dur']), 0)
+        self.assertRegex(timings['cache']['desc'], r'^"\d+ hits, [1-9]\d* misses"$')
+        self.assertGreaterEqual(float(timings['view']['dur']), float(timings['tpl']['dur']))
+
+    def test_async_views_get_the_header(self):
+        response = self.client.get(reverse('orders:menu_api'))
+        self.assertIn('db;dur=', response['Server-Timing'])
+
+    def test_nested_phases_count_once(self):
+        timings = server_timing.Timings()
+        token = server_timing._current.set(timings)
+        try:
+            with server_timing.phase('tpl'):
+                with server_timing.phase('tpl') as inner:
+                    time.sleep(0.01)
+        finally:
+            server_timing._current.reset(token)
+        self.assertIsNone(inner)
+        self.assertTrue(0.01 <= timings.tpl < 0.05)
+        with server_timing.phase('tpl') as outside:
+            self.assertIsNone(outside)
+
+    @override_settings(SERVER_TIMING=False)
+    def test_disabled_middleware_removes_itself(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            server_timing.ServerTimingMiddleware(lambda request: None)
+
+
+class BuildCssTests(SimpleTestCase):
+
+    def build(self, returncode):
+        def run(args, **kwargs):
+            Path(args[args.index('--output') + 1]).write_text(f'/* {Path(args[1]).name} */')
+            return subprocess.CompletedProcess(args, returncode)
+
+        tailwind = mock.Mock(run=mock.Mock(side_effect=run))
+        with tempfile.TemporaryDirectory() as root, mock.patch.dict(sys.modules, {'pytailwindcss': tailwind}), \
+                override_settings(BASE_DIR=Path(root), STATICFILES_DIRS=[Path(root, 'static')]):
+            stylesheet = Path(root, 'static', 'css', 'site.css')
+            stylesheet.parent.mkdir(parents=True)
+            stylesheet.write_text('old')
+            out = io.StringIO()
+            error = None
+            try:
+                call_command('build_css', stdout=out)
+            except CommandError as exc:
+                error = exc
+            files = sorted(str(path.relative_to(root)) for path in Path(root, 'static').rglob('*.css'))
+            return tailwind.run, out.getvalue(), error, files, stylesheet.read_text()
+
+    def test_each_bundle_is_built_and_swapped_in(self):
+        run, out, error, files, css = self.build(0)
+        self.assertIsNone(error)
+        self.assertEqual(run.call_count, 2)
+        args, kwargs = run.call_args_list[0]
+        self.assertIn('--minify', args[0])
+        self.assertEqual(kwargs['version'], settings.TAILWIND_CLI_VERSION)
+        self.assertEqual(files, ['static/css/admin.css', 'static/css/site.css'])
+        self.assertEqual(css, '/* site.config.js */')
+        self.assertIn('Built site bundle: static/css/site.css', out)
+
+    def test_a_failed_build_raises_and_keeps_the_old_stylesheet(self):
+        run, out, error, files, css = self.build(1)
+        self.assertEqual(str(error), 'Tailwind build of the site bundle failed')
+        self.assertEqual(run.call_count, 1)
+        self.assertEqual((files, css), (['static/css/site.css'], 'old'))
+        self.assertEqual(out, '')
+
+
+class ProfileStartupTests(SimpleTestCase):
+
+    def test_reports_the_asgi_application_imports(self):
+        out = io.StringIO()
+        call_command('profile_startup', '--runs', '1', '--limit', '3', stdout=out)
+        report = out.getvalue()
+        self.assertRegex(report, r'^smartkibadaski\.asgi\.application loaded in [\d.]+ ms \(\d+ modules imported, fastest of 1 runs\)')
+        slowest = report.split('Slowest imports (cumulative ms, self ms):\n')[1].split('\n\n')[0].splitlines()
+        self.assertEqual(len(slowest), 3)
+        self.assertIn('django', report.split('Time by top-level package')[1])
+
+    def test_import_failures_raise(self):
+        failed = subprocess.CompletedProcess([], 1, stdout='', stderr='ModuleNotFoundError: No module named x')
+        with mock.patch('subprocess.run', return_value=failed), self.assertRaisesMessage(CommandError, 'No module named x'):
+            call_command('profile_startup', '--runs', '1', stdout=io.StringIO())
+
+    def test_parse_importtime(self):
+        output = (
+            'import time: self [us] | cumulative | imported package\n'
+            'import time:       120 |        120 |   _io\n'
+            'import time:        50 |        900 | django\n'
+            'import time:       850 |        850 |     django.utils\n'
+        )
+        self.assertEqual(parse_importtime(output), [('_io', 1, 120, 120), ('django', 0, 50, 900), ('django.utils', 2, 850, 850)])
+
+
+class AsyncProfilingTests(TestCase):
+
+    def setUp(self):
+        admin = get_user_model().objects.create_user('boss', password='pw', is_staff=True)
+        self.async_client.force_login(admin)
+
+    async def test_sync_view_frames_are_profiled_under_asgi(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(PROFILE_DIR=directory):
+            response = await self.async_client.get(reverse('orders:admin_reports'), {'_profile': '1'})
+            self.assertEqual(response.status_code, 200)
+            profile_id = response['X-Profile-Id']
+            stats = pstats.Stats(str(profiling.profile_stats_path(profile_id))).stats
+            meta = profiling.load_profile(profile_id)
+
+        views_file = str(Path(views.__file__))
+        self.assertIn('admin_reports', {name for filename, line, name in stats if filename == views_file})
+        self.assertGreater(meta['sql_count'], 0)
+
+
+class StaticFilesTests(SimpleTestCase):
+
+    def test_middleware_chain_is_async_capable(self):
+        for path in settings.MIDDLEWARE:
+            self.assertTrue(getattr(import_string(path), 'async_capable', False), path)
+
+    async def test_static_files_stream_under_asgi(self):
+        with tempfile.TemporaryDirectory() as root, override_settings(STATIC_ROOT=root):
+            Path(root, 'app.css').write_text('body{margin:0}' * 1000)
+            response = await self.async_client.get('/static/app.css')
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.is_async)
+            self.assertEqual(response['Content-Type'], 'text/css; charset="utf-8"')
+            self.assertEqual(response['Content-Length'], '14000')
+            body = b''.join([chunk async for chunk in response.streaming_content])
+            self.assertEqual(body, b'body{margin:0}' * 1000)
+
+            head = await self.async_client.head('/static/app.css')
+            self.assertEqual((head.status_code, head['Content-Length'], head.content), (200, '14000', b''))
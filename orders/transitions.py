@@ -0,0 +1,157 @@
+"""
+Order status transitions.
+
+All status changes go through ``transition_orders`` so the allowed moves in
+``Order.STATUS_TRANSITIONS`` are enforced in one place and many orders can
+be advanced with a single guarded ``UPDATE``.
+"""
+from collections import namedtuple
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Max
+from django.utils import timezone
+
+from .counters import invalidate_dashboard_counters
+from .models import DailySketch, Order, OrderStatusEvent, OrderStatusHourlyStats
+from .sketches import add_values
+from .slots import release_slots
+
+TransitionResult = namedtuple('TransitionResult', ['updated', 'skipped'])
+
+
+def transition_orders(order_ids, new_status):
+    """
+    Move the given orders to ``new_status`` where the transition is allowed.
+
+    Runs one ``UPDATE ... WHERE id IN (...) AND status IN (allowed sources)``.
+    Returns a ``TransitionResult`` whose ``updated`` list holds
+    ``(id, order_number, previous_status)`` tuples and whose ``skipped`` list
+    holds dicts with the order id, number, current status and the reason.
+    Cancelled orders give their kitchen slot booking back.
+
+    Raises ``ValueError`` if ``new_status`` is not a valid status.
+    """
+    if new_status not in Order.Status.values:
+        raise ValueError(f'Invalid status: {new_status}')
+
+    sources = Order.allowed_sources(new_status)
+    order_ids = {int(order_id) for order_id in order_ids}
+
+    with transaction.atomic():
+        current = list(
+            Order.objects.select_for_update()
+            .filter(id__in=order_ids)
+            .values_list('id', 'order_number', 'status')
+        )
+        eligible = [row for row in current if row[2] in sources]
+        if eligible:
+            Order.objects.filter(
+                id__in=[row[0] for row in eligible],
+                status__in=sources,
+            ).update(status=new_status, updated_at=timezone.now())
+            if new_status == Order.Status.CANCELLED:
+                release_slots([row[0] for row in eligible])
+            record_status_events(
+                [(order_id, previous) for order_id, _, previous in eligible],
+                new_status,
+            )
+
+    found = {row[0] for row in current}
+    skipped = [
+        {
+            'id': order_id,
+            'order_number': order_number,
+            'status': status,
+            'reason': f'Cannot move from {Order.Status(status).label} to {Order.Status(new_status).label}',
+        }
+        for order_id, order_number, status in current
+        if status not in sources
+    ]
+    skipped += [
+        {'id': order_id, 'order_number': None, 'status': None, 'reason': 'Order not found'}
+        for order_id in sorted(order_ids - found)
+    ]
+
+    if eligible:
+        invalidate_dashboard_counters()
+    return TransitionResult(updated=eligible, skipped=skipped)
+
+
+def record_status_events(transitions, new_status, at=None):
+    """
+    Append ``OrderStatusEvent`` rows for ``(order_id, previous_status)`` pairs.
+
+    The events are bulk-inserted and the matching ``OrderStatusHourlyStats``
+    row is incremented in place, so reports never need to scan the event
+    history. The time spent in the previous status is measured from the
+    order's last event, or from its creation if it has none yet. Delivered
+    orders also add their time since placing to the day's delivery-time
+    sketch (see ``orders.sketches``).
+    """
+    at = at or timezone.now()
+    transitions = list(transitions)
+    if not transitions:
+        return []
+
+    timed_ids = [order_id for order_id, previous in transitions if previous]
+    entered_at = dict(
+        OrderStatusEvent.objects.filter(order_id__in=timed_ids)
+        .values('order_id')
+        .annotate(last=Max('created_at'))
+        .values_list('order_id', 'last')
+    )
+    missing = [order_id for order_id in timed_ids if order_id not in entered_at]
+    if missing:
+        entered_at.update(
+            Order.objects.filter(id__in=missing).values_list('id', 'created_at')
+        )
+
+    events = []
+    for order_id, previous in transitions:
+        duration = None
+        if previous and order_id in entered_at:
+            duration = max(int((at - entered_at[order_id]).total_seconds()), 0)
+        events.append(OrderStatusEvent(
+            order_id=order_id,
+            from_status=previous or '',
+            status=new_status,
+            duration_seconds=duration,
+            created_at=at,
+        ))
+    OrderStatusEvent.objects.bulk_create(events)
+
+    durations = [event.duration_seconds for event in events if event.duration_seconds is not None]
+    _increment_hourly_stats(new_status, at, len(events), len(durations), sum(durations))
+
+    if new_status == Order.Status.DELIVERED:
+        placed_at = Order.objects.filter(id__in=[order_id for order_id, _ in transitions]).values_list('created_at', flat=True)
+        add_values(
+            DailySketch.Metric.DELIVERY_TIME,
+            timezone.localdate(at),
+            [max((at - created_at).total_seconds(), 0) for created_at in placed_at],
+        )
+    return events
+
+
+def _increment_hourly_stats(status, at, count, timed_count, total_seconds):
+    hour = at.replace(minute=0, second=0, microsecond=0)
+    increments = {
+        'count': F('count') + count,
+        'timed_count': F('timed_count') + timed_count,
+        'total_seconds': F('total_seconds') + total_seconds,
+    }
+    stats = OrderStatusHourlyStats.objects.filter(hour=hour, status=status)
+    if stats.update(**increments):
+        return
+    try:
+        with transaction.atomic():
+            OrderStatusHourlyStats.objects.create(
+                hour=hour,
+                status=status,
+                count=count,
+                timed_count=timed_count,
+                total_seconds=total_seconds,
+            )
+    except IntegrityError:
+        # Another worker created the row first
+        stats.update(**increments)
@@ -14,10 +14,12 @@ urlpatterns = [
     path('cart/update/<int:menu_item_id>/', views.update_cart, name='update_cart'),
     path('cart/remove/<int:menu_item_id>/', views.remove_from_cart, name='remove_from_cart'),
     path('cart/clear/', views.clear_cart, name='clear_cart'),
+    path('cart/summary/', views.cart_summary, name='cart_summary'),
     
     # Checkout URLs
     path('checkout/', views.checkout, name='checkout'),
     path('order/<int:order_id>/success/', views.order_success, name='order_success'),
+    path('order/<int:order_id>/status/', views.order_status, name='order_status'),
     
     # Dashboard URLs
     path('dashboard/', views.dashboard, name='dashboard'),
@@ -26,21 +28,34 @@ urlpatterns = [
     
     # Admin Dashboard URLs
     path('admin-dashboard/', views.admin_dashboard, name='admin_dashboard'),
+    path('admin-dashboard/counters/', views.admin_dashboard_counters, name='admin_dashboard_counters'),
     path('admin-dashboard/orders/', views.admin_orders, name='admin_orders'),
     path('admin-dashboard/orders/<int:order_id>/update-status/', views.update_order_status, name='update_order_status'),
+    path('admin-dashboard/orders/bulk-status/', views.bulk_update_order_status, name='bulk_update_order_status'),
     path('admin-dashboard/menu/', views.admin_menu, name='admin_menu'),
     path('admin-dashboard/menu/add/', views.add_menu_item, name='add_menu_item'),
+    path('admin-dashboard/menu/bulk-update/', views.bulk_update_menu_items, name='bulk_update_menu_items'),
     path('admin-dashboard/menu/<int:item_id>/edit/', views.edit_menu_item, name='edit_menu_item'),
+    path('admin-dashboard/menu/<int:item_id>/restock/', views.restock_menu_item, name='restock_menu_item'),
     path('admin-dashboard/menu/<int:item_id>/delete/', views.delete_menu_item, name='delete_menu_item'),
+    path('admin-dashboard/menu/<int:item_id>/restore/', views.restore_menu_item, name='restore_menu_item'),
     path('admin-dashboard/menu/<int:item_id>/toggle-availability/', views.toggle_menu_availability, name='toggle_menu_availability'),
     path('admin-dashboard/customers/', views.admin_customers, name='admin_customers'),
     path('admin-dashboard/customers/<int:customer_id>/toggle-status/', views.toggle_customer_status, name='toggle_customer_status'),
     path('admin-dashboard/customers/<int:customer_id>/make-admin/', views.make_customer_admin, name='make_customer_admin'),
     path('admin-dashboard/reports/', views.admin_reports, name='admin_reports'),
+    path('admin-dashboard/export/<str:dataset>/', views.export_data, name='export_data'),
+    path('admin-dashboard/profiles/', views.admin_profiles, name='admin_profiles'),
+    path('admin-dashboard/profiles/<str:profile_id>/', views.admin_profile_detail, name='admin_profile_detail'),
+    path('admin-dashboard/profiles/<str:profile_id>/download/', views.download_profile, name='download_profile'),
+    path('metrics', views.prometheus_metrics, name='prometheus_metrics'),
     
     # Contact URLs
     path('contact/', views.contact_page, name='contact'),
     
+    # Public API
+    path('api/menu/', views.menu_api, name='menu_api'),
+    
     # Admin Inquiries URLs
     path('admin-dashboard/inquiries/', views.admin_inquiries, name='admin_inquiries'),
     path('admin-dashboard/inquiries/<int:inquiry_id>/update-status/', views.update_inquiry_status, name='update_inquiry_status'),
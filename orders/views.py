@@ -1,13 +1,45 @@
+import hmac
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.db import models
-from django.http import JsonResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.core.mail import send_mail
+from django.db import models, transaction
+from django.http import (
+    FileResponse, Http404, HttpResponse, HttpResponseNotAllowed,
+    HttpResponseNotModified, JsonResponse, StreamingHttpResponse,
+)
 from django.shortcuts import get_object_or_404, redirect, render
+from django.utils import timezone
 from django.views.decorators.http import require_POST
 from django.views.generic import ListView, TemplateView
 
+from accounts.models import User
+
+from . import exports, forecast, metrics, profiling, reports
+from .archive import customer_order_totals, customer_orders_page
 from .cart import Cart
-from .models import MenuCategory, MenuItem, Order, OrderItem
+from .catalog import aget_menu_document, bump_catalog_version, update_menu_items
+from .counters import aget_dashboard_counters, get_dashboard_counters
+from .decorators import _is_admin, admin_required, aresolve_user, customer_required
+from .forms import BulkMenuItemForm, CheckoutForm, ContactForm, MenuItemForm
+from .media import configure_cloudinary
+from .models import (
+    ArchivedOrder, ContactInquiry, MenuCategory, MenuItem, Order, OrderItem,
+)
+from .popularity import ahome_items, apopular_items
+from .ratelimit import concurrency_limit, rate_limit
+from .recommendations import aavailable_items, available_items, suggestions
+from .slots import SlotFull, reserve_slot, slot_loads, upcoming_slots
+from .stock import OutOfStock, restock, take_stock
+from .transitions import record_status_events, transition_orders
+
+logger = logging.getLogger(__name__)
 
 
 class HomeView(TemplateView):
@@ -15,31 +47,32 @@ class HomeView(TemplateView):
 
     template_name = 'orders/home.html'
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        categories = MenuCategory.objects.all()
+    async def get(self, request, *args, **kwargs):
+        context = self.get_context_data(**kwargs)
+        categories = [category async for category in MenuCategory.objects.all()]
         
         # Get filter parameters
         selected_category = self.request.GET.get("category") or ""
         selected_tag = self.request.GET.get("tag") or ""
         
         # Filter items based on selection
-        items = MenuItem.objects.filter(is_available=True)
+        items = MenuItem.objects.available()
         if selected_category:
-            items = items.filter(category__slug=selected_category)
-        elif selected_tag in ['popular', 'new']:
-            items = items.filter(tag=selected_tag)
+            items = [item async for item in items.filter(category__slug=selected_category)[:8]]
+        elif selected_tag == 'popular':
+            # Ranked by compute_popularity, served from the cache
+            items = await apopular_items(8)
+        elif selected_tag == 'new':
+            items = [item async for item in items.filter(tag=selected_tag)[:8]]
         else:
-            # Show featured items on homepage when no filter is selected
-            items = items.filter(is_featured=True)
-        
-        items = items[:8]
+            # Featured items, topped up with the most popular ones
+            items = await ahome_items(8)
 
         context["categories"] = categories
         context["menu_items"] = items
         context["selected_category"] = selected_category
         context["selected_tag"] = selected_tag
-        return context
+        return self.render_to_response(context)
 
 
 class MenuListView(ListView):
@@ -48,6 +81,16 @@ class MenuListView(ListView):
     model = MenuItem
     context_object_name = 'menu_items'
 
+    async def get(self, request, *args, **kwargs):
+        await aresolve_user(request)
+        self.object_list = [item async for item in self.get_queryset()]
+        items = await aavailable_items()
+        for item in self.object_list:
+            item.suggestions = suggestions([item.id], items, 2)
+        context = self.get_context_data()
+        context["categories"] = [category async for category in MenuCategory.objects.all()]
+        return self.render_to_response(context)
+
     def get_template_names(self):
         """Use dashboard layout if user is logged in."""
         if self.request.user.is_authenticated:
@@ -55,7 +98,7 @@ class MenuListView(ListView):
         return ['orders/menu_list.html']
 
     def get_queryset(self):
-        qs = MenuItem.objects.filter(is_available=True)
+        qs = MenuItem.objects.available()
         self.selected_category = self.request.GET.get("category") or ""
         self.selected_tag = self.request.GET.get("tag") or ""
 
@@ -67,7 +110,6 @@ class MenuListView(ListView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context["categories"] = MenuCategory.objects.all()
         context["selected_category"] = self.selected_category
         context["selected_tag"] = self.selected_tag
         return context
@@ -76,6 +118,7 @@ class MenuListView(ListView):
 
 # Cart Views
 @require_POST
+@rate_limit('cart')
 def add_to_cart(request, menu_item_id):
     """Add a menu item to the cart."""
     if not request.user.is_authenticated:
@@ -83,7 +126,7 @@ def add_to_cart(request, menu_item_id):
         return redirect('login')
     
     cart = Cart(request)
-    menu_item = get_object_or_404(MenuItem, id=menu_item_id, is_available=True)
+    menu_item = get_object_or_404(MenuItem.objects.available(), id=menu_item_id)
     quantity = int(request.POST.get('quantity', 1))
     
     cart.add(menu_item=menu_item, quantity=quantity)
@@ -100,15 +143,40 @@ def add_to_cart(request, menu_item_id):
     return redirect(request.META.get('HTTP_REFERER', 'orders:home'))
 
 
+async def cart_summary(request):
+    """Cart count, total and lines as JSON, for the cart badge and drawer."""
+    await aresolve_user(request)
+    cart = Cart(request)
+    lines = await cart.aitems()
+    return JsonResponse({
+        'count': len(cart),
+        'total': cart.get_total_price(),
+        'items': [
+            {
+                'id': line['menu_item'].id,
+                'name': line['menu_item'].name,
+                'quantity': line['quantity'],
+                'price': line['price'],
+                'total_price': line['total_price'],
+            }
+            for line in lines
+        ],
+    })
+
+
 @login_required
 def view_cart(request):
     """Display the shopping cart."""
     cart = Cart(request)
     template = 'orders/cart_dashboard.html' if request.user.is_authenticated else 'orders/cart.html'
-    return render(request, template, {'cart': cart})
+    return render(request, template, {
+        'cart': cart,
+        'suggestions': suggestions([int(item_id) for item_id in cart.cart], available_items()),
+    })
 
 
 @require_POST
+@rate_limit('cart')
 def update_cart(request, menu_item_id):
     """Update the quantity of a menu item in the cart."""
     cart = Cart(request)
@@ -156,6 +224,8 @@ def clear_cart(request):
 
 
 # Checkout Views
+@rate_limit('checkout')
+@concurrency_limit('checkout')
 def checkout(request):
     """Checkout page for placing orders."""
     if not request.user.is_authenticated:
@@ -168,41 +238,71 @@ def checkout(request):
         messages.warning(request, 'Your cart is empty!')
         return redirect('orders:cart')
     
+    loads = slot_loads(upcoming_slots(), len(cart))
+    
     if request.method == 'POST':
-        from .forms import CheckoutForm
-        
-        form = CheckoutForm(request.POST)
+        form = CheckoutForm(request.POST, slot_loads=loads)
         
         if form.is_valid():
-            # Create order
-            order = form.save(commit=False)
-            order.user = request.user
-            order.delivery_location = request.user.workplace
-            order.phone = request.user.phone
-            order.total_amount = cart.get_total_price()
-            order.save()
-            
-            # Create order items
-            for item in cart:
-                OrderItem.objects.create(
-                    order=order,
-                    menu_item=item['menu_item'],
-                    quantity=item['quantity'],
-                    price=item['price']
-                )
-            
-            # Clear cart
-            cart.clear()
+            # Load the cart first so archived items are dropped from the total
+            cart_items = list(cart)
+            if not cart_items:
+                messages.warning(request, 'The items in your cart are no longer available.')
+                return redirect('orders:cart')
             
-            messages.success(request, 'Your order has been placed successfully!')
-            return redirect('orders:order_success', order_id=order.id)
+            try:
+                with transaction.atomic():
+                    # Take the portions and the kitchen slot first; running
+                    # short of either rolls it all back
+                    take_stock((item['menu_item'], item['quantity']) for item in cart_items)
+                    reserve_slot(form.cleaned_data['slot_start'], sum(item['quantity'] for item in cart_items))
+                    
+                    # Create order
+                    order = form.save(commit=False)
+                    order.user = request.user
+                    order.delivery_location = request.user.workplace
+                    order.phone = request.user.phone
+                    order.total_amount = cart.get_total_price()
+                    order.save()
+                    record_status_events([(order.id, '')], order.status, at=order.created_at)
+                    
+                    # Create order items
+                    for item in cart_items:
+                        OrderItem.objects.create(
+                            order=order,
+                            menu_item=item['menu_item'],
+                            quantity=item['quantity'],
+                            price=item['price']
+                        )
+            except OutOfStock as exc:
+                messages.error(request, f'Sorry, there is not enough left of: {exc}. Please update your cart.')
+                return redirect('orders:cart')
+            except SlotFull as exc:
+                loads = slot_loads(upcoming_slots(), len(cart))
+                if exc.next_available is None:
+                    messages.error(request, 'Sorry, the kitchen just got fully booked. Please try again later.')
+                else:
+                    messages.warning(
+                        request,
+                        f'Sorry, the {exc.start:%H:%M} slot just filled up. '
+                        f'The next available time is {exc.next_available:%H:%M}; please confirm it below.'
+                    )
+                data = request.POST.copy()
+                data['slot_start'] = exc.next_available.isoformat() if exc.next_available else ''
+                form = CheckoutForm(data, slot_loads=loads)
+            else:
+                # Clear cart
+                cart.clear()
+                
+                messages.success(request, 'Your order has been placed successfully!')
+                return redirect('orders:order_success', order_id=order.id)
     else:
-        from .forms import CheckoutForm
-        form = CheckoutForm()
+        form = CheckoutForm(slot_loads=loads)
     
     return render(request, 'orders/checkout.html', {
         'form': form,
-        'cart': cart
+        'cart': cart,
+        'current_slot': loads[0],
     })
 
 
@@ -212,19 +312,41 @@ def order_success(request, order_id):
     return render(request, 'orders/order_success.html', {'order': order})
 
 
-# Dashboard Views
-from django.contrib.auth.decorators import login_required
-from django.db.models import Sum, Count
-from .decorators import customer_required
+async def order_status(request, order_id):
+    """Current status of one of the customer's orders, polled by the order pages."""
+    user = await aresolve_user(request)
+    if not user.is_authenticated:
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+    
+    order = None
+    for model in (Order, ArchivedOrder):
+        try:
+            order = await model.objects.aget(id=order_id, user=user)
+            break
+        except model.DoesNotExist:
+            continue
+    if order is None:
+        raise Http404('Order not found')
+    
+    return JsonResponse({
+        'order_number': order.order_number,
+        'status': order.status,
+        'status_display': order.get_status_display(),
+        'is_final': not Order.STATUS_TRANSITIONS.get(order.status),
+        'updated_at': order.updated_at,
+    })
 
+
+# Dashboard Views
 @customer_required
 def dashboard(request):
     """Customer dashboard home."""
     # Get user statistics
     orders = Order.objects.filter(user=request.user)
-    total_orders = orders.count()
+    totals = customer_order_totals(request.user)
+    total_orders = totals['total_orders']
     pending_orders = orders.filter(status__in=['pending', 'confirmed', 'preparing']).count()
-    total_spent = orders.aggregate(total=Sum('total_amount'))['total'] or 0
+    total_spent = totals['total_spent']
     
     # Get recent orders
     recent_orders = orders.order_by('-created_at')[:5]
@@ -241,9 +363,18 @@ def dashboard(request):
 
 @customer_required
 def order_history(request):
-    """Customer order history."""
-    orders = Order.objects.filter(user=request.user).order_by('-created_at')
-    return render(request, 'orders/order_history.html', {'orders': orders})
+    """Customer order history, continuing into archived orders."""
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        page = 1
+    
+    orders, has_next = customer_orders_page(request.user, page, settings.ORDER_HISTORY_PAGE_SIZE)
+    return render(request, 'orders/order_history.html', {
+        'orders': orders,
+        'page': page,
+        'has_next': has_next,
+    })
 
 
 @customer_required
@@ -263,50 +394,28 @@ def profile(request):
 
 
 # Admin Dashboard Views
-from .decorators import admin_required
-from django.utils import timezone
-from datetime import timedelta
-
 @admin_required
 def admin_dashboard(request):
     """Admin dashboard home with statistics."""
-    from accounts.models import User
-    from .models import ContactInquiry
-    
-    # Get statistics
-    all_orders = Order.objects.all()
-    total_orders = all_orders.count()
-    pending_orders = all_orders.filter(status__in=['pending', 'confirmed', 'preparing']).count()
-    
-    # Today's stats
-    today = timezone.now().date()
-    today_orders = all_orders.filter(created_at__date=today)
-    today_revenue = today_orders.aggregate(total=Sum('total_amount'))['total'] or 0
-    
-    # Total customers
-    total_customers = User.objects.filter(role=User.Roles.CUSTOMER).count()
-    
-    # Inquiry statistics
-    total_inquiries = ContactInquiry.objects.count()
-    new_inquiries = ContactInquiry.objects.filter(status='new').count()
+    counters = get_dashboard_counters()
     
     # Recent orders
-    recent_orders = all_orders.order_by('-created_at')[:10]
+    recent_orders = Order.objects.select_related('user').order_by('-created_at')[:10]
     
     context = {
-        'total_orders': total_orders,
-        'pending_orders': pending_orders,
-        'today_revenue': today_revenue,
-        'today_orders': today_orders.count(),
-        'total_customers': total_customers,
-        'total_inquiries': total_inquiries,
-        'new_inquiries': new_inquiries,
+        **counters,
         'recent_orders': recent_orders,
     }
     
     return render(request, 'orders/admin_dashboard.html', context)
 
 
+@admin_required
+async def admin_dashboard_counters(request):
+    """Dashboard counters as JSON, for refreshing the overview without a reload."""
+    return JsonResponse(await aget_dashboard_counters())
+
+
 @admin_required
 def admin_orders(request):
     """Admin order management page with filters."""
@@ -320,7 +429,6 @@ def admin_orders(request):
     # Date filter
     date_filter = request.GET.get('date', '')
     if date_filter:
-        from datetime import datetime
         try:
             filter_date = datetime.strptime(date_filter, '%Y-%m-%d').date()
             orders = orders.filter(created_at__date=filter_date)
@@ -337,14 +445,37 @@ def admin_orders(request):
             models.Q(user__last_name__icontains=search)
         )
     
-    orders = orders.order_by('-created_at')
+    # Kitchen slot filter
+    slot_filter = request.GET.get('slot', '')
+    if slot_filter:
+        try:
+            slot = datetime.fromisoformat(slot_filter)
+        except ValueError:
+            pass
+        else:
+            # Links carry the offset; a hand-typed time is local
+            if timezone.is_naive(slot):
+                slot = timezone.make_aware(slot)
+            orders = orders.filter(slot_start=slot)
+    
+    # Grouping by kitchen slot lists orders in the order they are cooked
+    group_by_slot = request.GET.get('group') == 'slot'
+    if group_by_slot:
+        orders = orders.order_by(models.F('slot_start').asc(nulls_last=True), 'created_at')
+    else:
+        orders = orders.order_by('-created_at')
     
     context = {
         'orders': orders,
         'status_filter': status_filter,
         'date_filter': date_filter,
+        'slot_filter': slot_filter,
+        'group_by_slot': group_by_slot,
         'search': search,
         'status_choices': Order.Status.choices,
+        'kitchen_slots': slot_loads(upcoming_slots()),
+        'slot_max_orders': settings.KITCHEN_SLOT_MAX_ORDERS,
+        'slot_max_items': settings.KITCHEN_SLOT_MAX_ITEMS,
     }
     
     return render(request, 'orders/admin_orders.html', context)
@@ -353,7 +484,8 @@ def admin_orders(request):
 @admin_required
 def admin_menu(request):
     """Admin menu management page."""
-    menu_items = MenuItem.objects.all().select_related('category').order_by('category', 'name')
+    show_archived = request.GET.get('archived') == '1'
+    menu_items = MenuItem.objects.filter(is_archived=show_archived).select_related('category').order_by('category', 'name')
     categories = MenuCategory.objects.all()
     
     # Category filter
@@ -371,6 +503,8 @@ def admin_menu(request):
         'categories': categories,
         'category_filter': category_filter,
         'search': search,
+        'show_archived': show_archived,
+        'tag_choices': MenuItem.Tags.choices,
     }
     
     return render(request, 'orders/admin_menu.html', context)
@@ -379,11 +513,8 @@ def admin_menu(request):
 @admin_required
 def admin_customers(request):
     """Admin customer management page."""
-    from accounts.models import User
-    
-    customers = User.objects.filter(role=User.Roles.CUSTOMER).annotate(
-        total_orders=Count('orders'),
-        total_spent=Sum('orders__total_amount')
+    customers = reports.with_customer_stats(
+        User.objects.filter(role=User.Roles.CUSTOMER)
     ).order_by('-total_spent')
     
     # Search filter
@@ -408,8 +539,6 @@ def admin_customers(request):
 @require_POST
 def toggle_customer_status(request, customer_id):
     """Suspend or activate a customer account."""
-    from accounts.models import User
-    
     customer = get_object_or_404(User, id=customer_id, role=User.Roles.CUSTOMER)
     customer.is_active = not customer.is_active
     customer.save()
@@ -423,8 +552,6 @@ def toggle_customer_status(request, customer_id):
 @require_POST
 def make_customer_admin(request, customer_id):
     """Promote a customer to admin role."""
-    from accounts.models import User
-    
     customer = get_object_or_404(User, id=customer_id, role=User.Roles.CUSTOMER)
     customer.role = User.Roles.ADMIN
     customer.is_staff = True
@@ -438,36 +565,139 @@ def make_customer_admin(request, customer_id):
 @require_POST
 def update_order_status(request, order_id):
     """Update order status."""
-    order = get_object_or_404(Order, id=order_id)
     new_status = request.POST.get('status')
     
-    if new_status in dict(Order.Status.choices):
-        order.status = new_status
-        order.save()
-        messages.success(request, f'Order {order.order_number} status updated to {order.get_status_display()}')
+    try:
+        result = transition_orders([order_id], new_status)
+    except ValueError:
+        messages.error(request, 'Invalid status')
+        return redirect('orders:admin_orders')
+    
+    if result.updated:
+        order_number = result.updated[0][1]
+        messages.success(request, f'Order {order_number} status updated to {Order.Status(new_status).label}')
+    elif result.skipped[0]['status'] is None:
+        raise Http404('Order not found')
+    else:
+        messages.error(request, result.skipped[0]['reason'])
+    
+    return redirect(request.META.get('HTTP_REFERER', 'orders:admin_orders'))
+
+
+@admin_required
+@require_POST
+def bulk_update_order_status(request):
+    """
+    Move many orders to a new status in one request.
+    
+    Accepts a form post (``order_ids`` + ``status``) from the admin orders
+    page, or a JSON body ``{"order_ids": [...], "status": "..."}`` which is
+    answered with the updated and skipped orders.
+    """
+    is_json = request.content_type == 'application/json'
+    if is_json:
+        try:
+            data = json.loads(request.body)
+            order_ids = [int(order_id) for order_id in data.get('order_ids', [])]
+        except (ValueError, TypeError, AttributeError):
+            return JsonResponse({'success': False, 'error': 'Invalid request body'}, status=400)
+        new_status = data.get('status')
     else:
+        try:
+            order_ids = [int(order_id) for order_id in request.POST.getlist('order_ids')]
+        except ValueError:
+            order_ids = []
+        new_status = request.POST.get('status')
+    
+    try:
+        result = transition_orders(order_ids, new_status)
+    except ValueError:
+        if is_json:
+            return JsonResponse({'success': False, 'error': 'Invalid status'}, status=400)
         messages.error(request, 'Invalid status')
+        return redirect(request.META.get('HTTP_REFERER', 'orders:admin_orders'))
+    
+    if is_json:
+        return JsonResponse({
+            'success': True,
+            'status': new_status,
+            'updated': [
+                {'id': order_id, 'order_number': order_number, 'previous_status': previous}
+                for order_id, order_number, previous in result.updated
+            ],
+            'skipped': result.skipped,
+        })
     
-    return redirect('orders:admin_orders')
+    label = Order.Status(new_status).label
+    if result.updated:
+        messages.success(request, f'{len(result.updated)} order(s) moved to {label}')
+    if result.skipped:
+        skipped_numbers = ', '.join(
+            skip['order_number'] or f"#{skip['id']}" for skip in result.skipped
+        )
+        messages.warning(request, f'Skipped {len(result.skipped)} order(s) that cannot move to {label}: {skipped_numbers}')
+    return redirect(request.META.get('HTTP_REFERER', 'orders:admin_orders'))
 
 
 @admin_required
 @require_POST
 def toggle_menu_availability(request, item_id):
     """Toggle menu item availability."""
-    import json
-    menu_item = get_object_or_404(MenuItem, id=item_id)
     data = json.loads(request.body)
-    menu_item.is_available = data.get('is_available', False)
-    menu_item.save()
+    # A single-column UPDATE; no need to load and rewrite the whole row
+    if not update_menu_items([item_id], {'is_available': bool(data.get('is_available', False))}):
+        raise Http404('Menu item not found')
     return JsonResponse({'success': True})
 
 
+@admin_required
+@require_POST
+def bulk_update_menu_items(request):
+    """
+    Set availability, featured flag, tag or price of many menu items at once.
+    
+    Accepts a form post (``item_ids`` plus the fields to change) from the
+    admin menu page, or a JSON body such as
+    ``{"item_ids": [...], "is_available": false}`` which is answered with
+    the number of items updated. Fields left out stay unchanged.
+    """
+    is_json = request.content_type == 'application/json'
+    if is_json:
+        try:
+            data = json.loads(request.body)
+            item_ids = [int(item_id) for item_id in data.get('item_ids', [])]
+        except (ValueError, TypeError, AttributeError):
+            return JsonResponse({'success': False, 'error': 'Invalid request body'}, status=400)
+    else:
+        data = request.POST
+        try:
+            item_ids = [int(item_id) for item_id in request.POST.getlist('item_ids')]
+        except ValueError:
+            item_ids = []
+    
+    form = BulkMenuItemForm(data)
+    if not form.is_valid():
+        if is_json:
+            return JsonResponse({'success': False, 'errors': form.errors}, status=400)
+        for field, errors in form.errors.items():
+            messages.error(request, f'{field}: {" ".join(errors)}')
+        return redirect(request.META.get('HTTP_REFERER', 'orders:admin_menu'))
+    
+    updated = update_menu_items(item_ids, form.changes())
+    
+    if is_json:
+        return JsonResponse({'success': True, 'updated': updated})
+    
+    if updated:
+        messages.success(request, f'{updated} menu item(s) updated')
+    else:
+        messages.warning(request, 'Select items and at least one change to apply')
+    return redirect(request.META.get('HTTP_REFERER', 'orders:admin_menu'))
+
+
 @admin_required
 def add_menu_item(request):
     """Add new menu item."""
-    from .forms import MenuItemForm
-    
     if request.method == 'POST':
         form = MenuItemForm(request.POST, request.FILES)
         if form.is_valid():
@@ -487,8 +717,6 @@ def add_menu_item(request):
 @admin_required
 def edit_menu_item(request, item_id):
     """Edit existing menu item."""
-    from .forms import MenuItemForm
-    
     menu_item = get_object_or_404(MenuItem, id=item_id)
     
     if request.method == 'POST':
@@ -508,31 +736,57 @@ def edit_menu_item(request, item_id):
     })
 
 
+@admin_required
+@require_POST
+def restock_menu_item(request, item_id):
+    """Add portions to what is left today of a menu item."""
+    try:
+        portions = int(request.POST.get('portions', ''))
+    except ValueError:
+        portions = 0
+    if portions < 1:
+        messages.error(request, 'Enter the number of portions to add')
+    elif restock(item_id, portions):
+        messages.success(request, f'Added {portions} portion(s)')
+    else:
+        raise Http404('Menu item not found or its stock is not tracked')
+    return redirect('orders:edit_menu_item', item_id=item_id)
+
+
 @admin_required
 @require_POST
 def delete_menu_item(request, item_id):
-    """Delete a menu item and all related order items."""
-    menu_item = get_object_or_404(MenuItem, id=item_id)
-    item_name = menu_item.name
-    
-    # Delete all related order items first
-    menu_item.order_items.all().delete()
-    
-    # Now delete the menu item
-    menu_item.delete()
-    messages.success(request, f'{item_name} has been deleted successfully!')
+    """
+    Archive a menu item.
+    
+    The item disappears from the catalog and carts but keeps its order
+    history; purge_archived_menu_items deletes archived items in batches.
+    """
+    menu_item = get_object_or_404(MenuItem.objects.active(), id=item_id)
+    MenuItem.objects.filter(id=menu_item.id).update(
+        is_archived=True,
+        is_available=False,
+        archived_at=timezone.now(),
+    )
+    bump_catalog_version()
+    messages.success(request, f'{menu_item.name} has been archived.')
+    return redirect('orders:admin_menu')
+
+
+@admin_required
+@require_POST
+def restore_menu_item(request, item_id):
+    """Bring an archived menu item back to the catalog (as unavailable)."""
+    menu_item = get_object_or_404(MenuItem, id=item_id, is_archived=True)
+    MenuItem.objects.filter(id=menu_item.id).update(is_archived=False, archived_at=None)
+    bump_catalog_version()
+    messages.success(request, f'{menu_item.name} has been restored. Mark it available to show it on the menu.')
     return redirect('orders:admin_menu')
 
 
 @admin_required
 def admin_reports(request):
     """Admin reports and analysis page."""
-    from accounts.models import User
-    from django.db.models.functions import TruncDate
-    from datetime import datetime, timedelta
-    import json
-    from decimal import Decimal
-    
     # Date range filter
     period = request.GET.get('period', '7')  # Default 7 days
     try:
@@ -540,17 +794,11 @@ def admin_reports(request):
     except ValueError:
         days = 7
     
-    start_date = timezone.now() - timedelta(days=days)
+    end_date = timezone.now()
+    start_date = end_date - timedelta(days=days)
     
     # Revenue over time
-    daily_revenue = Order.objects.filter(
-        created_at__gte=start_date
-    ).annotate(
-        date=TruncDate('created_at')
-    ).values('date').annotate(
-        revenue=Sum('total_amount'),
-        order_count=Count('id')
-    ).order_by('date')
+    daily_revenue = reports.daily_revenue(start_date, end_date)
     
     # Convert to JSON-serializable format
     daily_revenue_list = [
@@ -563,75 +811,48 @@ def admin_reports(request):
     ]
     
     # Total metrics
-    total_orders = Order.objects.filter(created_at__gte=start_date).count()
-    total_revenue = Order.objects.filter(created_at__gte=start_date).aggregate(
-        total=Sum('total_amount')
-    )['total'] or 0
+    totals = reports.order_totals(start_date, end_date)
+    total_orders = totals['count']
+    total_revenue = totals['revenue'] or 0
     
     avg_order_value = total_revenue / total_orders if total_orders > 0 else 0
+    percentiles = reports.order_percentiles(start_date, end_date)
     
     # Order status breakdown
-    status_breakdown = list(Order.objects.filter(
-        created_at__gte=start_date
-    ).values('status').annotate(
-        count=Count('id')
-    ).order_by('-count'))
+    status_breakdown = reports.status_breakdown(start_date, end_date)
     
     # Top selling items
-    top_items = OrderItem.objects.filter(
-        order__created_at__gte=start_date
-    ).values(
-        'menu_item__name',
-        'menu_item__category__name'
-    ).annotate(
-        total_quantity=Sum('quantity'),
-        total_revenue=Sum(models.F('quantity') * models.F('price'))
-    ).order_by('-total_quantity')[:10]
+    top_items = reports.top_items(start_date, end_date)[:10]
     
     # Top customers
-    top_customers = User.objects.filter(
-        role=User.Roles.CUSTOMER,
-        orders__created_at__gte=start_date
-    ).annotate(
-        order_count=Count('orders'),
-        total_spent=Sum('orders__total_amount')
-    ).order_by('-total_spent')[:10]
+    top_customers = reports.top_customers(start_date, end_date, limit=10)
     
     # Category performance
-    category_performance = OrderItem.objects.filter(
-        order__created_at__gte=start_date
-    ).values(
-        'menu_item__category__name'
-    ).annotate(
-        total_quantity=Sum('quantity'),
-        total_revenue=Sum(models.F('quantity') * models.F('price'))
-    ).order_by('-total_revenue')
+    category_performance = reports.category_performance(start_date, end_date)
     
     # Payment method breakdown
-    payment_breakdown_raw = Order.objects.filter(
-        created_at__gte=start_date
-    ).values('payment_method').annotate(
-        count=Count('id'),
-        revenue=Sum('total_amount')
-    ).order_by('-count')
-    
     payment_breakdown_list = [
         {
             'payment_method': item['payment_method'],
             'count': item['count'],
             'revenue': float(item['revenue']) if item['revenue'] else 0
         }
-        for item in payment_breakdown_raw
+        for item in reports.payment_breakdown(start_date, end_date)
     ]
     
     # Peak hours analysis
-    hourly_orders = list(Order.objects.filter(
-        created_at__gte=start_date
-    ).extra(
-        select={'hour': 'CAST(strftime("%%H", created_at) AS INTEGER)'}
-    ).values('hour').annotate(
-        count=Count('id')
-    ).order_by('hour'))
+    hourly_orders = reports.hourly_orders(start_date, end_date)
+    
+    # Kitchen times (average minutes per day, from the hourly rollups)
+    kitchen_times = {}
+    for row in reports.kitchen_times(start_date, end_date):
+        day = kitchen_times.setdefault(row['date'].isoformat(), {'date': row['date'].isoformat()})
+        day[row['status']] = round(row['avg_minutes'], 1) if row['avg_minutes'] is not None else None
+        day[f"{row['status']}_count"] = row['count']
+    kitchen_times_list = sorted(kitchen_times.values(), key=lambda day: day['date'])
+    
+    # Tomorrow's expected demand per item and hour
+    prep = forecast.prep_sheet()
     
     context = {
         'period': days,
@@ -639,29 +860,145 @@ def admin_reports(request):
         'total_orders': total_orders,
         'total_revenue': total_revenue,
         'avg_order_value': avg_order_value,
+        'order_value_percentiles': percentiles['order_value'],
+        'delivery_percentiles': percentiles['delivery_minutes'],
         'daily_revenue': json.dumps(daily_revenue_list),
         'status_breakdown': json.dumps(status_breakdown),
-        'top_items': list(top_items),
-        'top_customers': list(top_customers),
-        'category_performance': list(category_performance),
+        'top_items': top_items,
+        'top_customers': top_customers,
+        'category_performance': category_performance,
         'payment_breakdown': json.dumps(payment_breakdown_list),
         'hourly_orders': json.dumps(hourly_orders),
+        'kitchen_times': json.dumps(kitchen_times_list) if kitchen_times_list else '',
+        'prep_sheet': prep,
     }
     
     return render(request, 'orders/admin_reports.html', context)
 
 
 
+@admin_required
+def export_data(request, dataset):
+    """Stream orders, customers or a report dataset as CSV or JSON."""
+    fmt = request.GET.get('format', 'csv')
+    start, end = reports.parse_date_range(request.GET.get('start'), request.GET.get('end'))
+    
+    try:
+        lines = exports.export_lines(dataset, fmt, start, end)
+    except KeyError:
+        raise Http404('Unknown export')
+    if isinstance(request, ASGIRequest):
+        # A sync iterator would be read into memory whole before sending
+        lines = exports.aexport_lines(lines)
+    
+    response = StreamingHttpResponse(lines, content_type=exports.FORMATS[fmt])
+    last_day = timezone.localtime(end - timedelta(days=1))
+    filename = f'{dataset}_{timezone.localtime(start):%Y%m%d}_{last_day:%Y%m%d}.{fmt}'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+@admin_required
+def admin_profiles(request):
+    """List the request profiles captured with ?_profile=1."""
+    context = {
+        'profiles': profiling.list_profiles(),
+        'max_entries': settings.PROFILE_MAX_ENTRIES,
+    }
+    return render(request, 'orders/admin_profiles.html', context)
+
+
+@admin_required
+def admin_profile_detail(request, profile_id):
+    """Show the cProfile report and SQL timings of one captured request."""
+    profile = profiling.load_profile(profile_id)
+    if profile is None:
+        raise Http404('Profile not found')
+    
+    sort = request.GET.get('sort', 'cumulative')
+    if sort not in profiling.SORT_KEYS:
+        sort = 'cumulative'
+    
+    context = {
+        'profile': profile,
+        'sort': sort,
+        'sort_keys': profiling.SORT_KEYS,
+        'stats': profiling.format_stats(profile_id, sort),
+        'slowest_queries': sorted(profile['queries'], key=lambda query: query['ms'], reverse=True)[:10],
+    }
+    return render(request, 'orders/admin_profile_detail.html', context)
+
+
+@admin_required
+def download_profile(request, profile_id):
+    """Download the raw .prof file (for snakeviz, pstats, ...)."""
+    path = profiling.profile_stats_path(profile_id)
+    if path is None:
+        raise Http404('Profile not found')
+    return FileResponse(path.open('rb'), as_attachment=True, filename=path.name)
+
+
+def prometheus_metrics(request):
+    """
+    Metrics of all workers in the Prometheus text format.
+
+    Scrapers authenticate with ``Authorization: Bearer <METRICS_TOKEN>``;
+    without a token configured, only logged-in admins can read them.
+    """
+    if settings.METRICS_TOKEN:
+        expected = f'Bearer {settings.METRICS_TOKEN}'
+        allowed = hmac.compare_digest(request.headers.get('Authorization', ''), expected)
+    else:
+        allowed = request.user.is_authenticated and _is_admin(request.user)
+    if not allowed:
+        return HttpResponse('Forbidden', status=403, content_type='text/plain')
+    
+    return HttpResponse(metrics.render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+# Public API
+def _accepted_encodings(header):
+    """Content codings the client accepts, ignoring those with ``q=0``."""
+    encodings = set()
+    for part in header.split(','):
+        coding, _, params = part.partition(';')
+        params = params.replace(' ', '')
+        if params.startswith('q='):
+            try:
+                if float(params[2:]) == 0:
+                    continue
+            except ValueError:
+                pass
+        encodings.add(coding.strip().lower())
+    return encodings
+
+
+async def menu_api(request):
+    """Categories and available items as compact, pre-compressed JSON."""
+    if request.method not in ('GET', 'HEAD'):
+        return HttpResponseNotAllowed(['GET', 'HEAD'])
+    
+    document = await aget_menu_document()
+    if document['etag'] in request.headers.get('If-None-Match', ''):
+        response = HttpResponseNotModified()
+    else:
+        accepted = _accepted_encodings(request.headers.get('Accept-Encoding', ''))
+        coding = next((name for name in ('br', 'gzip') if name in document and name in accepted), 'identity')
+        response = HttpResponse(document[coding], content_type='application/json')
+        if coding != 'identity':
+            response['Content-Encoding'] = coding
+    
+    response['ETag'] = document['etag']
+    response['Vary'] = 'Accept-Encoding'
+    response['Cache-Control'] = 'public, max-age=60'
+    return response
+
+
 # Contact Views
+@rate_limit('contact')
 def contact_page(request):
     """Contact page with form for customer inquiries."""
     if request.method == 'POST':
-        from .forms import ContactForm
-        from django.core.mail import send_mail
-        from django.conf import settings
-        import logging
-        
-        logger = logging.getLogger(__name__)
         form = ContactForm(request.POST)
         
         if form.is_valid():
@@ -705,7 +1042,6 @@ View in admin dashboard: http://localhost:8000/admin/inquiries/
             
             return redirect('orders:contact')
     else:
-        from .forms import ContactForm
         form = ContactForm()
     
     return render(request, 'orders/contact.html', {'form': form})
@@ -715,8 +1051,6 @@ View in admin dashboard: http://localhost:8000/admin/inquiries/
 @admin_required
 def admin_inquiries(request):
     """Admin page for managing customer inquiries."""
-    from .models import ContactInquiry
-    
     inquiries = ContactInquiry.objects.all()
     
     # Status filter
@@ -727,7 +1061,6 @@ def admin_inquiries(request):
     # Date filter
     date_filter = request.GET.get('date', '')
     if date_filter:
-        from datetime import datetime
         try:
             filter_date = datetime.strptime(date_filter, '%Y-%m-%d').date()
             inquiries = inquiries.filter(created_at__date=filter_date)
@@ -757,9 +1090,6 @@ def admin_inquiries(request):
 @require_POST
 def update_inquiry_status(request, inquiry_id):
     """Update inquiry status via AJAX."""
-    from .models import ContactInquiry
-    import json
-    
     inquiry = get_object_or_404(ContactInquiry, id=inquiry_id)
     data = json.loads(request.body)
     new_status = data.get('status')
@@ -775,10 +1105,6 @@ def update_inquiry_status(request, inquiry_id):
 @admin_required
 def debug_images(request):
     """Debug view to check image configuration - REMOVE IN PRODUCTION"""
-    from django.http import JsonResponse
-    from django.conf import settings
-    import os
-    
     debug_info = {
         'environment': {
             'RENDER': os.environ.get('RENDER'),
@@ -795,6 +1121,8 @@ def debug_images(request):
         'menu_items': []
     }
     
+    configure_cloudinary()
+    
     # Get menu items with images
     items_with_images = MenuItem.objects.filter(image__isnull=False).exclude(image='')[:5]  # Limit to 5
     
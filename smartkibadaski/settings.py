@@ -54,12 +54,19 @@ INSTALLED_APPS = [
 ]
 
 
+# Every middleware is async-capable, so async views stay on the event loop
+# under the uvicorn workers; one sync-only entry adapts the whole chain
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # WhiteNoise, made async-capable (see orders.static_files)
+    'orders.static_files.StaticFilesMiddleware',
+    'orders.server_timing.ServerTimingMiddleware',
+    'orders.metrics.MetricsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'orders.profiling.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -68,9 +75,11 @@ ROOT_URLCONF = 'smartkibadaski.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # Django's backend, timing renders for the Server-Timing header
+        'BACKEND': 'orders.template_backends.DjangoTemplates',
+        # Keep the alias of Django's backend for engines['django']
+        'NAME': 'django',
         'DIRS': [BASE_DIR / 'templates'],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.request',
@@ -78,11 +87,21 @@ TEMPLATES = [
                 'django.contrib.messages.context_processors.messages',
                 'orders.context_processors.cart',
             ],
+            # Cached loader that strips comments and whitespace at compile
+            # time (see orders.template_loaders); used in DEBUG too
+            'loaders': [
+                ('orders.template_loaders.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
         },
     },
 ]
 
 WSGI_APPLICATION = 'smartkibadaski.wsgi.application'
+# What the gunicorn uvicorn workers serve (see gunicorn.conf.py)
+ASGI_APPLICATION = 'smartkibadaski.asgi.application'
 
 
 # Database
@@ -92,6 +111,12 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # A file rather than the default in-memory database: threads share
+        # that one through SQLite's shared cache, whose table locks fail at
+        # once ("database table is locked") instead of waiting out the busy
+        # timeout, so ConcurrentStockTests and ConcurrentSketchTests could
+        # not run. The file is deleted after each run
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 }
 
@@ -134,6 +159,15 @@ STATIC_URL = '/static/'
 STATICFILES_DIRS = [BASE_DIR / 'static']
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
+# Tailwind CSS bundles compiled by `manage.py build_css` from assets/tailwind
+# into static/css; collectstatic then gives them content-hashed names
+TAILWIND_DIR = BASE_DIR / 'assets' / 'tailwind'
+TAILWIND_CLI_VERSION = 'v3.4.17'
+TAILWIND_BUNDLES = {
+    'site': {'output': 'css/site.css', 'cdn_plugins': 'forms,typography'},
+    'admin': {'output': 'css/admin.css', 'cdn_plugins': ''},
+}
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
@@ -144,19 +178,10 @@ CLOUDINARY_STORAGE = {
     'API_SECRET': os.environ.get('CLOUDINARY_API_SECRET'),
 }
 
-# Only configure Cloudinary if credentials are provided
+# Only configure Cloudinary if credentials are provided. The SDK itself is
+# configured on first image access (see orders.media.configure_cloudinary)
+# so worker boot does not pay for it.
 if all(CLOUDINARY_STORAGE.values()):
-    import cloudinary
-    import cloudinary.uploader
-    import cloudinary.api
-    
-    cloudinary.config(
-        cloud_name=CLOUDINARY_STORAGE['CLOUD_NAME'],
-        api_key=CLOUDINARY_STORAGE['API_KEY'],
-        api_secret=CLOUDINARY_STORAGE['API_SECRET'],
-        secure=True
-    )
-    
     # Configure django-cloudinary-storage settings
     CLOUDINARY_STORAGE['STATICFILES_MANIFEST_ROOT'] = BASE_DIR / 'staticfiles'
     CLOUDINARY_STORAGE['MEDIA_TAG'] = 'media'
@@ -175,6 +200,12 @@ if all(CLOUDINARY_STORAGE.values()):
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'accounts.User'
+# The logged-in user is served from the cache (see accounts.backends); the
+# plain ModelBackend keeps sessions started before it was added working
+AUTHENTICATION_BACKENDS = [
+    'accounts.backends.CachedModelBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
 LOGIN_REDIRECT_URL = 'orders:dashboard'
 LOGIN_URL = 'login'
 LOGOUT_REDIRECT_URL = 'orders:home'
@@ -183,6 +214,113 @@ LOGOUT_REDIRECT_URL = 'orders:home'
 CART_SESSION_ID = 'cart'
 
 
+# Cache
+# Local memory in development; production switches to a file-based cache so
+# every gunicorn worker sees the same entries and invalidations. Both are
+# Django's backends instrumented for the Server-Timing header.
+CACHES = {
+    'default': {
+        'BACKEND': 'orders.cache_backends.LocMemCache',
+        'LOCATION': 'smartkibadaski',
+    }
+}
+
+# Seconds the admin dashboard counters stay cached between invalidations
+DASHBOARD_COUNTERS_TTL = int(os.environ.get('DASHBOARD_COUNTERS_TTL', 30))
+
+# Rows fetched per database round trip by the streaming exports
+EXPORT_CHUNK_SIZE = 2000
+# Export lines sent per chunk when streaming under ASGI
+EXPORT_STREAM_BATCH = 500
+
+# Delivered/cancelled orders older than this move to the archive tables
+# (see the archive_orders management command)
+ORDER_ARCHIVE_AFTER_DAYS = int(os.environ.get('ORDER_ARCHIVE_AFTER_DAYS', 60))
+ORDER_HISTORY_PAGE_SIZE = 20
+
+# Minify HTML templates when they are compiled
+TEMPLATE_MINIFY = os.environ.get('TEMPLATE_MINIFY', 'true').lower() != 'false'
+
+# Token-bucket rate limits per view scope ('<count>/<s|m|h|d>'), charged to
+# the user, session and IP address (see orders.ratelimit). Customers at one
+# workplace share an address, so the IP bucket is larger.
+RATE_LIMITS = {
+    'cart': '30/m',
+    'checkout': '5/m',
+    'contact': '5/h',
+    'login': '10/m',
+}
+RATE_LIMIT_IP_MULTIPLIER = 10
+# Proxies in front of the app that append to X-Forwarded-For; the client
+# address is the entry the outermost one added. 0 uses REMOTE_ADDR.
+RATE_LIMIT_PROXY_HOPS = 0
+
+# Checkouts allowed in flight at once; extra ones get a fast 503
+CONCURRENCY_LIMITS = {
+    'checkout': int(os.environ.get('CHECKOUT_MAX_CONCURRENT', 4)),
+}
+CONCURRENCY_RETRY_AFTER = 2
+# The in-flight counter is dropped when no request has got in for this long
+CONCURRENCY_SLOT_TIMEOUT = 60
+
+# Request profiles captured by admins with ?_profile=1 (see orders.profiling);
+# only the newest PROFILE_MAX_ENTRIES are kept
+PROFILE_DIR = os.environ.get('PROFILE_DIR', BASE_DIR / 'profiles')
+PROFILE_MAX_ENTRIES = int(os.environ.get('PROFILE_MAX_ENTRIES', 50))
+
+# Add a Server-Timing header (db, tpl, cache and view time) to responses
+SERVER_TIMING = os.environ.get('SERVER_TIMING', 'true').lower() != 'false'
+
+# Per-process metric files summed by /metrics (see orders.metrics), written
+# only by gunicorn workers, or wherever METRICS_RECORD=1 is set. Set
+# METRICS_TOKEN for Prometheus to scrape with a bearer token; without it
+# only admins can read the endpoint.
+METRICS_DIR = os.environ.get('METRICS_DIR', BASE_DIR / 'metrics')
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Queries slower than this (ms) are recorded with their plan in SLOW_QUERY_DIR
+# (see orders.slow_queries and manage.py slow_queries). Off unless set, as
+# the first run of each slow query is EXPLAINed in the request's thread
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 0))
+SLOW_QUERY_DIR = os.environ.get('SLOW_QUERY_DIR', BASE_DIR / 'slow_queries')
+# Keep the values of their parameters too; off by default, as they can hold
+# password hashes, session data and customer details
+SLOW_QUERY_LOG_PARAMS = os.environ.get('SLOW_QUERY_LOG_PARAMS', '').lower() == 'true'
+
+# Kitchen capacity: orders are booked into KITCHEN_SLOT_MINUTES slots taking at
+# most KITCHEN_SLOT_MAX_ORDERS orders and KITCHEN_SLOT_MAX_ITEMS items each
+# (0 means no limit); checkout offers the next KITCHEN_SLOT_LOOKAHEAD slots
+# (see orders.slots)
+KITCHEN_SLOT_MINUTES = 15
+KITCHEN_SLOT_MAX_ORDERS = int(os.environ.get('KITCHEN_SLOT_MAX_ORDERS', 12))
+KITCHEN_SLOT_MAX_ITEMS = int(os.environ.get('KITCHEN_SLOT_MAX_ITEMS', 40))
+KITCHEN_SLOT_LOOKAHEAD = 8
+
+# Popularity ranking rebuilt by manage.py compute_popularity: order lines of the
+# last POPULARITY_WINDOW_DAYS, halving in weight every POPULARITY_HALF_LIFE_DAYS;
+# the homepage shows the top POPULAR_ITEMS_COUNT (see orders.popularity)
+POPULARITY_HALF_LIFE_DAYS = 7
+POPULARITY_WINDOW_DAYS = 42
+POPULAR_ITEMS_COUNT = 8
+
+# "Frequently ordered together": manage.py build_recommendations keeps the
+# RECOMMENDATIONS_PER_ITEM best neighbours of each item (pairs seen in at least
+# RECOMMENDATIONS_MIN_ORDERS orders) in RECOMMENDATIONS_FILE; pages show
+# RECOMMENDATIONS_SHOWN of them (see orders.recommendations). Each process
+# checks the file for a new build every RECOMMENDATIONS_RELOAD_INTERVAL seconds
+RECOMMENDATIONS_FILE = os.environ.get('RECOMMENDATIONS_FILE', BASE_DIR / 'recommendations.npz')
+RECOMMENDATIONS_PER_ITEM = 10
+RECOMMENDATIONS_MIN_ORDERS = 2
+RECOMMENDATIONS_SHOWN = 4
+RECOMMENDATIONS_RELOAD_INTERVAL = 60
+
+# Prep sheet on the reports page: next-day demand per item and hour forecast
+# from FORECAST_HISTORY_DAYS of orders, smoothing factor FORECAST_SMOOTHING
+# (see orders.forecast)
+FORECAST_HISTORY_DAYS = 365
+FORECAST_SMOOTHING = 0.2
+
+
 # Email settings
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'  # For development
 DEFAULT_FROM_EMAIL = 'SmartKibandaski <hotel@smartkibandaski.com>'
@@ -213,8 +351,16 @@ if os.environ.get('RENDER'):
         }
     }
     
-    # Static files with WhiteNoise (keep static files local for better performance)
-    MIDDLEWARE.insert(1, 'whitenoise.middleware.WhiteNoiseMiddleware')
+    # Shared cache across gunicorn workers
+    CACHES = {
+        'default': {
+            'BACKEND': 'orders.cache_backends.FileBasedCache',
+            'LOCATION': os.environ.get('CACHE_DIR', '/tmp/smartkibadaski-cache'),
+        }
+    }
+
+    # Render terminates TLS at one proxy that appends to X-Forwarded-For
+    RATE_LIMIT_PROXY_HOPS = 1
     
     # Use WhiteNoise for static files storage
     STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'